@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+#
+# Total dose lookup for arbitrary orbits and shielding
+#
+# Usage: dose.py [al-thickness-mm]
+#
+# Interpolates the SHIELDOSE-2 doses (5 year mission, see README.md) between
+# the SPENVIS tables: linearly in inclination and altitude, and in log space
+# for thickness and dose, as dose falls off roughly exponentially with
+# shielding. Queries outside the tables use the nearest table value.
+#
+# There is one table per altitude in TABLES, so far only 550km. Another
+# altitude is added by running SPENVIS for all inclinations at that altitude
+# and adding its results folder. With a single altitude, the altitude of a
+# query is ignored.
+#
+# Without arguments, prints the dose for each shell in
+# ../isl-degradation/config.py behind 1mm of aluminium.
+#
+
+import functools
+import importlib.util
+import itertools
+import os
+import sys
+import typing
+
+import numpy as np
+
+import spenvis
+
+# altitude in km -> (results folder, cache file), relative to this file
+TABLES = {
+    550: (os.path.join(os.path.dirname(os.path.abspath(__file__)), "results"), os.path.join(os.path.dirname(os.path.abspath(__file__)), "cleaned", "doses.npz")),
+}
+
+# doses below this (in rad) are treated as zero, log(0) cannot be interpolated
+DOSE_FLOOR = 1e-12
+
+AL_THICKNESS = 1.0
+
+SHELLS_CONFIG = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "isl-degradation", "config.py")
+
+
+class DoseTable(typing.NamedTuple):
+    # altitudes x inclinations x thickness x components, like the dose cube
+    altitudes: np.ndarray
+    inclinations: np.ndarray
+    thickness: np.ndarray
+    components: typing.List[str]
+    # log of the doses in rad
+    log_doses: np.ndarray
+
+
+@functools.lru_cache(maxsize=None)
+def table() -> DoseTable:
+    altitudes = sorted(TABLES.keys())
+    cubes = [spenvis.dose_cube(*TABLES[alt]) for alt in altitudes]
+
+    for cube in cubes[1:]:
+        if not np.array_equal(cube.inclinations, cubes[0].inclinations) or not np.array_equal(cube.thickness, cubes[0].thickness):
+            raise ValueError("dose tables for all altitudes need the same inclinations and thicknesses")
+
+    doses = np.stack([cube.doses for cube in cubes])
+
+    return DoseTable(np.array(altitudes, dtype=np.float64), cubes[0].inclinations, cubes[0].thickness, cubes[0].components, np.log(np.maximum(doses, DOSE_FLOOR)))
+
+
+def _weights(axis: np.ndarray, values: np.ndarray) -> typing.Tuple[np.ndarray, np.ndarray]:
+    # index of the grid point below each value and the weight of the one above,
+    # values outside the axis are clamped to its ends
+    if len(axis) == 1:
+        return np.zeros(values.shape, dtype=np.int64), np.zeros(values.shape)
+
+    values = np.clip(values, axis[0], axis[-1])
+    lo = np.clip(np.searchsorted(axis, values, side="right") - 1, 0, len(axis) - 2)
+
+    return lo, (values - axis[lo]) / (axis[lo + 1] - axis[lo])
+
+
+def lookup(inclination, al_thickness, altitude=550.0, component: str = "total_dose") -> np.ndarray:
+    # dose in rad for each (inclination in deg, Al thickness in mm, altitude
+    # in km), arguments are broadcast against each other
+    t = table()
+    c = t.components.index(component)
+
+    inclination, al_thickness, altitude = np.broadcast_arrays(np.asarray(inclination, dtype=np.float64), np.asarray(al_thickness, dtype=np.float64), np.asarray(altitude, dtype=np.float64))
+
+    grid = [t.altitudes, t.inclinations, np.log(t.thickness)]
+    axes = [_weights(g, v) for g, v in zip(grid, [altitude, inclination, np.log(np.maximum(al_thickness, t.thickness[0]))])]
+
+    # multilinear interpolation over the corners of each grid cell
+    log_dose = np.zeros(inclination.shape)
+
+    for corner in itertools.product((0, 1), repeat=len(axes)):
+        w = np.ones(inclination.shape)
+        idx = []
+
+        for g, (lo, frac), upper in zip(grid, axes, corner):
+            w = w * (frac if upper else 1 - frac)
+            # singleton axes have no upper grid point, its weight is 0 anyway
+            idx.append(np.minimum(lo + upper, len(g) - 1))
+
+        log_dose += w * t.log_doses[idx[0], idx[1], idx[2], c]
+
+    # interpolating between floored values can round to just above the floor
+    return np.where(log_dose <= np.log(DOSE_FLOOR) + 1e-9, 0.0, np.exp(log_dose))
+
+
+@functools.lru_cache(maxsize=4096)
+def dose(inclination: float, al_thickness: float, altitude: float = 550.0, component: str = "total_dose") -> float:
+    # memoized lookup of a single design point
+    return float(lookup(inclination, al_thickness, altitude, component))
+
+
+def shells(path: str = SHELLS_CONFIG) -> typing.List[typing.Dict]:
+    # constellation shells from the ISL degradation configuration
+    spec = importlib.util.spec_from_file_location("isl_config", path)
+    config = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(config)
+
+    return config.SHELLS
+
+
+def shell_doses(al_thickness: float = AL_THICKNESS, component: str = "total_dose", path: str = SHELLS_CONFIG) -> typing.Dict[str, float]:
+    # dose in rad for each shell
+    s = shells(path)
+    d = lookup([shell["inc"] for shell in s], al_thickness, [shell["altitude"] for shell in s], component)
+
+    return {shell["name"]: float(v) for shell, v in zip(s, d)}
+
+
+if __name__ == "__main__":
+
+    # parse arguments
+
+    if len(sys.argv) > 2:
+        print("Usage: dose.py [al-thickness-mm]")
+        sys.exit(1)
+
+    al_thickness = float(sys.argv[1]) if len(sys.argv) > 1 else AL_THICKNESS
+
+    t = table()
+    altitudes = t.altitudes
+
+    print(f"doses behind {al_thickness}mm Al, interpolated linearly in inclination and altitude and in log space in thickness")
+
+    if not t.thickness[0] <= al_thickness <= t.thickness[-1]:
+        print(f"{al_thickness}mm is outside the tables, using {t.thickness[0] if al_thickness < t.thickness[0] else t.thickness[-1]}mm")
+
+    for shell in shells():
+        d = dose(shell["inc"], al_thickness, shell["altitude"])
+
+        # make it obvious when there is no table for the altitude of a shell,
+        # between tables doses are interpolated, outside the nearest is used
+        if shell["altitude"] in altitudes:
+            note = ""
+        elif altitudes[0] < shell["altitude"] < altitudes[-1]:
+            i = np.searchsorted(altitudes, shell["altitude"])
+            note = f" (no table for {shell['altitude']}km, altitude interpolated between {altitudes[i - 1]:.0f}km and {altitudes[i]:.0f}km)"
+        else:
+            note = f" (no table for {shell['altitude']}km, altitude from nearest table at {altitudes[np.argmin(np.abs(altitudes - shell['altitude']))]:.0f}km)"
+        print(f"{shell['name']}: {d:.4E} rad{note}")
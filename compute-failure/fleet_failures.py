@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+#
+# Monte Carlo simulation of compute node failures in a constellation shell
+#
+# Usage: fleet_failures.py [options] <shell> <crash-rate-per-day> [trials] [output-file]
+#
+# Options override the failure parameters below:
+#   --reboot-minutes <minutes>  time to reboot after a crash
+#   --repair-days <days>        time to replace a satellite after its end of life
+#   --tid-tolerance <rad>       median TID tolerance of a node
+#   --tid-spread <sigma>        spread of the TID tolerance (sigma of log)
+#   --al-thickness <mm>         aluminium shielding for the dose
+#
+# Every satellite in the shell (see ../isl-degradation/config.py) carries one
+# compute node. Nodes crash (or have a SEFI) as a Poisson process with the
+# given rate per day (see see_rates.py) and are down for REBOOT_TIME after
+# each crash. A node reaches its end of life when its total ionizing dose
+# reaches its TID tolerance (see dose.py) and is down until the satellite is
+# replaced after REPAIR_TIME, after which the new node starts from zero dose.
+#
+# Each trial samples all events of the shell over the mission at once and
+# counts the nodes that are down at each time step. Trials are split into
+# batches with their own seeds, so results only depend on the seed and not on
+# the number of processes. Percentiles over all trials are computed from a
+# histogram of down nodes per time step that is updated as batches finish.
+#
+
+import multiprocessing as mp
+import sys
+import typing
+
+import numpy as np
+import pandas as pd
+import tqdm
+
+import dose
+
+# mission duration in days, SPENVIS doses are for five years
+DURATION = 1825.0
+# time between samples of down nodes in days
+STEP = 1.0
+# time to reboot after a crash in days
+REBOOT_TIME = 10 / (24 * 60)
+# time to replace a satellite after its end of life in days
+REPAIR_TIME = 90.0
+# TID tolerance in rad (SA8155P, see analyze_rad.ipynb)
+TID_TOLERANCE = 5e4
+# spread (sigma of log) of the TID tolerance of individual nodes
+TID_SPREAD = 0.25
+
+TRIALS = 10000
+# trials per batch, each batch is one task for a worker process
+BATCH_TRIALS = 100
+SEED = 0
+
+PERCENTILES = [5, 25, 50, 75, 95]
+
+
+class Shell(typing.NamedTuple):
+    name: str
+    n_sats: int
+    inc: float
+    altitude: float
+
+
+def shell(name: str, path: str = dose.SHELLS_CONFIG) -> Shell:
+    for s in dose.shells(path):
+        if s["name"] == name:
+            return Shell(s["name"], s["planes"] * s["sats"], s["inc"], s["altitude"])
+
+    raise ValueError(f"unknown shell {name}")
+
+
+def _down_intervals(rng: np.random.Generator, n_units: int, crash_rate: float, dose_rate: float, duration: float, reboot_time: float, repair_time: float, tid_tolerance: float, tid_spread: float) -> typing.Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # (unit, start, end) of all down times of n_units nodes, may overlap
+
+    # crashes: Poisson number of events per node, uniform in time
+    n_crashes = rng.poisson(crash_rate * duration, n_units)
+    units = [np.repeat(np.arange(n_units), n_crashes)]
+    starts = [rng.uniform(0, duration, n_crashes.sum())]
+    ends = [starts[0] + reboot_time]
+
+    # end of life: one generation of nodes after the other, until all
+    # replacements outlive the mission
+    alive = np.arange(n_units)
+    born = np.zeros(n_units)
+
+    while len(alive) > 0 and dose_rate > 0:
+        eol = born + tid_tolerance * np.exp(tid_spread * rng.standard_normal(len(alive))) / dose_rate
+
+        dead = eol < duration
+        units.append(alive[dead])
+        starts.append(eol[dead])
+        ends.append(eol[dead] + repair_time)
+
+        alive = alive[dead]
+        born = eol[dead] + repair_time
+
+    return np.concatenate(units), np.concatenate(starts), np.concatenate(ends)
+
+
+def _merge(units: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> typing.Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # disjoint intervals per unit: sort by unit and start, and start each
+    # interval after the latest end of the intervals before it
+    # offset each unit so that sorting and a running maximum do not cross
+    # units (much faster than np.lexsort)
+    span = ends.max(initial=0) + 1
+
+    order = np.argsort(units * span + starts)
+    units, starts, ends = units[order], starts[order], ends[order]
+
+    offset = units * span
+    latest_end = np.maximum.accumulate(ends + offset) - offset
+
+    prev_end = np.full(len(units), -np.inf)
+    same = np.zeros(len(units), dtype=bool)
+    same[1:] = units[1:] == units[:-1]
+    prev_end[1:][same[1:]] = latest_end[:-1][same[1:]]
+
+    starts = np.maximum(starts, prev_end)
+    keep = starts < ends
+
+    return units[keep], starts[keep], ends[keep]
+
+
+def _simulate_batch(arg: typing.Tuple) -> typing.Tuple[int, np.ndarray]:
+    # number of trials and histogram (time steps x most down nodes + 1) of
+    # down nodes for a batch of trials
+    seed, trials, n_sats, crash_rate, dose_rate, duration, step, reboot_time, repair_time, tid_tolerance, tid_spread = arg
+
+    rng = np.random.default_rng(seed)
+    n_steps = int(np.floor(duration / step)) + 1
+
+    units, starts, ends = _merge(*_down_intervals(rng, trials * n_sats, crash_rate, dose_rate, duration, reboot_time, repair_time, tid_tolerance, tid_spread))
+
+    # a node is down at time step k if start <= k * step < end
+    first = np.minimum(np.ceil(starts / step).astype(np.int64), n_steps)
+    last = np.minimum(np.ceil(ends / step).astype(np.int64), n_steps)
+
+    trial = units // n_sats
+    diff = np.bincount(trial * (n_steps + 1) + first, minlength=trials * (n_steps + 1))
+    diff -= np.bincount(trial * (n_steps + 1) + last, minlength=trials * (n_steps + 1))
+
+    down = np.cumsum(diff.reshape(trials, n_steps + 1), axis=1)[:, :n_steps]
+
+    # only send the columns up to the most down nodes back
+    width = int(down.max(initial=0)) + 1
+    hist = np.bincount((np.arange(n_steps) * width + down).ravel(), minlength=n_steps * width)
+
+    return trials, hist.reshape(n_steps, width)
+
+
+def simulate(s: Shell, crash_rate: float, trials: int = TRIALS, duration: float = DURATION, step: float = STEP, reboot_time: float = REBOOT_TIME, repair_time: float = REPAIR_TIME, tid_tolerance: float = TID_TOLERANCE, tid_spread: float = TID_SPREAD, al_thickness: float = dose.AL_THICKNESS, seed: int = SEED, batch_trials: int = BATCH_TRIALS) -> typing.Tuple[np.ndarray, np.ndarray]:
+    # time steps in days and histogram (time steps x n_sats + 1) of the
+    # number of down nodes over all trials
+    dose_rate = dose.dose(s.inc, al_thickness, s.altitude) / DURATION
+
+    sizes = [min(batch_trials, trials - i) for i in range(0, trials, batch_trials)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+
+    args = [(sd, n, s.n_sats, crash_rate, dose_rate, duration, step, reboot_time, repair_time, tid_tolerance, tid_spread) for sd, n in zip(seeds, sizes)]
+
+    n_steps = int(np.floor(duration / step)) + 1
+    hist = np.zeros((n_steps, s.n_sats + 1), dtype=np.int64)
+
+    with mp.Pool() as pool:
+        with tqdm.tqdm(total=trials, desc=f"simulating {s.name}") as pbar:
+            for n, h in pool.imap_unordered(_simulate_batch, args):
+                hist[:, :h.shape[1]] += h
+                pbar.update(n)
+
+        pool.close()
+        pool.join()
+
+    return np.arange(n_steps) * step, hist
+
+
+def percentiles(hist: np.ndarray, q: typing.Sequence[float] = PERCENTILES) -> np.ndarray:
+    # (time steps x len(q)) percentiles of down nodes from a histogram,
+    # lowest value with at least q% of trials at or below it
+    cdf = np.cumsum(hist, axis=1)
+    targets = np.asarray(q, dtype=np.float64) / 100 * cdf[:, -1:]
+
+    return np.stack([(cdf < targets[:, [i]]).sum(axis=1) for i in range(len(q))], axis=1)
+
+
+def summary(times: np.ndarray, hist: np.ndarray, q: typing.Sequence[float] = PERCENTILES) -> pd.DataFrame:
+    mean = (hist * np.arange(hist.shape[1])).sum(axis=1) / hist.sum(axis=1)
+
+    df = pd.DataFrame({"day": times, "mean": mean})
+    for p, v in zip(q, percentiles(hist, q).T):
+        df[f"p{p}"] = v
+
+    return df
+
+
+if __name__ == "__main__":
+
+    # parse arguments
+
+    usage = "Usage: fleet_failures.py [options] <shell> <crash-rate-per-day> [trials] [output-file]"
+
+    # option -> (argument of simulate, conversion to its unit)
+    options = {
+        "--reboot-minutes": ("reboot_time", lambda v: float(v) / (24 * 60)),
+        "--repair-days": ("repair_time", float),
+        "--tid-tolerance": ("tid_tolerance", float),
+        "--tid-spread": ("tid_spread", float),
+        "--al-thickness": ("al_thickness", float),
+    }
+
+    args = []
+    kwargs = {}
+
+    i = 1
+    while i < len(sys.argv):
+        if sys.argv[i].startswith("--"):
+            if sys.argv[i] not in options or i + 1 >= len(sys.argv):
+                print(usage)
+                sys.exit(1)
+
+            name, convert = options[sys.argv[i]]
+            kwargs[name] = convert(sys.argv[i + 1])
+            i += 2
+        else:
+            args.append(sys.argv[i])
+            i += 1
+
+    if len(args) < 2 or len(args) > 4:
+        print(usage)
+        sys.exit(1)
+
+    s = shell(args[0])
+    crash_rate = float(args[1])
+    trials = int(args[2]) if len(args) > 2 else TRIALS
+    output_file = args[3] if len(args) > 3 else None
+
+    times, hist = simulate(s, crash_rate, trials, **kwargs)
+    df = summary(times, hist)
+
+    if output_file is None:
+        print(df.describe().to_string())
+    else:
+        df.to_csv(output_file, index=False)
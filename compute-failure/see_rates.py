@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+#
+# Single event effect (SEE) rates from the radiation test cross sections
+#
+# Usage: see_rates.py <let-spectra-file> <proton-spectra-file> [output-file]
+#
+# Each cross section curve in radiation-tests/ is fitted with a Weibull curve
+#   sigma(x) = sigma_sat * (1 - exp(-((x - x0) / w)^s))  for x > x0
+# over LET (heavy ions, MeV cm2/mg) or energy (protons, MeV). The rate of a
+# device is the cross section integrated over a differential flux spectrum
+# (particles / cm2 / day per unit of LET or energy), which assumes the
+# measured cross sections hold for all angles of incidence.
+#
+# Spectra files are CSV files with the LET or energy grid in the first column
+# and one spectrum per further column, e.g., one per inclination. All spectra
+# in a file share a grid, so each device needs a single matrix product.
+#
+
+import functools
+import os
+import sys
+import typing
+
+import numpy as np
+import pandas as pd
+import scipy.optimize
+
+TESTS_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "radiation-tests")
+
+# effect of each test, crashes and SEFIs need a reboot, upsets do not
+DEVICES = {
+    "820-ion-crash": "crash",
+    "820-ion-memory-sbu": "upset",
+    "820-ion-register-sbu": "upset",
+    "820-proton-crash": "crash",
+    "sa8155p-ion-sefi": "crash",
+    "skh-ion-memory-sbu": "upset",
+}
+
+# shape of the Weibull curve if there are too few points to fit it (two)
+DEFAULT_SHAPE = 1.5
+
+COLUMNS = ["device", "particle", "effect", "per", "spectrum", "rate_per_day"]
+
+
+class Weibull(typing.NamedTuple):
+    # "ion" (LET in MeV cm2/mg) or "proton" (energy in MeV)
+    particle: str
+    # cross sections are per "device" or per "bit"
+    per: str
+    sigma_sat: float
+    x0: float
+    w: float
+    s: float
+
+    def __call__(self, x: np.ndarray) -> np.ndarray:
+        # cross section in cm2 at x
+        z = np.maximum(np.asarray(x, dtype=np.float64) - self.x0, 0) / self.w
+        return self.sigma_sat * -np.expm1(-z ** self.s)
+
+
+def read_test(path: str) -> typing.Tuple[str, str, np.ndarray, np.ndarray]:
+    # particle, unit, x values, and cross sections of a test file
+    df = pd.read_csv(path, skipinitialspace=True)
+    x_col, sigma_col = df.columns[:2]
+
+    particle = "ion" if x_col.startswith("LET") else "proton"
+    per = "bit" if "/bit" in sigma_col else "device"
+
+    df = df.sort_values(x_col)
+
+    return particle, per, df[x_col].values.astype(np.float64), df[sigma_col].values.astype(np.float64)
+
+
+def _fit_weibull(x: np.ndarray, sigma: np.ndarray) -> typing.Tuple[float, float, float, float]:
+    # least squares in log space, so that small cross sections at low LET
+    # count as much as the saturated ones
+    # with fewer points than parameters, fix the threshold at 0 and then the
+    # shape, and the saturation stays within a decade of the largest cross
+    # section, as most curves were not measured up to saturation
+    free = min(len(x), 4)
+
+    def _params(p: np.ndarray) -> typing.Tuple[float, float, float, float]:
+        sigma_sat, w = 10 ** p[0], 10 ** p[1]
+        s = p[2] if free > 2 else DEFAULT_SHAPE
+        x0 = p[3] if free > 3 else 0.0
+        return sigma_sat, x0, w, s
+
+    def _residuals(p: np.ndarray) -> np.ndarray:
+        sigma_sat, x0, w, s = _params(p)
+        z = np.maximum(x - x0, 0) / w
+        return np.log10(np.maximum(sigma_sat * -np.expm1(-z ** s), 1e-300)) - np.log10(sigma)
+
+    # start at a saturated curve with its width at the largest measurement
+    p0 = [np.log10(sigma.max()), np.log10(x.max()), DEFAULT_SHAPE, 0.0][:free]
+    lower = [np.log10(sigma.max()) - 1, np.log10(x.max()) - 4, 0.5, 0.0][:free]
+    upper = [np.log10(sigma.max()) + 1, np.log10(x.max()) + 2, 10.0, x.min() * (1 - 1e-6)][:free]
+
+    r = scipy.optimize.least_squares(_residuals, p0, bounds=(lower, upper))
+
+    return _params(r.x)
+
+
+@functools.lru_cache(maxsize=None)
+def _fit(path: str, mtime: float) -> Weibull:
+    particle, per, x, sigma = read_test(path)
+    return Weibull(particle, per, *_fit_weibull(x, sigma))
+
+
+def fit(path: str) -> Weibull:
+    # Weibull fit of a test file, cached until the file changes
+    return _fit(os.path.abspath(path), os.path.getmtime(path))
+
+
+def fits(tests_folder: str = TESTS_FOLDER) -> typing.Dict[str, Weibull]:
+    return {device: fit(os.path.join(tests_folder, f"{device}.csv")) for device in DEVICES}
+
+
+def _trapezoid_weights(grid: np.ndarray) -> np.ndarray:
+    # integral of f over grid is f(grid) @ weights
+    dx = np.diff(grid)
+    weights = np.zeros(len(grid))
+    weights[:-1] += dx / 2
+    weights[1:] += dx / 2
+    return weights
+
+
+def rates(curve: Weibull, grid: np.ndarray, spectra: np.ndarray) -> np.ndarray:
+    # events per day (per device or bit) for each spectrum, spectra has the
+    # differential flux on the grid in its last axis
+    grid = np.asarray(grid, dtype=np.float64)
+    return np.asarray(spectra, dtype=np.float64) @ (curve(grid) * _trapezoid_weights(grid))
+
+
+def device_rates(spectra: typing.Dict[str, typing.Tuple[np.ndarray, np.ndarray]], tests_folder: str = TESTS_FOLDER) -> typing.Dict[str, np.ndarray]:
+    # rates per day of each device, spectra maps a particle ("ion" or
+    # "proton") to its grid and (n_spectra x grid) flux, devices without a
+    # spectrum for their particle are left out
+    result = {}
+
+    for device, curve in fits(tests_folder).items():
+        if curve.particle in spectra:
+            result[device] = rates(curve, *spectra[curve.particle])
+
+    return result
+
+
+def total_rates(spectra: typing.Dict[str, typing.Tuple[np.ndarray, np.ndarray]], tests_folder: str = TESTS_FOLDER) -> typing.Dict[typing.Tuple[str, str], np.ndarray]:
+    # rates per day by (chip, effect) for each spectrum, adding up heavy ions
+    # and protons, the chip is the first part of the test name
+    # per-bit cross sections are left out, as they depend on the number of bits
+    curves = fits(tests_folder)
+    result = {}
+
+    for device, r in device_rates(spectra, tests_folder).items():
+        if curves[device].per != "device":
+            continue
+
+        key = (device.split("-")[0], DEVICES[device])
+        result[key] = result[key] + r if key in result else r
+
+    return result
+
+
+def read_spectra(path: str) -> typing.Tuple[np.ndarray, np.ndarray, typing.List[str]]:
+    # grid, (n_spectra x grid) flux, and spectrum names of a spectra file
+    df = pd.read_csv(path, skipinitialspace=True)
+    return df.iloc[:, 0].values.astype(np.float64), df.iloc[:, 1:].values.T.astype(np.float64), list(df.columns[1:])
+
+
+if __name__ == "__main__":
+
+    # parse arguments
+
+    if len(sys.argv) not in (3, 4):
+        print("Usage: see_rates.py <let-spectra-file> <proton-spectra-file> [output-file]")
+        sys.exit(1)
+
+    let_file = sys.argv[1]
+    proton_file = sys.argv[2]
+    output_file = sys.argv[3] if len(sys.argv) > 3 else None
+
+    let_grid, let_flux, let_names = read_spectra(let_file)
+    proton_grid, proton_flux, proton_names = read_spectra(proton_file)
+
+    spectra = {"ion": (let_grid, let_flux), "proton": (proton_grid, proton_flux)}
+    names = {"ion": let_names, "proton": proton_names}
+
+    curves = fits()
+    rows = []
+
+    for device, r in device_rates(spectra).items():
+        curve = curves[device]
+        for name, rate in zip(names[curve.particle], r):
+            rows.append((device, curve.particle, DEVICES[device], curve.per, name, rate))
+
+    df = pd.DataFrame(rows, columns=COLUMNS)
+
+    if output_file is None:
+        print(df.to_string(index=False))
+    else:
+        df.to_csv(output_file, index=False)
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+#
+# Parser for SPENVIS result files and the SHIELDOSE-2 dose cube
+#
+# Usage: spenvis.py <results-folder> <output-file>
+#
+# SPENVIS writes its results as blocks. Each block starts with a header record
+#   '*', header lines, comment lines, meta variables, annotation lines,
+#        variables, columns, data lines, ...
+# followed by the comment lines, the meta variables ('MOD_ABB', -1,'SH2'),
+# annotation lines, one line per variable ('Dose','rad', 4,'Dose in Si') and
+# the data lines. Blocks end with 'End of Block' or 'End of File'.
+#
+# The dose cube has the SHIELDOSE-2 doses of all results/<inc>.txt files as
+# (inclination x Al thickness x dose component) in rad, and is cached as a
+# single .npz file next to the cleaned CSV files.
+#
+
+import csv
+import os
+import sys
+import typing
+
+import numpy as np
+
+# dose components in SHIELDOSE-2 summaries, in file order
+COMPONENTS = ["total_dose", "trapped_electrons", "bremsstrahlung", "trapped_protons"]
+
+# relative to this file, so that scripts work from any directory
+RESULTS_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+CACHE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cleaned", "doses.npz")
+
+
+class Block(typing.NamedTuple):
+    # comment lines, e.g., the SPENVIS version
+    comments: typing.List[str]
+    # meta variables by name, e.g., meta["MOD_ABB"] == ["SH2"]
+    meta: typing.Dict[str, list]
+    # (name, unit, number of columns, description) per variable
+    variables: typing.List[typing.Tuple[str, str, int, str]]
+    # data lines x columns
+    data: np.ndarray
+
+
+class DoseCube(typing.NamedTuple):
+    inclinations: np.ndarray
+    # Al thickness in mm
+    thickness: np.ndarray
+    components: typing.List[str]
+    # inclinations x thickness x components, in rad
+    doses: np.ndarray
+
+
+def _record(line: str) -> list:
+    # a comma separated record with quoted strings
+    return next(csv.reader([line], quotechar="'", skipinitialspace=True))
+
+
+def _meta_value(fields: typing.List[str]) -> list:
+    # meta variables have a count: negative for -n strings, positive for
+    # n numbers followed by a unit
+    n = int(fields[0])
+
+    if n < 0:
+        return fields[1:1 - n]
+
+    return [float(v) for v in fields[1:1 + n]]
+
+
+def read_blocks(path: str) -> typing.List[Block]:
+    with open(path, "r") as f:
+        lines = f.read().splitlines()
+
+    blocks = []
+    i = 0
+
+    while i < len(lines):
+        header = _record(lines[i])
+
+        if header[0] != "*":
+            raise ValueError(f"{path}:{i + 1}: expected a block header, got {lines[i]}")
+
+        n_header, n_comments, n_meta, n_annotations, n_variables, n_columns, n_data = (int(v) for v in header[1:8])
+
+        comments = [_record(line)[0] for line in lines[i + 1:i + 1 + n_comments]]
+
+        j = i + 1 + n_comments
+        meta = {}
+        for line in lines[j:j + n_meta]:
+            fields = _record(line)
+            meta[fields[0]] = _meta_value(fields[1:])
+
+        # annotations only matter for the SPENVIS plots
+        j += n_meta + n_annotations
+
+        variables = []
+        for line in lines[j:j + n_variables]:
+            name, unit, columns, description = _record(line)[:4]
+            variables.append((name, unit, int(columns), description))
+
+        j += n_variables
+
+        if j != i + n_header:
+            raise ValueError(f"{path}:{i + 1}: header has {n_header} lines, found {j - i}")
+
+        if sum(v[2] for v in variables) != n_columns:
+            raise ValueError(f"{path}:{i + 1}: variables have {sum(v[2] for v in variables)} columns, header says {n_columns}")
+
+        data = np.loadtxt(lines[j:j + n_data], delimiter=",", ndmin=2)
+
+        if data.shape != (n_data, n_columns):
+            raise ValueError(f"{path}:{i + 1}: expected {n_data} x {n_columns} values, got {data.shape[0]} x {data.shape[1]}")
+
+        blocks.append(Block(comments, meta, variables, data))
+
+        # skip the 'End of Block' line
+        i = j + n_data + 1
+
+    return blocks
+
+
+def shieldose(path: str) -> typing.Tuple[np.ndarray, np.ndarray]:
+    # Al thickness (mm) and doses (rad, thickness x COMPONENTS) of the
+    # SHIELDOSE-2 summary block in a result file
+    for block in read_blocks(path):
+        if block.meta.get("MOD_ABB") != ["SH2"] or block.meta.get("PLT_TYP") != ["SUMMARY"]:
+            continue
+
+        units = [v[1] for v in block.variables]
+        if units != ["mm", "rad"] or block.data.shape[1] != 1 + len(COMPONENTS):
+            raise ValueError(f"{path}: unexpected SHIELDOSE-2 variables {block.variables}")
+
+        return block.data[:, 0], block.data[:, 1:]
+
+    raise ValueError(f"{path}: no SHIELDOSE-2 summary block")
+
+
+def result_files(results_folder: str) -> typing.Dict[float, str]:
+    # result files by inclination, named <inc>.txt
+    files = {}
+
+    for f in os.listdir(results_folder):
+        name, ext = os.path.splitext(f)
+        if ext == ".txt":
+            files[float(name)] = os.path.join(results_folder, f)
+
+    return dict(sorted(files.items()))
+
+
+def build(results_folder: str) -> DoseCube:
+    files = result_files(results_folder)
+
+    thickness = None
+    doses = np.empty((len(files), 0, len(COMPONENTS)))
+
+    for i, (inc, path) in enumerate(files.items()):
+        t, d = shieldose(path)
+
+        if thickness is None:
+            thickness = t
+            doses = np.empty((len(files), len(t), len(COMPONENTS)))
+        elif not np.array_equal(t, thickness):
+            raise ValueError(f"{path}: Al thicknesses differ from the other result files")
+
+        doses[i] = d
+
+    return DoseCube(np.array(list(files.keys())), thickness if thickness is not None else np.empty(0), COMPONENTS, doses)
+
+
+def save(cube: DoseCube, path: str) -> None:
+    np.savez(path, inclinations=cube.inclinations, thickness=cube.thickness, components=np.array(cube.components), doses=cube.doses)
+
+
+def load(path: str) -> DoseCube:
+    with np.load(path) as f:
+        return DoseCube(f["inclinations"], f["thickness"], f["components"].tolist(), f["doses"])
+
+
+def dose_cube(results_folder: str = RESULTS_FOLDER, cache_file: str = CACHE_FILE) -> DoseCube:
+    # the dose cube, from the cache file unless a result file is newer
+    files = result_files(results_folder)
+
+    if os.path.exists(cache_file) and all(os.path.getmtime(f) <= os.path.getmtime(cache_file) for f in files.values()):
+        cube = load(cache_file)
+
+        if np.array_equal(cube.inclinations, list(files.keys())):
+            return cube
+
+    cube = build(results_folder)
+
+    os.makedirs(os.path.dirname(os.path.abspath(cache_file)), exist_ok=True)
+    save(cube, cache_file)
+
+    return cube
+
+
+if __name__ == "__main__":
+
+    # parse arguments
+
+    if len(sys.argv) != 3:
+        print("Usage: spenvis.py <results-folder> <output-file>")
+        sys.exit(1)
+
+    results_folder = sys.argv[1]
+    output_file = sys.argv[2]
+
+    cube = build(results_folder)
+    save(cube, output_file)
+
+    print(f"{len(cube.inclinations)} inclinations x {len(cube.thickness)} thicknesses x {len(cube.components)} components")
@@ -0,0 +1,253 @@
+#
+# Copyright (c) Tobias Pfandzelter. All rights reserved.
+# Licensed under the MIT license. See LICENSE file in the project root for details.
+#
+
+# Usage: python3 availability.py <shell> <crash-rate-per-day> [trials] [output-file]
+#
+# Joint availability of ISLs and compute nodes: can a ground user reach a
+# working compute node within the latency SLO?
+#
+# For each time step, the constellation is simulated as in distances.py. Users
+# at random places on Earth connect to their closest satellite (if it is at
+# least MIN_ELEVATION above the horizon) and from there use active ISLs to get
+# to a compute node. Compute nodes crash with the given rate and are down for
+# REBOOT_TIME (see ../compute-failure), but their satellite keeps forwarding.
+#
+# The +grid topology does not change, so the CSR adjacency is built once and
+# only its weights (link distance, inf for inactive links) are updated per
+# time step. ISL distances do not depend on failures either: one Dijkstra run
+# (up to the SLO distance) per time step gives the compute nodes each user can
+# reach, and a single matrix product with the nodes that are up in each trial
+# gives the users that are served in all trials at once.
+#
+# Time steps are split into chunks that are simulated in parallel. Failures
+# are sampled once for the whole simulated time, so results do not depend on
+# the number of processes.
+
+import concurrent.futures
+import os
+import sys
+import typing
+
+import numpy as np
+import pandas as pd
+import scipy.sparse
+import scipy.sparse.csgraph
+import tqdm
+
+import config
+from simulation import kernels
+from simulation.simulation import Simulation
+
+sys.path.append(os.path.abspath(os.getcwd()))
+
+# number of ground users
+USERS = 1000
+
+# minimum elevation of the access satellite in degrees
+MIN_ELEVATION = 25.0
+
+# latency SLO in seconds, 10ms as in graphs.py
+SLO = 0.01
+
+# time a compute node is down after a crash in seconds
+REBOOT_TIME = 600
+
+TRIALS = 100
+
+# time steps per task
+CHUNK_STEPS = 600
+
+SEED = 0
+
+PERCENTILES = [5, 25, 50, 75, 95]
+
+# earth rotation in radians per second
+EARTH_ROTATION = 2 * np.pi / 86164.0905
+
+EARTH_RADIUS = config.EARTH_RADIUS_EQUATORIAL * 1000
+
+def ground_users(n: int, rng: np.random.Generator) -> np.ndarray:
+    # (n x 3) positions in meters, uniformly distributed on the surface
+    v = rng.standard_normal((n, 3))
+    return v / np.linalg.norm(v, axis=1)[:, np.newaxis] * EARTH_RADIUS
+
+def plus_grid_csr(links: np.ndarray, n: int) -> typing.Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # CSR structure (indptr, indices) of the undirected link graph, and the
+    # link index of each entry to fill in the weights
+    a = links["node_1"].astype(np.int64)
+    b = links["node_2"].astype(np.int64)
+
+    rows = np.concatenate((a, b))
+    cols = np.concatenate((b, a))
+    edges = np.concatenate((np.arange(len(links)), np.arange(len(links))))
+
+    order = np.lexsort((cols, rows))
+    indptr = np.concatenate(([0], np.cumsum(np.bincount(rows, minlength=n))))
+
+    return indptr, cols[order], edges[order]
+
+def failures(rng: np.random.Generator, n_sats: int, trials: int, crash_rate: float, reboot_time: float, duration: float, interval: float) -> typing.Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # (node, first step, end step) of the down times of n_sats x trials
+    # compute nodes, node is trial * n_sats + satellite
+    # crashes start before the first step, so some nodes may already be down
+    rate = crash_rate / 86400
+    n_crashes = rng.poisson(rate * (duration + reboot_time), n_sats * trials)
+
+    nodes = np.repeat(np.arange(n_sats * trials), n_crashes)
+    starts = rng.uniform(-reboot_time, duration, len(nodes))
+
+    # down at step k if start <= k * interval < start + reboot_time
+    first = np.maximum(np.ceil(starts / interval), 0).astype(np.int64)
+    end = np.ceil((starts + reboot_time) / interval).astype(np.int64)
+
+    keep = first < end
+    return nodes[keep], first[keep], end[keep]
+
+def _init(shell: typing.Dict, interval: float, users: np.ndarray, down: typing.Tuple[np.ndarray, np.ndarray, np.ndarray], trials: int, slo: float) -> None:
+    # runs once per worker
+    global _state
+
+    s = Simulation(planes=shell["planes"], nodes_per_plane=shell["sats"], inclination=shell["inc"], semi_major_axis=int(shell["altitude"] + config.EARTH_RADIUS_EQUATORIAL)*1000, earth_radius_equatorial=int(config.EARTH_RADIUS_EQUATORIAL * 1000), earth_radius_polar=int(config.EARTH_RADIUS_POLAR * 1000), min_communications_altitude=int(config.MIN_COMMS_ALTITUDE * 1000), model=config.MODEL, animate=False, report_status=False)
+
+    n = s.model.total_sats
+    indptr, indices, edges = plus_grid_csr(s.model.get_array_of_links(), n)
+
+    nodes, first, end = down
+
+    _state = {
+        "simulation": s,
+        "n": n,
+        "interval": interval,
+        "users": users,
+        "trials": trials,
+        "slo_distance": slo * config.C * 1000,
+        "indptr": indptr,
+        "indices": indices,
+        "edges": edges,
+        # down times sorted by first and by end step
+        "sat": (nodes % n)[np.argsort(first)],
+        "trial": (nodes // n)[np.argsort(first)],
+        "first": np.sort(first),
+        "end_sat": (nodes % n)[np.argsort(end)],
+        "end_trial": (nodes // n)[np.argsort(end)],
+        "end": np.sort(end),
+    }
+
+def _served(positions: np.ndarray, links: np.ndarray, up: np.ndarray, time: float) -> typing.Tuple[float, np.ndarray]:
+    # fraction of users with an access satellite, and fraction of users that
+    # reach a working compute node within the SLO in each trial
+    st = _state
+
+    # users rotate with the earth, satellite positions are inertial
+    angle = EARTH_ROTATION * time
+    rotation = np.array([[np.cos(angle), -np.sin(angle), 0], [np.sin(angle), np.cos(angle), 0], [0, 0, 1]])
+    users = st["users"] @ rotation.T
+
+    # closest satellite of each user, if it is high enough above the horizon
+    d2 = (users ** 2).sum(axis=1)[:, np.newaxis] - 2 * users @ positions.T + (positions ** 2).sum(axis=1)[np.newaxis, :]
+    access = np.argmin(d2, axis=1)
+
+    uplink = positions[access] - users
+    uplink_distance = np.linalg.norm(uplink, axis=1)
+    elevation = np.degrees(np.arcsin((uplink * users).sum(axis=1) / (uplink_distance * EARTH_RADIUS)))
+
+    covered = (elevation >= MIN_ELEVATION) & (uplink_distance <= st["slo_distance"])
+
+    # same CSR structure for every time step, only the weights change
+    weights = np.where(links["active"], links["distance"].astype(np.float64), np.inf)[st["edges"]]
+    graph = scipy.sparse.csr_matrix((weights, st["indices"], st["indptr"]), shape=(st["n"], st["n"]))
+
+    sources, inverse = np.unique(access[covered], return_inverse=True)
+    served = np.zeros((len(users), st["trials"]), dtype=bool)
+
+    if len(sources) > 0:
+        dist = scipy.sparse.csgraph.dijkstra(graph, directed=True, indices=sources, limit=st["slo_distance"])
+
+        # compute nodes each covered user reaches within the SLO
+        reach = dist[inverse] + uplink_distance[covered][:, np.newaxis] <= st["slo_distance"]
+
+        # any of them up in each trial
+        served[covered] = reach.astype(np.float32) @ up.astype(np.float32) > 0
+
+    return covered.mean(), served.mean(axis=0)
+
+def _simulate_chunk(chunk: typing.Tuple[int, int]) -> pd.DataFrame:
+    first_step, last_step = chunk
+    st = _state
+
+    # compute nodes that are down at the first step
+    down = np.zeros((st["n"], st["trials"]), dtype=np.int16)
+
+    i = np.searchsorted(st["first"], first_step, side="right")
+    np.add.at(down, (st["sat"][:i], st["trial"][:i]), 1)
+    j = np.searchsorted(st["end"], first_step, side="right")
+    np.subtract.at(down, (st["end_sat"][:j], st["end_trial"][:j]), 1)
+
+    rows = []
+
+    for step in range(first_step, last_step):
+        if step > first_step:
+            # crashes that start and reboots that finish at this step
+            i0, i1 = np.searchsorted(st["first"], [step, step + 1])
+            np.add.at(down, (st["sat"][i0:i1], st["trial"][i0:i1]), 1)
+            j0, j1 = np.searchsorted(st["end"], [step, step + 1])
+            np.subtract.at(down, (st["end_sat"][j0:j1], st["end_trial"][j0:j1]), 1)
+
+        time = step * st["interval"]
+
+        s = st["simulation"]
+        s.update_model(time, result_file=None)
+
+        p = s.model.get_array_of_sat_positions()
+        positions = np.column_stack((p["x"], p["y"], p["z"])).astype(np.float64)
+
+        covered, served = _served(positions, s.model.get_array_of_links(), down == 0, time)
+
+        rows.append([time, covered, served.mean()] + list(np.percentile(served, PERCENTILES)))
+
+    return pd.DataFrame(rows, columns=["t", "covered", "mean"] + [f"p{p}" for p in PERCENTILES])
+
+def run_availability(shell: typing.Dict, crash_rate: float, trials: int = TRIALS, steps: int = config.STEPS, interval: float = config.INTERVAL, users: int = USERS, slo: float = SLO, reboot_time: float = REBOOT_TIME, seed: int = SEED) -> pd.DataFrame:
+    # per time step: fraction of users with an access satellite, and the mean
+    # and percentiles over trials of the fraction of users that are served
+    rng = np.random.default_rng(seed)
+
+    total_steps = int(steps/interval)
+    n_sats = shell["planes"] * shell["sats"]
+
+    u = ground_users(users, rng)
+    down = failures(rng, n_sats, trials, crash_rate, reboot_time, total_steps * interval, interval)
+
+    chunks = [(start, min(start + CHUNK_STEPS, total_steps)) for start in range(0, total_steps, CHUNK_STEPS)]
+
+    # compile the kernels before starting workers, so that they inherit them
+    kernels.warmup()
+
+    with concurrent.futures.ProcessPoolExecutor(initializer=_init, initargs=(shell, interval, u, down, trials, slo)) as executor:
+        results = list(tqdm.tqdm(executor.map(_simulate_chunk, chunks), total=len(chunks), desc="simulating {}".format(shell["name"])))
+
+    return pd.concat(results).reset_index(drop=True)
+
+if __name__ == "__main__":
+
+    if len(sys.argv) < 3 or len(sys.argv) > 5:
+        print("Usage: python3 availability.py <shell> <crash-rate-per-day> [trials] [output-file]")
+        sys.exit(1)
+
+    shells = {s["name"]: s for s in config.SHELLS}
+
+    if sys.argv[1] not in shells:
+        print(f"unknown shell {sys.argv[1]}, use one of {', '.join(shells)}")
+        sys.exit(1)
+
+    shell = shells[sys.argv[1]]
+    crash_rate = float(sys.argv[2])
+    trials = int(sys.argv[3]) if len(sys.argv) > 3 else TRIALS
+    output_file = sys.argv[4] if len(sys.argv) > 4 else os.path.join(".", f"availability-{shell['name']}.csv")
+
+    df = run_availability(shell, crash_rate, trials)
+    df.to_csv(output_file, index=False)
+
+    print(df.describe().to_string())
@@ -9,6 +9,7 @@ import sys
 import concurrent.futures
 
 import config
+from simulation import kernels
 from simulation.simulation import Simulation
 
 sys.path.append(os.path.abspath(os.getcwd()))
@@ -51,6 +52,9 @@ if __name__ == "__main__":
         animate = True
         write = False
 
+    # compile the kernels before starting workers, so that they inherit them
+    kernels.warmup()
+
     with concurrent.futures.ProcessPoolExecutor() as executor:
         for s in config.SHELLS:
             if not s["name"] in shells:
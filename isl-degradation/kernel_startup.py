@@ -0,0 +1,78 @@
+#
+# Copyright (c) Tobias Pfandzelter. All rights reserved.
+# Licensed under the MIT license. See LICENSE file in the project root for details.
+#
+
+# Usage: python3 kernel_startup.py [repeats]
+#
+# Time until a new worker process can run the constellation kernels (see
+# simulation/kernels.py), i.e., the startup cost of each worker in
+# distances.py and availability.py:
+#
+#   - numba, no cache: every worker compiles the kernels
+#   - numba, disk cache: spawned workers load the compiled kernels from disk
+#   - numba, forked after warmup: workers inherit the compiled kernels
+#   - numpy: the fallback without numba, nothing to compile
+
+import multiprocessing as mp
+import os
+import sys
+import time
+import typing
+
+import numpy as np
+
+from simulation import kernels
+
+sys.path.append(os.path.abspath(os.getcwd()))
+
+REPEATS = 3
+
+# mode -> (start method, use numba, cache)
+MODES = {
+    "numba, no cache": ("spawn", True, False),
+    "numba, disk cache": ("spawn", True, True),
+    "numba, forked after warmup": ("fork", True, True),
+    "numpy": ("spawn", False, True),
+}
+
+def _startup(use_numba: bool, cache: bool) -> float:
+    # seconds until the kernels are ready in this process, including
+    # importing numba, which is only imported for the first kernel
+    start = time.perf_counter()
+    kernels.warmup(use_numba, cache)
+    return time.perf_counter() - start
+
+def measure(mode: str, repeats: int = REPEATS) -> typing.List[float]:
+    method, use_numba, cache = MODES[mode]
+    times = []
+
+    for _ in range(repeats):
+        # a new worker process for each repeat
+        with mp.get_context(method).Pool(1) as pool:
+            times.append(pool.apply(_startup, (use_numba, cache)))
+
+    return times
+
+if __name__ == "__main__":
+
+    if len(sys.argv) > 2:
+        print("Usage: python3 kernel_startup.py [repeats]")
+        sys.exit(1)
+
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else REPEATS
+
+    if not kernels.USING_NUMBA:
+        print("numba is not installed, only the numpy fallback can be measured")
+
+    # fill the disk cache and compile in this process, as distances.py does
+    # before it starts its workers
+    if kernels.USING_NUMBA:
+        kernels.warmup()
+
+    for mode, (method, use_numba, cache) in MODES.items():
+        if use_numba and not kernels.USING_NUMBA:
+            continue
+
+        times = measure(mode, repeats)
+        print(f"{mode:28s} median {np.median(times) * 1000:9.1f}ms  min {min(times) * 1000:9.1f}ms  max {max(times) * 1000:9.1f}ms")
@@ -27,9 +27,6 @@ import numpy as np
 import multiprocessing as mp
 from multiprocessing.connection import Connection as MultiprocessingConnection
 
-# Primarily using the write_gml() function...
-import networkx as nx
-
 # use to measure program performance (sim framerate)
 import time
 
@@ -20,24 +20,16 @@
 import numpy as np
 import numpy.typing as npt
 
-# used to calculate kepler 2 body orbits
-from PyAstronomy import pyasl
+# PyAstronomy (kepler 2 body orbits) is slow to import and only imported
+# in init_satellite_array(), when the kepler model is used
 import sgp4.api as sgp4
 
 import math
 
-import tqdm
 import typing
 
-# try to import numba funcs
-try:
-    import numba
-
-    USING_NUMBA = True
-except ModuleNotFoundError:
-    USING_NUMBA = False
-    print("you probably do not have numba installed...")
-    print("reverting to non-numba mode")
+# compiled with numba if it is installed, numpy otherwise
+from . import kernels
 
 # earth"s z axis (eg a vector in the positive z direction)
 EARTH_ROTATION_AXIS = [0, 0, 1]
@@ -236,6 +228,9 @@ class Constellation:
             for i in range(0, self.number_of_planes)
         ]
 
+        # used to calculate kepler 2 body orbits
+        from PyAstronomy import pyasl
+
         # generate a list with a kepler ellipse solver object for each plane
         self.plane_solvers = []
         for raan in raan_offsets:
@@ -533,72 +528,17 @@ class Constellation:
     def init_plus_grid_links(self, crosslink_interpolation: int = 1) -> None:
         self.number_of_isl_links = 0
 
-        temp = self.numba_init_plus_grid_links(
+        temp = kernels.get("init_plus_grid_links")(
             self.link_array,
-            self.link_array_size,
-            self.number_of_planes,
-            self.nodes_per_plane,
-            crosslink_interpolation=crosslink_interpolation,
+            int(self.link_array_size),
+            int(self.number_of_planes),
+            int(self.nodes_per_plane),
+            int(crosslink_interpolation),
         )
         if temp is not None:
             self.number_of_isl_links = temp[0]
             self.total_links = self.number_of_isl_links
 
-    @staticmethod
-    @numba.njit  # type: ignore
-    def numba_init_plus_grid_links(
-        link_array: np.ndarray,
-        link_array_size: int,
-        number_of_planes: int,
-        nodes_per_plane: int,
-        crosslink_interpolation: int = 1,
-    ) -> typing.Tuple[int]:
-
-        link_idx = 0
-
-        # add the intra-plane links
-        for plane in range(number_of_planes):
-            for node in range(nodes_per_plane):
-                node_1 = node + (plane * nodes_per_plane)
-                if node == nodes_per_plane - 1:
-                    node_2 = plane * nodes_per_plane
-                else:
-                    node_2 = node + (plane * nodes_per_plane) + 1
-
-                if link_idx < link_array_size - 1:
-                    link_array[link_idx]["node_1"] = np.int16(node_1)
-                    link_array[link_idx]["node_2"] = np.int16(node_2)
-                    link_idx = link_idx + 1
-                else:
-                    print(
-                        "❌ ERROR! ran out of room in the link array for intra-plane links"
-                    )
-                    return (0,)
-
-        # add the cross-plane links
-        for plane in range(number_of_planes):
-            if plane == number_of_planes - 1:
-                plane2 = 0
-            else:
-                plane2 = plane + 1
-            for node in range(nodes_per_plane):
-                node_1 = node + (plane * nodes_per_plane)
-                node_2 = node + (plane2 * nodes_per_plane)
-                if link_idx < link_array_size - 1:
-                    if (node_1 + 1) % crosslink_interpolation == 0:
-                        link_array[link_idx]["node_1"] = np.int16(node_1)
-                        link_array[link_idx]["node_2"] = np.int16(node_2)
-                        link_idx = link_idx + 1
-                else:
-                    print(
-                        "❌ ERROR! ran out of room in the link array for cross-plane links"
-                    )
-                    return (0,)
-
-        number_of_isl_links = link_idx
-
-        return (number_of_isl_links,)
-
     def update_plus_grid_links(
         self,
         earth_radius_equatorial: float,
@@ -621,15 +561,17 @@ class Constellation:
 
         """
 
-        temp = self.numba_update_plus_grid_links(
-            total_sats=self.total_sats,
-            satellites_array=self.satellites_array,
-            link_array=self.link_array,
-            link_array_size=self.link_array_size,
-            number_of_isl_links=self.number_of_isl_links,
-            earth_radius_equatorial=earth_radius_equatorial,
-            earth_radius_polar=earth_radius_polar,
-            min_communications_altitude=min_communications_altitude,
+        # same argument types as in kernels.warmup(), so that compiled
+        # kernels are reused
+        temp = kernels.get("update_plus_grid_links")(
+            int(self.total_sats),
+            self.satellites_array,
+            self.link_array,
+            int(self.link_array_size),
+            int(self.number_of_isl_links),
+            float(earth_radius_equatorial),
+            float(earth_radius_polar),
+            float(min_communications_altitude),
         )
 
         # # if yes, we have an issue!
@@ -637,87 +579,3 @@ class Constellation:
         #     if not link['active']:
         #         # find the height of the link above the ellipsis spanned by the two radii
         #         print(f'❌ ERROR! link between {link["node_1"]} and {link["node_2"]} is not active with height {link["height"]} (< {max(earth_radius_equatorial, earth_radius_polar) + min_communications_altitude})!')
-
-    @staticmethod
-    @numba.njit  # type: ignore
-    def numba_update_plus_grid_links(
-        total_sats: int,
-        satellites_array: np.ndarray,
-        link_array: np.ndarray,
-        link_array_size: int,
-        number_of_isl_links: int,
-        earth_radius_equatorial: float,
-        earth_radius_polar: float,
-        min_communications_altitude: float,
-    ) -> None:
-
-        for isl_idx in range(number_of_isl_links):
-            sat_1 = link_array[isl_idx]["node_1"]
-            sat_2 = link_array[isl_idx]["node_2"]
-            d = int(
-                math.sqrt(
-                    math.pow(
-                        satellites_array[sat_1]["x"] - satellites_array[sat_2]["x"], 2
-                    )
-                    + math.pow(
-                        satellites_array[sat_1]["y"] - satellites_array[sat_2]["y"], 2
-                    )
-                    + math.pow(
-                        satellites_array[sat_1]["z"] - satellites_array[sat_2]["z"], 2
-                    )
-                )
-            )
-
-            link_array[isl_idx]["distance"] = d
-
-            # caclulate the height of the triangle spanned by the two satellites and the earth
-            # check if this height is smaller than max(earth_radius_equatorial, earth_radius_polar) + min_comms_altitude
-
-            # a is distance between sat1 and 0,0,0
-            a = math.sqrt(
-                math.pow(satellites_array[sat_1]["x"], 2)
-                + math.pow(satellites_array[sat_1]["y"], 2)
-                + math.pow(satellites_array[sat_1]["z"], 2)
-            )
-
-            # b is distance between sat2 and 0,0,0
-            b = math.sqrt(
-                math.pow(satellites_array[sat_2]["x"], 2)
-                + math.pow(satellites_array[sat_2]["y"], 2)
-                + math.pow(satellites_array[sat_2]["z"], 2)
-            )
-
-            # c is distance between sat1 and sat2
-            # that's also d
-            c = math.sqrt(
-                math.pow(satellites_array[sat_1]["x"] - satellites_array[sat_2]["x"], 2)
-                + math.pow(
-                    satellites_array[sat_1]["y"] - satellites_array[sat_2]["y"], 2
-                )
-                + math.pow(
-                    satellites_array[sat_1]["z"] - satellites_array[sat_2]["z"], 2
-                )
-            )
-
-            # now derive the area of the triangle using herons formula
-            s = (a + b + c) / 2
-            A = math.sqrt(s * (s - a) * (s - b) * (s - c))
-
-            # now derive the height of the triangle
-            h = 2 * A / c
-
-            link_array[isl_idx]["height"] = h
-
-            # now check if the height is smaller than the max earth radius + min comms altitude
-
-            link_array[isl_idx]["active"] = (
-                h
-                >= max(earth_radius_equatorial, earth_radius_polar)
-                + min_communications_altitude
-            )
-
-            # # if yes, we have an issue!
-            # if not link_array[isl_idx]['active']:
-            #     # find the height of the link above the ellipsis spanned by the two radii
-            #     print('ERROR! link between sat ' + str(sat_1) + ' and sat ' + str(sat_2) + ' is too high!')
-            #     print('    height above ellipsis: ' + str(h))
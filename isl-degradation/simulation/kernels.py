@@ -0,0 +1,313 @@
+#
+# This file is part of leo-edge-failure-models
+# (https://github.com/pfandzelter/leo-edge-failure-models).
+# Copyright (c) 2023 Ben S. Kempton, Tobias Pfandzelter.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+
+# registry of the constellation kernels
+#
+# each kernel has a plain python implementation that numba compiles and a
+# vectorized numpy implementation that is used without numba. kernels are
+# compiled on first use with cache=True, so compiled code is stored next to
+# this file and later processes only load it. call warmup() in the parent
+# before starting worker processes: forked workers then inherit the compiled
+# kernels, and spawned workers find them in the on-disk cache.
+
+import importlib.util
+import math
+import typing
+
+import numpy as np
+
+# numba is only imported when the first kernel is compiled, as importing it
+# takes a while
+USING_NUMBA = importlib.util.find_spec("numba") is not None
+
+# name -> (python function for numba, numpy function)
+KERNELS: typing.Dict[str, typing.Tuple[typing.Callable, typing.Callable]] = {}
+
+# name -> kernel that is used
+_compiled: typing.Dict[str, typing.Callable] = {}
+
+
+def register(name: str, numpy_func: typing.Callable) -> typing.Callable:
+    """
+    register a kernel: the decorated function is compiled with numba, and
+    numpy_func is used if numba is not available
+    """
+
+    def decorator(func: typing.Callable) -> typing.Callable:
+        KERNELS[name] = (func, numpy_func)
+        return func
+
+    return decorator
+
+
+def get(name: str, use_numba: typing.Optional[bool] = None, cache: bool = True) -> typing.Callable:
+    """
+    the kernel called name, compiled on first use, use_numba defaults to
+    whether numba is installed
+    """
+
+    if use_numba is None:
+        use_numba = USING_NUMBA
+
+    key = f"{name}:{use_numba}:{cache}"
+
+    if key not in _compiled:
+        func, numpy_func = KERNELS[name]
+
+        if use_numba:
+            import numba
+
+            _compiled[key] = numba.njit(cache=cache)(func)
+        else:
+            _compiled[key] = numpy_func
+
+    return _compiled[key]
+
+
+###############################################################################
+# plus grid links
+
+
+def _init_plus_grid_links_numpy(
+    link_array: np.ndarray,
+    link_array_size: int,
+    number_of_planes: int,
+    nodes_per_plane: int,
+    crosslink_interpolation: int = 1,
+) -> typing.Tuple[int]:
+
+    # intra-plane links, each node to the next one in its plane
+    node = np.tile(np.arange(nodes_per_plane), number_of_planes)
+    plane = np.repeat(np.arange(number_of_planes), nodes_per_plane)
+
+    intra_1 = node + plane * nodes_per_plane
+    intra_2 = (node + 1) % nodes_per_plane + plane * nodes_per_plane
+
+    # cross-plane links, each node to the same node in the next plane
+    cross_1 = intra_1
+    cross_2 = node + ((plane + 1) % number_of_planes) * nodes_per_plane
+
+    keep = (cross_1 + 1) % crosslink_interpolation == 0
+
+    node_1 = np.concatenate((intra_1, cross_1[keep]))
+    node_2 = np.concatenate((intra_2, cross_2[keep]))
+
+    number_of_isl_links = len(node_1)
+
+    if number_of_isl_links > link_array_size - 1:
+        print("❌ ERROR! ran out of room in the link array for plus grid links")
+        return (0,)
+
+    link_array["node_1"][:number_of_isl_links] = node_1.astype(np.int16)
+    link_array["node_2"][:number_of_isl_links] = node_2.astype(np.int16)
+
+    return (number_of_isl_links,)
+
+
+@register("init_plus_grid_links", _init_plus_grid_links_numpy)
+def init_plus_grid_links(
+    link_array: np.ndarray,
+    link_array_size: int,
+    number_of_planes: int,
+    nodes_per_plane: int,
+    crosslink_interpolation: int = 1,
+) -> typing.Tuple[int]:
+
+    link_idx = 0
+
+    # add the intra-plane links
+    for plane in range(number_of_planes):
+        for node in range(nodes_per_plane):
+            node_1 = node + (plane * nodes_per_plane)
+            if node == nodes_per_plane - 1:
+                node_2 = plane * nodes_per_plane
+            else:
+                node_2 = node + (plane * nodes_per_plane) + 1
+
+            if link_idx < link_array_size - 1:
+                link_array[link_idx]["node_1"] = np.int16(node_1)
+                link_array[link_idx]["node_2"] = np.int16(node_2)
+                link_idx = link_idx + 1
+            else:
+                print(
+                    "❌ ERROR! ran out of room in the link array for intra-plane links"
+                )
+                return (0,)
+
+    # add the cross-plane links
+    for plane in range(number_of_planes):
+        if plane == number_of_planes - 1:
+            plane2 = 0
+        else:
+            plane2 = plane + 1
+        for node in range(nodes_per_plane):
+            node_1 = node + (plane * nodes_per_plane)
+            node_2 = node + (plane2 * nodes_per_plane)
+            if link_idx < link_array_size - 1:
+                if (node_1 + 1) % crosslink_interpolation == 0:
+                    link_array[link_idx]["node_1"] = np.int16(node_1)
+                    link_array[link_idx]["node_2"] = np.int16(node_2)
+                    link_idx = link_idx + 1
+            else:
+                print(
+                    "❌ ERROR! ran out of room in the link array for cross-plane links"
+                )
+                return (0,)
+
+    number_of_isl_links = link_idx
+
+    return (number_of_isl_links,)
+
+
+def _update_plus_grid_links_numpy(
+    total_sats: int,
+    satellites_array: np.ndarray,
+    link_array: np.ndarray,
+    link_array_size: int,
+    number_of_isl_links: int,
+    earth_radius_equatorial: float,
+    earth_radius_polar: float,
+    min_communications_altitude: float,
+) -> None:
+
+    links = link_array[:number_of_isl_links]
+
+    sat_1 = satellites_array[links["node_1"]]
+    sat_2 = satellites_array[links["node_2"]]
+
+    p1 = np.column_stack((sat_1["x"], sat_1["y"], sat_1["z"])).astype(np.float64)
+    p2 = np.column_stack((sat_2["x"], sat_2["y"], sat_2["z"])).astype(np.float64)
+
+    # same operations and order as the numba kernel, so results are identical
+    diff = p1 - p2
+    c = np.sqrt(diff[:, 0] ** 2 + diff[:, 1] ** 2 + diff[:, 2] ** 2)
+
+    link_array["distance"][:number_of_isl_links] = c.astype(np.int64)
+
+    a = np.sqrt(p1[:, 0] ** 2 + p1[:, 1] ** 2 + p1[:, 2] ** 2)
+    b = np.sqrt(p2[:, 0] ** 2 + p2[:, 1] ** 2 + p2[:, 2] ** 2)
+
+    # height of the triangle spanned by the two satellites and the earth
+    # center, with herons formula for its area
+    s = (a + b + c) / 2
+    A = np.sqrt(s * (s - a) * (s - b) * (s - c))
+    h = 2 * A / c
+
+    link_array["height"][:number_of_isl_links] = h.astype(np.int32)
+    link_array["active"][:number_of_isl_links] = h >= max(earth_radius_equatorial, earth_radius_polar) + min_communications_altitude
+
+
+@register("update_plus_grid_links", _update_plus_grid_links_numpy)
+def update_plus_grid_links(
+    total_sats: int,
+    satellites_array: np.ndarray,
+    link_array: np.ndarray,
+    link_array_size: int,
+    number_of_isl_links: int,
+    earth_radius_equatorial: float,
+    earth_radius_polar: float,
+    min_communications_altitude: float,
+) -> None:
+
+    for isl_idx in range(number_of_isl_links):
+        sat_1 = link_array[isl_idx]["node_1"]
+        sat_2 = link_array[isl_idx]["node_2"]
+        d = int(
+            math.sqrt(
+                math.pow(
+                    satellites_array[sat_1]["x"] - satellites_array[sat_2]["x"], 2
+                )
+                + math.pow(
+                    satellites_array[sat_1]["y"] - satellites_array[sat_2]["y"], 2
+                )
+                + math.pow(
+                    satellites_array[sat_1]["z"] - satellites_array[sat_2]["z"], 2
+                )
+            )
+        )
+
+        link_array[isl_idx]["distance"] = d
+
+        # caclulate the height of the triangle spanned by the two satellites and the earth
+        # check if this height is smaller than max(earth_radius_equatorial, earth_radius_polar) + min_comms_altitude
+
+        # a is distance between sat1 and 0,0,0
+        a = math.sqrt(
+            math.pow(satellites_array[sat_1]["x"], 2)
+            + math.pow(satellites_array[sat_1]["y"], 2)
+            + math.pow(satellites_array[sat_1]["z"], 2)
+        )
+
+        # b is distance between sat2 and 0,0,0
+        b = math.sqrt(
+            math.pow(satellites_array[sat_2]["x"], 2)
+            + math.pow(satellites_array[sat_2]["y"], 2)
+            + math.pow(satellites_array[sat_2]["z"], 2)
+        )
+
+        # c is distance between sat1 and sat2
+        # that's also d
+        c = math.sqrt(
+            math.pow(satellites_array[sat_1]["x"] - satellites_array[sat_2]["x"], 2)
+            + math.pow(
+                satellites_array[sat_1]["y"] - satellites_array[sat_2]["y"], 2
+            )
+            + math.pow(
+                satellites_array[sat_1]["z"] - satellites_array[sat_2]["z"], 2
+            )
+        )
+
+        # now derive the area of the triangle using herons formula
+        s = (a + b + c) / 2
+        A = math.sqrt(s * (s - a) * (s - b) * (s - c))
+
+        # now derive the height of the triangle
+        h = 2 * A / c
+
+        link_array[isl_idx]["height"] = h
+
+        # now check if the height is smaller than the max earth radius + min comms altitude
+
+        link_array[isl_idx]["active"] = (
+            h
+            >= max(earth_radius_equatorial, earth_radius_polar)
+            + min_communications_altitude
+        )
+
+
+###############################################################################
+# warmup
+
+
+def warmup(use_numba: typing.Optional[bool] = None, cache: bool = True) -> None:
+    """
+    compile all kernels by calling them on a tiny constellation with the
+    same argument types as Constellation uses
+    """
+
+    from .constellation import LINK_DTYPE, SATELLITE_DTYPE
+
+    satellites_array = np.zeros(4, dtype=SATELLITE_DTYPE)
+    satellites_array["x"] = [7000000, 0, -7000000, 0]
+    satellites_array["y"] = [0, 7000000, 0, -7000000]
+
+    link_array = np.zeros(16, dtype=LINK_DTYPE)
+
+    (n,) = get("init_plus_grid_links", use_numba, cache)(link_array, len(link_array), 2, 2, 1)
+
+    get("update_plus_grid_links", use_numba, cache)(len(satellites_array), satellites_array, link_array, len(link_array), n, 6378000.0, 6357000.0, 80000.0)
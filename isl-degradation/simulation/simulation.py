@@ -27,17 +27,6 @@ import time
 
 import typing
 
-# try to import numba funcs
-try:
-    import numba
-
-    # import numba_funcs as nf
-    USING_NUMBA = True
-except ModuleNotFoundError:
-    USING_NUMBA = False
-    print("you probably do not have numba installed...")
-    print("reverting to non-numba mode")
-
 
 ###############################################################################
 #                               GLOBAL VARS                                   #
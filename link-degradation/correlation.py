@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+#
+# Correlation of weather and network performance
+#
+# Usage: correlation.py <ping-store> <speed-test-folder> <weather-file> [output-file]
+#
+# Pings and speed tests are aggregated to hourly means (see hourly.py) and
+# aligned with the hourly weather data on the weather's index once. For all
+# pairs of weather and network variables at once, this gives:
+#
+#   - Spearman rank correlations, using all hours where both are known
+#   - lagged rank correlations, with the network shifted by up to LAGS hours
+#     against the weather (positive lag: network after weather)
+#   - distributions of the network variables per weathercode
+#   - bootstrap confidence intervals of the correlations without lag
+#
+# Hours are not independent (weather changes slowly), so the bootstrap
+# resamples blocks of BLOCK consecutive hours. Bootstrap samples are split
+# into batches with their own seeds that run in parallel, so results only
+# depend on the seed and not on the number of processes.
+#
+
+import multiprocessing as mp
+import sys
+import typing
+
+import numpy as np
+import pandas as pd
+import scipy.stats
+import tqdm
+
+import hourly
+import pings
+import speedtest
+
+WEATHER_COLUMNS = ["temperature_2m_C", "precipitation_mm", "rain_mm", "cloudcover_perc", "cloudcover_low_perc", "cloudcover_mid_perc", "cloudcover_high_perc"]
+PING_COLUMNS = ["time_ms"]
+BANDWIDTH_COLUMNS = ["packetLoss", "ping_jitter", "ping_latency", "download_bandwidth", "upload_bandwidth"]
+
+# outliers in pings, see analyze.ipynb
+PING_TRIM = 99
+
+# lags in hours
+LAGS = range(-6, 7)
+
+BOOTSTRAP = 1000
+# bootstrap samples per batch, each batch is one task for a worker process
+BATCH_SAMPLES = 50
+# hours per bootstrap block
+BLOCK = 24
+CONFIDENCE = 95
+SEED = 0
+
+PERCENTILES = [5, 25, 50, 75, 95]
+
+# fewest hours for a correlation
+MIN_HOURS = 3
+
+
+def read_weather(path: str) -> pd.DataFrame:
+    df = pd.read_csv(path)
+    df["timestamp"] = pd.to_datetime(df["time"])
+    return df.drop(columns=["time"]).set_index("timestamp").sort_index()
+
+
+def align(df_weather: pd.DataFrame, df_ping: pd.DataFrame, df_bandwidth: pd.DataFrame, ping_trim: typing.Optional[float] = PING_TRIM) -> pd.DataFrame:
+    # hourly weather (indexed by timestamp) with the hourly means of the
+    # network variables, network columns are prefixed with "ping_" and
+    # "speedtest_", hours without measurements are NaN
+    df_ping_hourly = hourly.aggregate(df_ping, PING_COLUMNS, trim=ping_trim).stats["mean"].add_prefix("ping_")
+    df_bandwidth_hourly = hourly.aggregate(df_bandwidth, BANDWIDTH_COLUMNS).stats["mean"].add_prefix("speedtest_")
+
+    df = df_weather.copy()
+    df.index.name = "timestamp"
+
+    for df_network in (df_ping_hourly, df_bandwidth_hourly):
+        df_network.index.name = "timestamp"
+        df = df.join(df_network, how="left")
+
+    return df
+
+
+def network_columns(df: pd.DataFrame) -> typing.List[str]:
+    return [c for c in df.columns if c.startswith("ping_") or c.startswith("speedtest_")]
+
+
+def spearman(x: np.ndarray, y: np.ndarray) -> typing.Tuple[np.ndarray, np.ndarray]:
+    # (p x q) rank correlations and number of hours between the columns of
+    # x (n x p) and y (n x q), using the rows where the row of x and the
+    # value of y are known
+    x_known = ~np.isnan(x).any(axis=1)
+
+    rho = np.full((x.shape[1], y.shape[1]), np.nan)
+    n = np.zeros(y.shape[1], dtype=np.int64)
+
+    # columns of y with the same missing hours share the ranks of x
+    ranked = {}
+
+    for j in range(y.shape[1]):
+        m = x_known & ~np.isnan(y[:, j])
+        n[j] = m.sum()
+
+        if n[j] < MIN_HOURS:
+            continue
+
+        key = m.tobytes()
+        if key not in ranked:
+            rx = scipy.stats.rankdata(x[m], axis=0)
+            rx -= rx.mean(axis=0)
+            ranked[key] = (rx, np.sqrt((rx ** 2).sum(axis=0)))
+
+        rx, rx_norm = ranked[key]
+
+        ry = scipy.stats.rankdata(y[m, j])
+        ry -= ry.mean()
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            rho[:, j] = (rx * ry[:, np.newaxis]).sum(axis=0) / (rx_norm * np.sqrt((ry ** 2).sum()))
+
+    return rho, n
+
+
+def _lagged(df: pd.DataFrame, columns: typing.List[str], lags: typing.Iterable[int]) -> typing.Tuple[np.ndarray, typing.List[typing.Tuple[str, int]]]:
+    # (n x len(columns) * len(lags)) network values shifted on the shared
+    # hourly index, value at hour t is the one at hour t + lag
+    values = []
+    keys = []
+
+    for lag in lags:
+        for col in columns:
+            values.append(df[col].shift(-lag).to_numpy(dtype=np.float64))
+            keys.append((col, lag))
+
+    return np.column_stack(values), keys
+
+
+def lagged_correlations(df: pd.DataFrame, weather_columns: typing.List[str] = WEATHER_COLUMNS, lags: typing.Iterable[int] = LAGS) -> pd.DataFrame:
+    # rank correlation of each weather and network variable at each lag
+    network = network_columns(df)
+
+    y, keys = _lagged(df, network, lags)
+    rho, n = spearman(df[weather_columns].to_numpy(dtype=np.float64), y)
+
+    rows = []
+    for i, w in enumerate(weather_columns):
+        for j, (col, lag) in enumerate(keys):
+            rows.append((w, col, lag, n[j], rho[i, j]))
+
+    return pd.DataFrame(rows, columns=["weather", "network", "lag", "hours", "rho"])
+
+
+def _bootstrap_batch(arg: typing.Tuple) -> np.ndarray:
+    # (samples x p x q) rank correlations of block bootstrap samples
+    seed, samples, x, y, block = arg
+
+    rng = np.random.default_rng(seed)
+    n = len(x)
+    block = min(block, n)
+
+    result = np.empty((samples, x.shape[1], y.shape[1]))
+
+    for s in range(samples):
+        starts = rng.integers(0, n - block + 1, -(-n // block))
+        idx = (starts[:, np.newaxis] + np.arange(block)).ravel()[:n]
+        result[s] = spearman(x[idx], y[idx])[0]
+
+    return result
+
+
+def bootstrap(df: pd.DataFrame, weather_columns: typing.List[str] = WEATHER_COLUMNS, samples: int = BOOTSTRAP, block: int = BLOCK, confidence: float = CONFIDENCE, seed: int = SEED, batch_samples: int = BATCH_SAMPLES) -> typing.Tuple[np.ndarray, np.ndarray]:
+    # (p x q) lower and upper bounds of the confidence intervals of the rank
+    # correlations without lag, network columns as in network_columns(df)
+    x = df[weather_columns].to_numpy(dtype=np.float64)
+    y = df[network_columns(df)].to_numpy(dtype=np.float64)
+
+    sizes = [min(batch_samples, samples - i) for i in range(0, samples, batch_samples)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+
+    args = [(sd, k, x, y, block) for sd, k in zip(seeds, sizes)]
+
+    with mp.Pool() as pool:
+        results = list(tqdm.tqdm(pool.imap(_bootstrap_batch, args), total=len(args), desc="bootstrapping"))
+
+        pool.close()
+        pool.join()
+
+    rho = np.concatenate(results)
+    alpha = (100 - confidence) / 2
+
+    # samples with too few hours for a column are left out
+    return np.nanpercentile(rho, alpha, axis=0), np.nanpercentile(rho, 100 - alpha, axis=0)
+
+
+def correlate(df: pd.DataFrame, weather_columns: typing.List[str] = WEATHER_COLUMNS, lags: typing.Iterable[int] = LAGS, samples: int = BOOTSTRAP, block: int = BLOCK, confidence: float = CONFIDENCE, seed: int = SEED) -> pd.DataFrame:
+    # lagged rank correlations, with confidence intervals (ci_low, ci_high)
+    # for lag 0
+    df_corr = lagged_correlations(df, weather_columns, lags)
+
+    low, high = bootstrap(df, weather_columns, samples, block, confidence, seed)
+    network = network_columns(df)
+
+    df_ci = pd.DataFrame([(w, col, 0, low[i, j], high[i, j]) for i, w in enumerate(weather_columns) for j, col in enumerate(network)], columns=["weather", "network", "lag", "ci_low", "ci_high"])
+
+    return df_corr.merge(df_ci, on=["weather", "network", "lag"], how="left")
+
+
+def by_weathercode(df: pd.DataFrame, percentiles: typing.Sequence[float] = PERCENTILES) -> pd.DataFrame:
+    # count, mean, and percentiles of each network variable per weathercode,
+    # with (variable, stat) columns
+    grouped = df.groupby("weathercode")[network_columns(df)]
+
+    stats = {"count": grouped.count(), "mean": grouped.mean()}
+    for p in percentiles:
+        stats[f"p{p:g}"] = grouped.quantile(p / 100)
+
+    return pd.concat(stats, axis=1).swaplevel(axis=1).sort_index(axis=1, level=0, sort_remaining=False)
+
+
+if __name__ == "__main__":
+
+    # parse arguments
+
+    if len(sys.argv) not in (4, 5):
+        print("Usage: correlation.py <ping-store> <speed-test-folder> <weather-file> [output-file]")
+        sys.exit(1)
+
+    store_dir = sys.argv[1]
+    speedtest_folder = sys.argv[2]
+    weather_file = sys.argv[3]
+    output_file = sys.argv[4] if len(sys.argv) > 4 else None
+
+    df_weather = read_weather(weather_file)
+    start, end = df_weather.index.min(), df_weather.index.max() + pd.Timedelta(hourly.FREQ)
+
+    df_ping = pings.read(store_dir, start, end, columns=["timestamp"] + PING_COLUMNS)
+
+    df_bandwidth = speedtest.load(speedtest_folder, speedtest_folder.rstrip("/") + ".parquet")
+    # weather and pings are without timezone
+    df_bandwidth["timestamp"] = df_bandwidth["timestamp"].dt.tz_localize(None)
+
+    df = align(df_weather, df_ping, df_bandwidth)
+    df_corr = correlate(df)
+
+    if output_file is None:
+        print(df_corr[df_corr["lag"] == 0].to_string(index=False))
+        print(by_weathercode(df).to_string())
+    else:
+        df_corr.to_csv(output_file, index=False)
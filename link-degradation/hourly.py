@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+#
+# Hourly statistics of network measurements
+#
+# Usage: hourly.py <ping-store> <output-file> [trim-percentile]
+#
+# The weather data is hourly, so pings and speed tests are aggregated to the
+# same level: count, mean, and percentiles of each column per hour bucket.
+#
+# Timestamps are binned to hours once and all statistics come from a single
+# pass over the buckets: outliers above a global percentile (e.g., 99) are
+# masked out with one selection instead of a full sort, the values of each
+# hour are sorted in place, and then means are a single np.add.reduceat and
+# percentiles are read from each bucket by position (linear interpolation, as
+# in pandas). Empty hours are kept with a count of 0, as with pd.Grouper.
+#
+
+import sys
+import typing
+
+import numpy as np
+import pandas as pd
+
+import pings
+
+FREQ = "1h"
+PERCENTILES = [25, 75]
+
+
+class Aggregate(typing.NamedTuple):
+    # statistics per hour with (stat, column) columns, stat is one of
+    # "count", "mean", and "p<percentile>"
+    stats: pd.DataFrame
+    # outlier limit of each column, values at or above it were left out
+    limits: typing.Dict[str, float]
+
+
+def _bucket_percentiles(values: np.ndarray, starts: np.ndarray, counts: np.ndarray, p: float) -> np.ndarray:
+    # percentile of each bucket of values that are sorted within buckets
+    h = (counts - 1) * p / 100
+    lo = np.floor(h).astype(np.int64)
+    hi = np.minimum(lo + 1, counts - 1)
+    return values[starts + lo] + (values[starts + hi] - values[starts + lo]) * (h - lo)
+
+
+def aggregate(df: pd.DataFrame, columns: typing.List[str], key: str = "timestamp", freq: str = FREQ, percentiles: typing.Sequence[float] = PERCENTILES, trim: typing.Optional[float] = None) -> Aggregate:
+    # hourly (or freq) statistics of columns, same buckets as
+    # df.groupby(pd.Grouper(key=key, freq=freq)), including empty ones
+    # with trim, values at or above that percentile of each column are left out
+    width = pd.Timedelta(freq).value
+
+    times = df[key]
+    tz = getattr(times.dt, "tz", None)
+    bins = times.to_numpy(dtype="datetime64[ns]").view(np.int64) // width
+
+    if len(bins) > 0:
+        first, last = bins.min(), bins.max()
+    else:
+        first, last = 0, -1
+
+    n_buckets = int(last - first + 1)
+    bins = bins - first
+
+    index = pd.DatetimeIndex((np.arange(n_buckets, dtype=np.int64) + first) * width, name=key)
+    if tz is not None:
+        index = index.tz_localize("UTC").tz_convert(tz)
+
+    # measurements are usually sorted by time already
+    order = None
+    if np.any(bins[1:] < bins[:-1]):
+        order = np.argsort(bins, kind="stable")
+        bins = bins[order]
+
+    stats = {}
+    limits = {}
+
+    for col in columns:
+        values = df[col].to_numpy(dtype=np.float64)
+        if order is not None:
+            values = values[order]
+
+        keep = ~np.isnan(values)
+
+        if trim is not None and keep.any():
+            limits[col] = float(np.percentile(values[keep], trim))
+            keep &= values < limits[col]
+
+        v = values[keep]
+        b = bins[keep]
+
+        counts = np.bincount(b, minlength=n_buckets)
+        starts = np.cumsum(counts) - counts
+        full = counts > 0
+
+        # sort the values of each hour in place, cheap for hourly buckets
+        for start, end in zip(starts[full].tolist(), (starts + counts)[full].tolist()):
+            v[start:end].sort()
+
+        stats[("count", col)] = counts
+
+        mean = np.full(n_buckets, np.nan)
+        if len(v) > 0:
+            mean[full] = np.add.reduceat(v, starts[full]) / counts[full]
+        stats[("mean", col)] = mean
+
+        for p in percentiles:
+            q = np.full(n_buckets, np.nan)
+            q[full] = _bucket_percentiles(v, starts[full], counts[full], p)
+            stats[(f"p{p:g}", col)] = q
+
+    return Aggregate(pd.DataFrame(stats, index=index), limits)
+
+
+if __name__ == "__main__":
+
+    # parse arguments
+
+    if len(sys.argv) not in (3, 4):
+        print("Usage: hourly.py <ping-store> <output-file> [trim-percentile]")
+        sys.exit(1)
+
+    store_dir = sys.argv[1]
+    output_file = sys.argv[2]
+    trim = float(sys.argv[3]) if len(sys.argv) > 3 else None
+
+    result = aggregate(pings.read(store_dir, columns=["timestamp", "time_ms"]), ["time_ms"], trim=trim)
+
+    df = result.stats
+    df.columns = [f"{col}_{stat}" for stat, col in df.columns]
+    df.to_csv(output_file)
+
+    print(f"aggregated {int(df['time_ms_count'].sum())} pings into {len(df)} hours, limits {result.limits}")
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+#
+# Incremental store for the UC Louvain ping data
+#
+# Usage: pings.py <input-folder> <store-dir>
+#
+# The store has one folder per day (YYYY-MM-DD) with one parquet file for
+# each source file that has pings on that day, and a manifest (ingested.json)
+# with the size and modification time of every source file that has been
+# ingested. Ingesting again only parses files that are new or have changed
+# since, so adding measurement days only costs time for the new files.
+#
+# Reading a time range only opens the folders of the days in that range.
+#
+
+import glob
+import json
+import multiprocessing as mp
+import os
+import sys
+import typing
+
+import pandas as pd
+import tqdm
+
+DATA_FOLDER = os.path.join(".", "uclouvain-data", "ping")
+STORE_DIR = os.path.join(".", "uclouvain-data", "ping-store")
+
+MANIFEST = "ingested.json"
+
+DAY_FORMAT = "%Y-%m-%d"
+
+
+def parse_file(path: str) -> pd.DataFrame:
+    # same as in network.ipynb: incomplete lines (e.g., timeouts) are dropped
+    df = pd.read_json(path, lines=True)
+    df.dropna(inplace=True)
+    df["timestamp"] = pd.to_datetime(df["timestamp"])
+
+    return df
+
+
+def _manifest(store_dir: str) -> typing.Dict[str, typing.Dict]:
+    path = os.path.join(store_dir, MANIFEST)
+
+    if not os.path.exists(path):
+        return {}
+
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def _write_manifest(store_dir: str, manifest: typing.Dict[str, typing.Dict]) -> None:
+    # replace atomically, so an interrupted run does not lose the manifest
+    path = os.path.join(store_dir, MANIFEST)
+
+    with open(path + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+
+    os.replace(path + ".tmp", path)
+
+
+def _source(path: str) -> typing.Dict:
+    return {"size": os.path.getsize(path), "mtime": os.path.getmtime(path)}
+
+
+def _ingest_file(arg: typing.Tuple[str, str]) -> typing.Tuple[str, typing.List[str], int]:
+    # parse a source file and write its pings into the folder of each day
+    path, store_dir = arg
+    name = os.path.splitext(os.path.basename(path))[0]
+
+    df = parse_file(path)
+    days = []
+
+    for day, df_day in df.groupby(df["timestamp"].dt.strftime(DAY_FORMAT), sort=True):
+        os.makedirs(os.path.join(store_dir, day), exist_ok=True)
+        df_day.sort_values("timestamp").to_parquet(os.path.join(store_dir, day, f"{name}.parquet"), index=False)
+        days.append(day)
+
+    return os.path.basename(path), days, len(df)
+
+
+def _remove(store_dir: str, name: str, entry: typing.Dict) -> None:
+    # remove the parts of a source file, e.g., because it has changed
+    stem = os.path.splitext(name)[0]
+
+    for day in entry["days"]:
+        part = os.path.join(store_dir, day, f"{stem}.parquet")
+        if os.path.exists(part):
+            os.remove(part)
+
+
+def ingest(data_folder: str = DATA_FOLDER, store_dir: str = STORE_DIR) -> int:
+    # add new and changed source files to the store, returns the number of
+    # files that were parsed
+    os.makedirs(store_dir, exist_ok=True)
+
+    manifest = _manifest(store_dir)
+    files = {os.path.basename(f): f for f in sorted(glob.glob(os.path.join(data_folder, "ping*.jl")))}
+
+    todo = []
+    for name, path in files.items():
+        entry = manifest.get(name)
+        source = _source(path)
+
+        if entry is not None and entry["size"] == source["size"] and entry["mtime"] == source["mtime"]:
+            continue
+
+        if entry is not None:
+            _remove(store_dir, name, entry)
+            del manifest[name]
+
+        todo.append(path)
+
+    if len(todo) == 0:
+        return 0
+
+    with mp.Pool() as pool:
+        for name, days, rows in tqdm.tqdm(pool.imap_unordered(_ingest_file, [(path, store_dir) for path in todo]), total=len(todo), desc="ingesting pings"):
+            manifest[name] = {**_source(files[name]), "days": days, "rows": rows}
+
+            # record each file as soon as it is done
+            _write_manifest(store_dir, manifest)
+
+        pool.close()
+        pool.join()
+
+    return len(todo)
+
+
+def days(store_dir: str = STORE_DIR) -> typing.List[str]:
+    return sorted(d for d in os.listdir(store_dir) if os.path.isdir(os.path.join(store_dir, d)))
+
+
+def read(store_dir: str = STORE_DIR, start=None, end=None, columns: typing.Optional[typing.List[str]] = None) -> pd.DataFrame:
+    # pings with start <= timestamp < end, sorted by timestamp
+    start = None if start is None else pd.Timestamp(start)
+    end = None if end is None else pd.Timestamp(end)
+
+    first = None if start is None else start.strftime(DAY_FORMAT)
+    last = None if end is None else end.strftime(DAY_FORMAT)
+
+    parts = []
+    for day in days(store_dir):
+        if (first is not None and day < first) or (last is not None and day > last):
+            continue
+
+        parts += sorted(glob.glob(os.path.join(store_dir, day, "*.parquet")))
+
+    if len(parts) == 0:
+        return pd.DataFrame(columns=columns or [])
+
+    df = pd.concat([pd.read_parquet(p, columns=columns) for p in parts], ignore_index=True)
+
+    if start is not None:
+        df = df[df["timestamp"] >= start]
+    if end is not None:
+        df = df[df["timestamp"] < end]
+
+    return df.sort_values("timestamp", kind="stable").reset_index(drop=True)
+
+
+if __name__ == "__main__":
+
+    # parse arguments
+
+    if len(sys.argv) != 3:
+        print("Usage: pings.py <input-folder> <store-dir>")
+        sys.exit(1)
+
+    input_folder = sys.argv[1]
+    store_dir = sys.argv[2]
+
+    n = ingest(input_folder, store_dir)
+
+    print(f"ingested {n} new or changed files, {len(_manifest(store_dir))} files in {store_dir}")
@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+#
+# Rain and cloud attenuation of satellite links, and synthetic traces
+#
+# Usage: rain_fade.py [--synthetic <hours> <sites>] <weather-file> <frequency-GHz> <elevation-deg> [output-file]
+#
+# Attenuation follows ITU-R P.618 for rain: the specific attenuation
+# k * R^alpha (P.838-3) over the effective slant path through the rain below
+# the rain height, with the horizontal and vertical path reductions of
+# P.618 Section 2.2.1.1. P.618 defines the path reduction for the rain rate
+# exceeded 0.01% of the time; here it is applied to each rain rate of a time
+# series instead. Hourly weather data gives hourly mean rain rates, which
+# underestimate short fades.
+#
+# Clouds add the P.840 liquid water attenuation, with the liquid water
+# content of the cloud column estimated from the cloud cover (CLOUD_WATER
+# kg/m2 at full cover).
+#
+# All functions take arrays of (time steps x sites), or anything that
+# broadcasts to it, e.g., an elevation per site. Elevations below
+# MIN_ELEVATION (no link) give NaN.
+#
+# Synthetic rain follows the model of ITU-R P.1853: a Gaussian process per
+# site (correlated in time and between sites) that rains when it exceeds a
+# threshold, with log-normal rain rates. Its parameters are fitted to a rain
+# rate series, e.g., weather.csv, so long periods of weather like the
+# measured one (or with the rain parameters changed) can be simulated.
+#
+
+import sys
+import typing
+
+import numpy as np
+import pandas as pd
+import scipy.signal
+import scipy.special
+
+# Louvain-la-Neuve, see README
+LATITUDE = 50.67
+# site altitude in km
+SITE_ALTITUDE = 0.16
+# rain height in km, 0 degree isotherm (P.839) + 0.36 km
+RAIN_HEIGHT = 3.0
+
+# Starlink user downlink (Ku band) in GHz
+FREQUENCY = 12.0
+# polarization tilt in degrees, 45 for circular polarization
+TILT = 45.0
+
+# P.618 is valid above 5 degrees
+MIN_ELEVATION = 5.0
+
+# liquid water of the cloud column in kg/m2 at full cloud cover
+CLOUD_WATER = 0.5
+# cloud temperature in K
+CLOUD_TEMPERATURE = 273.15
+
+# correlation of the P.1853 Gaussian process between hours,
+# exp(-beta * 3600) with beta = 2e-4 / s
+HOURLY_CORRELATION = float(np.exp(-2e-4 * 3600))
+
+SEED = 0
+
+# P.838-3 coefficients (a, b, c) of the Gaussians and (m, c) of the line
+P838 = {
+    "kh": ([-5.33980, -0.35351, -0.23789, -0.94158], [-0.10008, 1.26970, 0.86036, 0.64552], [1.13098, 0.45400, 0.15354, 0.16817], -0.18961, 0.71147),
+    "kv": ([-3.80595, -3.44965, -0.39902, 0.50167], [0.56934, -0.22911, 0.73042, 1.07319], [0.81061, 0.51059, 0.11899, 0.27195], -0.16398, 0.63297),
+    "ah": ([-0.14318, 0.29591, 0.32177, -5.37610, 16.1721], [1.82442, 0.77564, 0.63773, -0.96230, -3.29980], [-0.55187, 0.19822, 0.13164, 1.47828, 3.43990], 0.67849, -1.95537),
+    "av": ([-0.07771, 0.56727, -0.20238, -48.2991, 48.5833], [2.33840, 0.95545, 1.14520, 0.791669, 0.791459], [-0.76284, 0.54039, 0.26809, 0.116226, 0.116479], -0.053739, 0.83433),
+}
+
+
+class RainModel(typing.NamedTuple):
+    # probability of rain in an hour
+    p_rain: float
+    # mean and standard deviation of the log of rain rates (mm/h)
+    m: float
+    s: float
+
+
+def _p838(name: str, frequency: float) -> float:
+    a, b, c, m, c0 = P838[name]
+    x = np.log10(frequency)
+    return float(np.sum(np.asarray(a) * np.exp(-((x - np.asarray(b)) / np.asarray(c)) ** 2)) + m * x + c0)
+
+
+def coefficients(frequency: float, elevation: typing.Union[float, np.ndarray], tilt: float = TILT) -> typing.Tuple[np.ndarray, np.ndarray]:
+    # k and alpha of the specific attenuation k * R^alpha (dB/km) at the
+    # frequency in GHz
+    kh, kv = 10 ** _p838("kh", frequency), 10 ** _p838("kv", frequency)
+    ah, av = _p838("ah", frequency), _p838("av", frequency)
+
+    t = np.cos(np.radians(elevation)) ** 2 * np.cos(np.radians(2 * tilt))
+
+    k = (kh + kv + (kh - kv) * t) / 2
+    alpha = (kh * ah + kv * av + (kh * ah - kv * av) * t) / (2 * k)
+
+    return k, alpha
+
+
+def rain_attenuation(rain: np.ndarray, elevation: np.ndarray, frequency: float = FREQUENCY, latitude: typing.Union[float, np.ndarray] = LATITUDE, site_altitude: typing.Union[float, np.ndarray] = SITE_ALTITUDE, rain_height: typing.Union[float, np.ndarray] = RAIN_HEIGHT, tilt: float = TILT) -> np.ndarray:
+    # attenuation in dB for rain rates in mm/h and elevations in degrees
+    rain = np.asarray(rain, dtype=np.float64)
+    elevation = np.asarray(elevation, dtype=np.float64)
+    theta = np.radians(np.where(elevation >= MIN_ELEVATION, elevation, np.nan))
+
+    k, alpha = coefficients(frequency, elevation, tilt)
+    gamma = k * np.maximum(rain, 0) ** alpha
+
+    # slant path below the rain height and its horizontal projection (km)
+    h = np.maximum(np.asarray(rain_height) - np.asarray(site_altitude), 0)
+    ls = h / np.sin(theta)
+    lg = ls * np.cos(theta)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        # horizontal reduction
+        r = 1 / (1 + 0.78 * np.sqrt(lg * gamma / frequency) - 0.38 * (1 - np.exp(-2 * lg)))
+
+        zeta = np.arctan2(h, lg * r)
+        lr = np.where(zeta > theta, lg * r / np.cos(theta), ls)
+
+        # vertical adjustment
+        chi = np.maximum(36 - np.abs(latitude), 0)
+        v = 1 / (1 + np.sqrt(np.sin(theta)) * (31 * (1 - np.exp(-np.degrees(theta) / (1 + chi))) * np.sqrt(lr * gamma) / frequency ** 2 - 0.45))
+
+    # no rain, no attenuation (the reductions are 0/0 there)
+    return np.where((gamma == 0) & ~np.isnan(theta), 0.0, gamma * lr * v)
+
+
+def cloud_coefficient(frequency: float, temperature: float = CLOUD_TEMPERATURE) -> float:
+    # P.840 specific attenuation coefficient of liquid water in
+    # (dB/km)/(g/m3), double Debye model
+    theta = 300 / temperature
+
+    e0 = 77.66 + 103.3 * (theta - 1)
+    e1 = 0.0671 * e0
+    e2 = 3.52
+
+    fp = 20.20 - 146 * (theta - 1) + 316 * (theta - 1) ** 2
+    fs = 39.8 * fp
+
+    e_imag = frequency * (e0 - e1) / (fp * (1 + (frequency / fp) ** 2)) + frequency * (e1 - e2) / (fs * (1 + (frequency / fs) ** 2))
+    e_real = (e0 - e1) / (1 + (frequency / fp) ** 2) + (e1 - e2) / (1 + (frequency / fs) ** 2) + e2
+
+    eta = (2 + e_real) / e_imag
+
+    return 0.819 * frequency / (e_imag * (1 + eta ** 2))
+
+
+def cloud_attenuation(cloud_cover: np.ndarray, elevation: np.ndarray, frequency: float = FREQUENCY, cloud_water: float = CLOUD_WATER) -> np.ndarray:
+    # attenuation in dB for cloud cover in percent and elevations in degrees
+    elevation = np.asarray(elevation, dtype=np.float64)
+    theta = np.radians(np.where(elevation >= MIN_ELEVATION, elevation, np.nan))
+
+    water = np.clip(np.asarray(cloud_cover, dtype=np.float64), 0, 100) / 100 * cloud_water
+
+    return water * cloud_coefficient(frequency) / np.sin(theta)
+
+
+def attenuation(rain: np.ndarray, cloud_cover: np.ndarray, elevation: np.ndarray, frequency: float = FREQUENCY, **kwargs) -> np.ndarray:
+    # total rain and cloud attenuation in dB, kwargs go to rain_attenuation
+    return rain_attenuation(rain, elevation, frequency, **kwargs) + cloud_attenuation(cloud_cover, elevation, frequency)
+
+
+def fit(rain: np.ndarray) -> RainModel:
+    # P.1853 rain model of an hourly rain rate series in mm/h
+    rain = np.asarray(rain, dtype=np.float64)
+    rain = rain[~np.isnan(rain)]
+
+    wet = np.log(rain[rain > 0])
+
+    if len(wet) < 2:
+        return RainModel(len(wet) / max(len(rain), 1), 0.0, 0.0)
+
+    return RainModel(len(wet) / len(rain), float(wet.mean()), float(wet.std()))
+
+
+def synthetic_rain(rng: np.random.Generator, model: RainModel, hours: int, sites: int = 1, correlation: float = HOURLY_CORRELATION, site_correlation: float = 0.0) -> np.ndarray:
+    # (hours x sites) rain rates in mm/h
+    # a stationary AR(1) Gaussian process per site, from a common and an
+    # individual part so that sites are correlated with site_correlation
+    noise = np.sqrt(site_correlation) * rng.standard_normal((hours, 1)) + np.sqrt(1 - site_correlation) * rng.standard_normal((hours, sites))
+
+    # g[t] = correlation * g[t - 1] + scale * noise[t] with g[0] = noise[0],
+    # as a linear filter over all hours and sites at once
+    scale = np.sqrt(1 - correlation ** 2)
+    g, _ = scipy.signal.lfilter([scale], [1, -correlation], noise, axis=0, zi=(1 - scale) * noise[:1])
+
+    if model.p_rain <= 0:
+        return np.zeros((hours, sites))
+
+    # rains in the upper p_rain tail of the process, and the position in
+    # that tail gives the rate from the log-normal distribution
+    q = scipy.special.ndtr(-g)
+    wet = q < model.p_rain
+
+    rain = np.zeros((hours, sites))
+    rain[wet] = np.exp(model.m + model.s * scipy.special.ndtri(1 - q[wet] / model.p_rain))
+
+    return rain
+
+
+def trace(rng: np.random.Generator, model: RainModel, hours: int, elevation: np.ndarray, frequency: float = FREQUENCY, sites: int = 1, site_correlation: float = 0.0, **kwargs) -> np.ndarray:
+    # (hours x sites) synthetic attenuation in dB, overcast while it rains
+    rain = synthetic_rain(rng, model, hours, sites, site_correlation=site_correlation)
+    cloud_cover = np.where(rain > 0, 100.0, 0.0)
+
+    return attenuation(rain, cloud_cover, elevation, frequency, **kwargs)
+
+
+def read_weather(path: str) -> pd.DataFrame:
+    df = pd.read_csv(path)
+    df["timestamp"] = pd.to_datetime(df["time"])
+    return df.drop(columns=["time"])
+
+
+if __name__ == "__main__":
+
+    # parse arguments
+
+    usage = "Usage: rain_fade.py [--synthetic <hours> <sites>] <weather-file> <frequency-GHz> <elevation-deg> [output-file]"
+
+    args = sys.argv[1:]
+    hours = None
+
+    if len(args) > 0 and args[0] == "--synthetic":
+        if len(args) < 3:
+            print(usage)
+            sys.exit(1)
+
+        hours, sites = int(args[1]), int(args[2])
+        args = args[3:]
+
+    if len(args) not in (3, 4):
+        print(usage)
+        sys.exit(1)
+
+    df_weather = read_weather(args[0])
+    frequency = float(args[1])
+    elevation = float(args[2])
+    output_file = args[3] if len(args) > 3 else None
+
+    if hours is None:
+        # attenuation of the measured weather
+        df = pd.DataFrame({"timestamp": df_weather["timestamp"]})
+        df["rain_db"] = rain_attenuation(df_weather["rain_mm"].values, elevation, frequency)
+        df["cloud_db"] = cloud_attenuation(df_weather["cloudcover_perc"].values, elevation, frequency)
+        df["attenuation_db"] = df["rain_db"] + df["cloud_db"]
+    else:
+        model = fit(df_weather["rain_mm"].values)
+        print(f"rain model: {model}")
+
+        a = trace(np.random.default_rng(SEED), model, hours, elevation, frequency, sites)
+        df = pd.DataFrame(a, columns=[f"site_{i}" for i in range(sites)])
+        df.insert(0, "hour", np.arange(hours))
+
+    if output_file is None:
+        print(df.describe().to_string())
+    else:
+        df.to_csv(output_file, index=False)
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+#
+# Loader for the UC Louvain speed-test data
+#
+# Usage: speedtest.py <input-folder> <output-file>
+#
+# Each .jl file has one Ookla speedtest result per line with nested ping,
+# download, upload, interface, and server objects. Files are parsed with the
+# pyarrow JSON reader using the fixed SCHEMA, which reads each line once and
+# types all nested fields directly, and files are parsed in parallel. Results
+# that miss any of the fields (e.g., failed tests) are dropped.
+#
+# The flattened results are cached as a parquet file that remembers which
+# files it was built from, and is rebuilt when a file is added or changed.
+#
+
+import glob
+import json
+import multiprocessing as mp
+import os
+import sys
+import typing
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.json
+import pyarrow.parquet as pq
+import tqdm
+
+DATA_FOLDER = os.path.join(".", "uclouvain-data", "speed-test")
+CACHE_FILE = os.path.join(".", "uclouvain-data", "speed-test.parquet")
+
+# field -> type, nested objects are flattened to <object>_<field>
+SCHEMA = pa.schema([
+    ("type", pa.string()),
+    ("timestamp", pa.string()),
+    ("packetLoss", pa.float64()),
+    ("isp", pa.string()),
+    ("ping", pa.struct([
+        ("jitter", pa.float64()),
+        ("latency", pa.float64()),
+    ])),
+    ("download", pa.struct([
+        ("bandwidth", pa.int64()),
+        ("bytes", pa.int64()),
+        ("elapsed", pa.int64()),
+    ])),
+    ("upload", pa.struct([
+        ("bandwidth", pa.int64()),
+        ("bytes", pa.int64()),
+        ("elapsed", pa.int64()),
+    ])),
+    ("interface", pa.struct([
+        ("internalIp", pa.string()),
+        ("name", pa.string()),
+        ("macAddr", pa.string()),
+        ("isVpn", pa.bool_()),
+        ("externalIp", pa.string()),
+    ])),
+    ("server", pa.struct([
+        ("id", pa.int64()),
+        ("name", pa.string()),
+        ("location", pa.string()),
+        ("country", pa.string()),
+        ("host", pa.string()),
+        ("port", pa.int64()),
+        ("ip", pa.string()),
+    ])),
+    # only needed to drop incomplete results
+    ("result", pa.struct([
+        ("id", pa.string()),
+    ])),
+])
+
+# same order as the columns in speed-test.csv
+COLUMNS = ["type", "timestamp", "packetLoss", "isp", "ping_jitter", "ping_latency", "download_bandwidth", "upload_bandwidth", "download_bytes", "upload_bytes", "download_elapsed", "upload_elapsed", "interface_internalIp", "interface_name", "interface_macAddr", "interface_isVpn", "interface_externalIp", "server_id", "server_name", "server_location", "server_country", "server_host", "server_port", "server_ip"]
+
+# parquet metadata key for the source files of a cache file
+SOURCES_KEY = b"speedtest_sources"
+
+
+def parse_file(path: str) -> pd.DataFrame:
+    table = pyarrow.json.read_json(path, parse_options=pyarrow.json.ParseOptions(explicit_schema=SCHEMA, unexpected_field_behavior="ignore"))
+    table = table.flatten()
+    table = table.rename_columns([c.replace(".", "_") for c in table.column_names])
+
+    # drop results with missing fields
+    complete = pc.and_kleene(pc.is_valid(table["result_id"]), pc.is_valid(table["type"]))
+    for col in COLUMNS:
+        complete = pc.and_kleene(complete, pc.is_valid(table[col]))
+
+    df = table.filter(complete).select(COLUMNS).to_pandas()
+    df["timestamp"] = pd.to_datetime(df["timestamp"], utc=True)
+
+    return df
+
+
+def _sources(files: typing.List[str]) -> typing.Dict[str, typing.List[float]]:
+    # size and modification time of each file, to notice changes
+    return {os.path.basename(f): [os.path.getsize(f), os.path.getmtime(f)] for f in files}
+
+
+def parse(files: typing.List[str]) -> pd.DataFrame:
+    with mp.Pool() as pool:
+        dfs = list(tqdm.tqdm(pool.imap(parse_file, files), total=len(files), desc="parsing speed tests"))
+
+        pool.close()
+        pool.join()
+
+    if len(dfs) == 0:
+        return pd.DataFrame(columns=COLUMNS)
+
+    return pd.concat(dfs, ignore_index=True)
+
+
+def save(df: pd.DataFrame, path: str, files: typing.List[str]) -> None:
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    table = table.replace_schema_metadata({**(table.schema.metadata or {}), SOURCES_KEY: json.dumps(_sources(files)).encode()})
+    pq.write_table(table, path)
+
+
+def load(data_folder: str = DATA_FOLDER, cache_file: str = CACHE_FILE) -> pd.DataFrame:
+    # all speed tests in data_folder, from the cache file if it was built
+    # from the same files
+    files = sorted(glob.glob(os.path.join(data_folder, "*.jl")))
+
+    if os.path.exists(cache_file):
+        metadata = pq.read_schema(cache_file).metadata or {}
+
+        if metadata.get(SOURCES_KEY) == json.dumps(_sources(files)).encode():
+            return pd.read_parquet(cache_file)
+
+    df = parse(files)
+    save(df, cache_file, files)
+
+    return df
+
+
+if __name__ == "__main__":
+
+    # parse arguments
+
+    if len(sys.argv) != 3:
+        print("Usage: speedtest.py <input-folder> <output-file>")
+        sys.exit(1)
+
+    input_folder = sys.argv[1]
+    output_file = sys.argv[2]
+
+    files = sorted(glob.glob(os.path.join(input_folder, "*.jl")))
+
+    df = parse(files)
+    save(df, output_file, files)
+
+    print(f"parsed {len(df)} speed tests from {len(files)} files")
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+#
+# Altitude statistics of all satellites in a single pass over the track store
+#
+# Usage: altitude_stats.py <input-tle-file-prefix> <input-conjunctions-file> <output-file> [start-date] [end-date]
+#
+# Each satellite's track is read once, in chunks of time steps. For every
+# satellite we keep the running count, mean and sum of squared deviations
+# (merged per chunk), minimum and maximum, and a histogram of altitudes in
+# fixed bins that quantiles are interpolated from. Memory is bounded by the
+# block and chunk size, not by the length of the tracks.
+#
+
+import multiprocessing as mp
+import os
+import sys
+import typing
+
+import numpy as np
+import pandas as pd
+import tqdm
+
+import conjunction_events
+import tracks
+
+# histogram bins for quantiles, in meters
+BIN_SIZE = 100
+MAX_ALTITUDE = 2000000
+# quantiles in the summary, column "p25" is the 0.25 quantile
+QUANTILES = [0.05, 0.25, 0.5, 0.75, 0.95]
+# satellites per block and time steps per chunk
+BLOCK_SATS = 256
+CHUNK_STEPS = 1440
+
+# columns in meters
+ALTITUDE_COLUMNS = ["mean", "std", "min", "max"] + [f"p{round(q * 100)}" for q in QUANTILES]
+COLUMNS = ["satellite", "norad_id", "count"] + ALTITUDE_COLUMNS
+
+
+def _stats_block(arg: typing.Tuple[str, typing.List[int], slice]) -> pd.DataFrame:
+    path, block, t = arg
+
+    store = tracks.open_store(path)
+
+    n_sats = len(block)
+    n_bins = MAX_ALTITUDE // BIN_SIZE
+
+    count = np.zeros(n_sats, dtype=np.int64)
+    mean = np.zeros(n_sats)
+    m2 = np.zeros(n_sats)
+    lo = np.full(n_sats, np.inf)
+    hi = np.full(n_sats, -np.inf)
+    hist = np.zeros(n_sats * n_bins, dtype=np.int64)
+
+    rows = np.arange(n_sats)[:, np.newaxis]
+
+    for first in range(t.start, t.stop, CHUNK_STEPS):
+        xyz = np.asarray(store.positions[block, first:min(first + CHUNK_STEPS, t.stop)])
+
+        # positions are zero before the first TLE and for decayed satellites
+        valid = np.any(xyz != 0, axis=2)
+        altitude = np.linalg.norm(xyz, axis=2) - tracks.EARTH_RADIUS
+
+        # moments of the chunk, merged with the running moments
+        n_chunk = valid.sum(axis=1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean_chunk = np.where(n_chunk > 0, np.where(valid, altitude, 0.0).sum(axis=1) / n_chunk, 0.0)
+        m2_chunk = np.where(valid, (altitude - mean_chunk[:, np.newaxis]) ** 2, 0.0).sum(axis=1)
+
+        n = count + n_chunk
+        with np.errstate(invalid="ignore", divide="ignore"):
+            delta = mean_chunk - mean
+            mean = np.where(n > 0, mean + delta * n_chunk / n, 0.0)
+            m2 = np.where(n > 0, m2 + m2_chunk + delta ** 2 * count * n_chunk / n, 0.0)
+        count = n
+
+        lo = np.minimum(lo, np.where(valid, altitude, np.inf).min(axis=1, initial=np.inf))
+        hi = np.maximum(hi, np.where(valid, altitude, -np.inf).max(axis=1, initial=-np.inf))
+
+        bins = np.clip((altitude // BIN_SIZE).astype(np.int64), 0, n_bins - 1)
+        hist += np.bincount((rows * n_bins + bins)[valid], minlength=n_sats * n_bins)
+
+    hist = hist.reshape(n_sats, n_bins)
+    cumulative = np.cumsum(hist, axis=1)
+
+    df = pd.DataFrame(
+        {
+            "satellite": [store.satellites[i] for i in block],
+            "norad_id": store.norad_ids[block],
+            "count": count,
+        }
+    )
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        df["mean"] = np.where(count > 0, mean, np.nan)
+        df["std"] = np.where(count > 1, np.sqrt(m2 / (count - 1)), np.nan)
+    df["min"] = np.where(count > 0, lo, np.nan)
+    df["max"] = np.where(count > 0, hi, np.nan)
+
+    for q in QUANTILES:
+        # bin that contains the quantile, interpolated linearly within the bin
+        target = q * count
+        b = np.minimum((cumulative < target[:, np.newaxis]).sum(axis=1), n_bins - 1)
+        below = np.where(b > 0, cumulative[np.arange(n_sats), b - 1], 0)
+        in_bin = hist[np.arange(n_sats), b]
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            value = (b + np.where(in_bin > 0, (target - below) / in_bin, 0.5)) * BIN_SIZE
+
+        # the histogram is coarser than the exact extremes
+        df[f"p{round(q * 100)}"] = np.where(count > 0, np.clip(value, df["min"], df["max"]), np.nan)
+
+    return df
+
+
+def summary(input_tle_file_prefix: str, start=None, end=None, satellites: typing.Optional[typing.Iterable[str]] = None) -> pd.DataFrame:
+    # one row per satellite with the given prefix (or only the given
+    # satellites), altitudes in meters between start and end (inclusive)
+    store, sats = tracks.glob(input_tle_file_prefix)
+
+    if satellites is not None:
+        satellites = set(satellites)
+        sats = [sat for sat in sats if sat in satellites]
+
+    t = store.time_slice(start, end)
+
+    indices = [store.index[sat] for sat in sats]
+    blocks = [(store.path, indices[i:i + BLOCK_SATS], t) for i in range(0, len(indices), BLOCK_SATS)]
+
+    with mp.Pool() as pool:
+        results = list(tqdm.tqdm(pool.imap(_stats_block, blocks), total=len(blocks), desc="altitude statistics"))
+
+        pool.close()
+        pool.join()
+
+    if len(results) == 0:
+        return pd.DataFrame(columns=COLUMNS)
+
+    return pd.concat(results)[COLUMNS].reset_index(drop=True)
+
+
+def with_conjunctions(stats: pd.DataFrame, input_conjunctions_file: str, start=None, end=None, min_probability: typing.Optional[float] = None, sat_prefix: typing.Optional[str] = None) -> pd.DataFrame:
+    # add the number of conjunction events of each satellite with a TCA
+    # between start and end and their highest probability, matched by NORAD id
+    events = conjunction_events.by_satellite(input_conjunctions_file, sat_prefix=sat_prefix, start=start, end=end, min_probability=min_probability)
+    events = events.groupby("norad_id").agg(events=("event_id", "size"), max_probability=("max_probability", "max"))
+
+    df = stats.merge(events, how="left", left_on="norad_id", right_index=True)
+    df["events"] = df["events"].fillna(0).astype(np.int64)
+
+    return df
+
+
+def boxes(stats: pd.DataFrame) -> typing.List[dict]:
+    # box plot statistics for matplotlib's Axes.bxp, whiskers at min and max
+    return [
+        {"label": r.satellite, "med": r.p50, "q1": r.p25, "q3": r.p75, "whislo": r.min, "whishi": r.max, "mean": r.mean}
+        for r in stats.itertuples()
+    ]
+
+
+if __name__ == "__main__":
+
+    # parse arguments
+
+    if len(sys.argv) < 4:
+        print("Usage: altitude_stats.py <input-tle-file-prefix> <input-conjunctions-file> <output-file> [start-date] [end-date]")
+        sys.exit(1)
+
+    input_tle_file_prefix = sys.argv[1]
+    input_conjunctions_file = sys.argv[2]
+    output_file = sys.argv[3]
+    start_date = sys.argv[4] if len(sys.argv) > 4 else None
+    end_date = sys.argv[5] if len(sys.argv) > 5 else None
+
+    df = summary(input_tle_file_prefix, start=start_date, end=end_date)
+    df = with_conjunctions(df, input_conjunctions_file, start=start_date, end=end_date, sat_prefix=os.path.basename(input_tle_file_prefix))
+
+    df.to_csv(output_file, index=False)
@@ -0,0 +1,87 @@
+#
+# Baseline positions for propagated tracks
+#
+# The baseline of a satellite is where it would be without newer TLEs:
+#   first    propagated from the first TLE we have, for the whole time range
+#   rolling  propagated from the TLE before the one in use at each time step,
+#            so the distance to the actual position is what the latest TLE
+#            changed and does not grow with the time since the first TLE
+#
+# Dates are converted to Julian dates with NumPy and each run of time steps
+# that uses the same TLE is propagated with a single sgp4_array call.
+#
+
+import typing
+
+import numpy as np
+import sgp4.api as sgp4
+
+MODES = ["first", "rolling"]
+
+# unix epoch as Julian date
+UNIX_EPOCH_JD = 2440587.5
+
+NS_PER_DAY = 86400 * 1000000000
+
+
+def to_jd(dates: np.ndarray) -> typing.Tuple[np.ndarray, np.ndarray]:
+    # split datetime64 values into whole Julian days and day fractions
+    # (same convention as sgp4.jday, i.e., jd ends in .5)
+    ns = np.asarray(dates).astype("datetime64[ns]").astype(np.int64)
+    days, rem = np.divmod(ns, NS_PER_DAY)
+
+    return days + UNIX_EPOCH_JD, rem / NS_PER_DAY
+
+
+def satrecs(lines: typing.Sequence[typing.Tuple[str, str]]) -> typing.List[typing.Optional[sgp4.Satrec]]:
+    # parsed TLEs, None for TLEs that cannot be parsed
+    result = []
+
+    for line1, line2 in lines:
+        try:
+            result.append(sgp4.Satrec.twoline2rv(line1, line2))
+        except Exception as e:
+            result.append(None)
+
+    return result
+
+
+def tle_index(tle_dates: np.ndarray, dates: np.ndarray) -> np.ndarray:
+    # latest TLE at or before each date (tle_dates sorted), -1 before the first
+    return np.searchsorted(tle_dates, dates, side="right") - 1
+
+
+def baseline_index(tle_idx: np.ndarray, mode: str) -> np.ndarray:
+    # TLE the baseline is propagated from at each time step, given the TLE in
+    # use at that time step, before the first TLE both modes use the first TLE
+    if mode == "first":
+        return np.zeros_like(tle_idx)
+
+    if mode == "rolling":
+        return np.maximum(tle_idx - 1, 0)
+
+    raise ValueError(f"unknown baseline mode {mode}, use one of {MODES}")
+
+
+def propagate(sats: typing.Sequence[typing.Optional[sgp4.Satrec]], tle_idx: np.ndarray, jd: np.ndarray, fr: np.ndarray) -> np.ndarray:
+    # positions in meters for each time step, using TLE tle_idx[i] at step i
+    # zero before the first TLE (tle_idx < 0) and for TLEs that cannot be parsed
+    positions = np.zeros((len(tle_idx), 3))
+
+    if len(tle_idx) == 0:
+        return positions
+
+    # propagate each run of time steps that share a TLE in one call
+    run_starts = np.concatenate(([0], np.flatnonzero(np.diff(tle_idx)) + 1))
+    run_ends = np.concatenate((run_starts[1:], [len(tle_idx)]))
+
+    for run_start, run_end in zip(run_starts, run_ends):
+        t = tle_idx[run_start]
+
+        if t < 0 or sats[t] is None:
+            continue
+
+        es, rs, ds = sats[t].sgp4_array(jd[run_start:run_end], fr[run_start:run_end])
+        positions[run_start:run_end] = rs * 1000
+
+    return positions
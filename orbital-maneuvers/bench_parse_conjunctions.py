@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+#
+# Benchmark the SOCRATES parsers in parse_conjunctions.py on a synthetic page
+#
+# Usage: bench_parse_conjunctions.py [number-of-conjunctions]
+#
+
+import io
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+import parse_conjunctions
+
+HEADER = """<html>
+<head><title>SOCRATES</title></head>
+<body>
+<table class=center width=650>
+<tr align=center><td>
+<p><i>Data current as of 2023 Jan 25 00:05 UTC</i></p>
+<p>Computation Interval: Start = 2023 Jan 25 00:00:00.000, Stop = 2023 Feb 01 00:00:00.000<br>
+Computation Threshold: 5.0 km<br>
+Considering: 9,930 Primaries, 23,984 Secondaries ({n:,} Conjunctions)
+</p>
+</td></tr>
+</table>
+<table class=center width=950 border=1>
+"""
+
+FORM = """<form name=sat{i} method=post action="/SOCRATES/table-socrates.php" target="conjunction">
+<tr>
+<td rowspan=2 align=center><input type=submit value="TLE Data"><input type=hidden name=CATNR value="{no1},{no2}"></td>
+<td align=center>{no1}</td>
+<td>{name1}</td>
+<td align=center>{dse1:.3f}</td>
+<td align=center>{probability:.3E}</td>
+<td align=center>{dilution:.3f}</td>
+<td align=center>{min_range:.3f}</td>
+<td align=center>{velocity:.3f}</td>
+</tr>
+<tr>
+<td align=center>{no2}</td>
+<td>{name2}</td>
+<td align=center>{dse2:.3f}</td>
+<td align=center>{start}</td>
+<td align=center>{tca}</td>
+<td align=center>{end}</td>
+</tr>
+</form>
+"""
+
+FOOTER = """</table>
+</body>
+</html>
+"""
+
+
+def _socrates_date(d: datetime) -> str:
+    # e.g. "2023 Jan 11 05:09:20.223"
+    return d.strftime("%Y %b %d %H:%M:%S.") + f"{d.microsecond // 1000:03d}"
+
+
+def synthetic_page(n: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    start = datetime(2023, 1, 25)
+
+    parts = [HEADER.format(n=n)]
+
+    for i in range(n):
+        tca = start + timedelta(seconds=rng.uniform(0, 7 * 86400))
+        # whole seconds happen and are formatted without a fraction
+        if i % 100 == 0:
+            tca = tca.replace(microsecond=0)
+
+        parts.append(FORM.format(
+            i=i,
+            no1=44713 + rng.randrange(4000),
+            name1=f"STARLINK-{rng.randrange(1000, 5000)}" + (" [+]" if rng.random() < 0.5 else ""),
+            dse1=rng.uniform(0, 5),
+            probability=rng.uniform(0, 1e-2),
+            dilution=rng.uniform(0, 1),
+            min_range=rng.uniform(0, 5),
+            velocity=rng.uniform(0, 15),
+            no2=rng.randrange(1, 55000),
+            name2=rng.choice(["COSMOS 1408 DEB", "FENGYUN 1C DEB", "ONEWEB-0012", "STARLINK-1007 [-]"]),
+            dse2=rng.uniform(0, 5),
+            start=_socrates_date(tca - timedelta(seconds=rng.uniform(0, 2))),
+            tca=_socrates_date(tca),
+            end=_socrates_date(tca + timedelta(seconds=rng.uniform(0, 2))),
+        ))
+
+    parts.append(FOOTER)
+
+    return "".join(parts)
+
+
+if __name__ == "__main__":
+
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 130551
+
+    page = synthetic_page(n)
+    print(f"synthetic page with {n} conjunctions ({len(page) / 1e6:.1f} MB)")
+
+    results = {}
+
+    for name, parser in [("regex", parse_conjunctions._parse_html), ("bs4", parse_conjunctions._parse_html_bs4)]:
+        t1 = time.perf_counter()
+        results[name] = parser(io.StringIO(page), "2023-01-25T00:31:01.827049")
+        t2 = time.perf_counter()
+
+        print(f"{name}: {t2 - t1:.2f} seconds ({n / (t2 - t1):.0f} conjunctions/s)")
+
+    if results["regex"] != results["bs4"]:
+        print("outputs differ!")
+        sys.exit(1)
+
+    print("outputs are identical")
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+#
+# Altitude of satellites before and after their conjunctions
+#
+# Usage: conjunction_deltas.py <input-tle-file-prefix> <input-conjunctions-file> <output-file>
+#
+# Each conjunction event of a satellite is an interval [date_start, date_end].
+# We look up the interval in the track store's time grid with a binary search
+# and compare the mean altitude over the window before date_start with the
+# mean altitude over the window after date_end. Windows are a whole number of
+# orbits, as in maneuvers.py. Means come from cumulative sums over blocks of
+# satellites, so all conjunctions of a block are handled at once.
+#
+
+import multiprocessing as mp
+import os
+import sys
+import typing
+
+import numpy as np
+import pandas as pd
+import tqdm
+
+import conjunction_events
+import maneuvers
+import tracks
+
+# satellites per block, a block of two weeks is ~100MB
+BLOCK_SATS = 256
+
+COLUMNS = ["satellite", "norad_id", "other", "event_id", "date_start", "date_tca", "date_end", "max_probability", "altitude_before", "altitude_after", "altitude_change", "baseline_change"]
+
+
+def _cumsum(x: np.ndarray, valid: np.ndarray) -> typing.Tuple[np.ndarray, np.ndarray]:
+    # cumulative sums of valid samples and of their number, starting with 0
+    c = np.zeros((x.shape[0], x.shape[1] + 1))
+    c[:, 1:] = np.cumsum(np.where(valid, x, 0.0), axis=1)
+
+    n = np.zeros((x.shape[0], x.shape[1] + 1), dtype=np.int64)
+    n[:, 1:] = np.cumsum(valid, axis=1)
+
+    return c, n
+
+
+def _window_mean(c: np.ndarray, n: np.ndarray, rows: np.ndarray, first: np.ndarray, last: np.ndarray) -> np.ndarray:
+    # mean of x[rows, first:last] from the cumulative sums of x,
+    # nan where the window is cut off or contains invalid samples
+    n_times = c.shape[1] - 1
+
+    ok = (first >= 0) & (last <= n_times) & (last > first)
+    first = np.clip(first, 0, n_times)
+    last = np.clip(last, 0, n_times)
+
+    ok &= n[rows, last] - n[rows, first] == last - first
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(ok, (c[rows, last] - c[rows, first]) / (last - first), np.nan)
+
+
+def _deltas_block(arg: typing.Tuple[str, np.ndarray, np.ndarray, np.ndarray, np.ndarray]) -> typing.Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    # path, satellites of the block, and for each conjunction the row of its
+    # satellite in the block and the time steps of its start and end
+    path, block, rows, start, end = arg
+
+    store = tracks.open_store(path)
+
+    step = store.step()
+
+    xyz = np.asarray(store.positions[block])
+    xyz_baseline = np.asarray(store.baseline[block])
+
+    valid = np.any(xyz != 0, axis=2)
+
+    radius = np.linalg.norm(xyz, axis=2)
+    altitude = radius - tracks.EARTH_RADIUS
+    distance_baseline = np.linalg.norm(xyz - xyz_baseline, axis=2)
+
+    w = maneuvers.window_steps(radius, valid, step)[rows]
+
+    c, n = _cumsum(altitude, valid)
+    altitude_before = _window_mean(c, n, rows, start - w, start)
+    altitude_after = _window_mean(c, n, rows, end, end + w)
+
+    c, n = _cumsum(distance_baseline, valid)
+    baseline_before = _window_mean(c, n, rows, start - w, start)
+    baseline_after = _window_mean(c, n, rows, end, end + w)
+
+    return altitude_before, altitude_after, baseline_before, baseline_after
+
+
+def deltas(input_tle_file_prefix: str, input_conjunctions_file: str, min_probability: typing.Optional[float] = None) -> pd.DataFrame:
+    # one row per conjunction event and satellite in the track store
+    store, sats = tracks.glob(input_tle_file_prefix)
+
+    df = conjunction_events.by_satellite(input_conjunctions_file, sat_prefix=os.path.basename(input_tle_file_prefix), min_probability=min_probability)
+
+    # match by NORAD id, track names can differ from SOCRATES names
+    df["satellite"] = store.names(df["norad_id"].values)
+    df = df[df["satellite"].isin(set(sats))].copy()
+
+    # sort by satellite so that each block's conjunctions are contiguous
+    sat = df["satellite"].map(store.index).values.astype(np.int64)
+    order = np.argsort(sat, kind="stable")
+    df = df.iloc[order].reset_index(drop=True)
+    sat = sat[order]
+
+    # first time step at or after the start, first time step after the end
+    start = np.searchsorted(store.dates, df["date_start"].values, side="left")
+    end = np.searchsorted(store.dates, df["date_end"].values, side="right")
+
+    indices = np.unique(sat)
+    args = []
+
+    for i in range(0, len(indices), BLOCK_SATS):
+        block = indices[i:i + BLOCK_SATS]
+        r = slice(np.searchsorted(sat, block[0], side="left"), np.searchsorted(sat, block[-1], side="right"))
+
+        args.append((store.path, block, np.searchsorted(block, sat[r]), start[r], end[r]))
+
+    with mp.Pool() as pool:
+        results = list(tqdm.tqdm(pool.imap(_deltas_block, args), total=len(args), desc="joining conjunctions"))
+
+        pool.close()
+        pool.join()
+
+    if len(results) > 0:
+        altitude_before, altitude_after, baseline_before, baseline_after = (np.concatenate(r) for r in zip(*results))
+    else:
+        altitude_before = altitude_after = baseline_before = baseline_after = np.array([])
+
+    df["altitude_before"] = altitude_before
+    df["altitude_after"] = altitude_after
+    df["altitude_change"] = altitude_after - altitude_before
+    df["baseline_change"] = baseline_after - baseline_before
+
+    return df[COLUMNS].sort_values(by=["satellite", "date_tca"], kind="stable").reset_index(drop=True)
+
+
+if __name__ == "__main__":
+
+    # parse arguments
+
+    if len(sys.argv) != 4:
+        print("Usage: conjunction_deltas.py <input-tle-file-prefix> <input-conjunctions-file> <output-file>")
+        sys.exit(1)
+
+    input_tle_file_prefix = sys.argv[1]
+    input_conjunctions_file = sys.argv[2]
+    output_file = sys.argv[3]
+
+    df = deltas(input_tle_file_prefix, input_conjunctions_file)
+
+    print(f"{len(df)} conjunctions of {df['satellite'].nunique()} satellites, {df['altitude_change'].notna().sum()} with complete windows")
+
+    df.to_csv(output_file, index=False)
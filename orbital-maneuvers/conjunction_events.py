@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+#
+# Consolidate repeated conjunction reports into events
+#
+# Usage: conjunction_events.py <conjunctions-file> [tolerance-seconds]
+#
+# Each SOCRATES report repeats upcoming close approaches with updated
+# probabilities. Sightings of the same pair of objects with TCAs within the
+# tolerance of each other are one event. This adds two tables next to the
+# conjunctions table (see conjunction_store.py):
+#   events           one row per event with the latest TCA and probability
+#   event_sightings  the probability time series of each event
+#
+# max_probability of an event is the highest probability over all of its
+# sightings, no matter when they were reported. Filtering on it with
+# min_probability thus keeps events that were risky in any report, also in
+# reports outside the start and end dates of a query.
+#
+# Events include conjunctions of our satellites with any other object, e.g.,
+# debris. With sat_prefix, by_satellite(), satellites(), and norad_ids() only
+# return our satellites (names starting with that prefix, as in
+# parse_conjunctions.py). Match events to tracks by NORAD id, as track names
+# can differ from SOCRATES names (see tracks.py).
+#
+
+import sqlite3
+import sys
+import typing
+
+import numpy as np
+import pandas as pd
+
+# TCAs of the same encounter shift by seconds between reports, while two
+# encounters of the same pair are at least half an orbit apart
+EVENT_TOLERANCE_S = 600
+
+
+def build(path: str, tolerance: float = EVENT_TOLERANCE_S) -> None:
+    with sqlite3.connect(path) as db:
+        # a conjunction between two of our satellites is in the table twice
+        s = pd.read_sql_query("SELECT DISTINCT date, name1, name2, no1, no2, probability, min_range, date_start, date_tca, date_end FROM conjunctions", db)
+
+    # the order of the two objects is not fixed
+    swap = s["no1"].values > s["no2"].values
+    for a, b in [("no1", "no2"), ("name1", "name2")]:
+        first = np.where(swap, s[b].values, s[a].values)
+        second = np.where(swap, s[a].values, s[b].values)
+        s[a] = first
+        s[b] = second
+
+    # isoformat leaves out the fraction for whole seconds, numpy parses both
+    s["tca"] = np.array(s["date_tca"].values, dtype="datetime64[ns]")
+    s = s.sort_values(by=["no1", "no2", "tca", "date"], kind="stable").reset_index(drop=True)
+
+    # a new event starts with a new pair or a gap in TCA larger than the tolerance
+    no1 = s["no1"].values
+    no2 = s["no2"].values
+    tca = s["tca"].values.astype(np.int64)
+
+    new_event = np.ones(len(s), dtype=bool)
+    new_event[1:] = (no1[1:] != no1[:-1]) | (no2[1:] != no2[:-1]) | (np.diff(tca) > tolerance * 1e9)
+
+    s["event_id"] = np.cumsum(new_event) - 1
+
+    sightings = s[["event_id", "date", "date_start", "date_tca", "date_end", "probability", "min_range"]].sort_values(by=["event_id", "date"], kind="stable")
+
+    g = sightings.groupby("event_id")
+    latest = g.tail(1).set_index("event_id")
+
+    events = s.groupby("event_id")[["no1", "no2", "name1", "name2"]].first()
+    events["date_start"] = latest["date_start"]
+    events["date_tca"] = latest["date_tca"]
+    events["date_end"] = latest["date_end"]
+    events["first_reported"] = g["date"].min()
+    events["last_reported"] = g["date"].max()
+    events["sightings"] = g.size()
+    events["max_probability"] = g["probability"].max()
+    events["probability"] = latest["probability"]
+    events["min_range"] = latest["min_range"]
+
+    with sqlite3.connect(path) as db:
+        db.execute("DROP TABLE IF EXISTS events")
+        db.execute("DROP TABLE IF EXISTS event_sightings")
+
+        events.reset_index().to_sql("events", db, index=False)
+        sightings.to_sql("event_sightings", db, index=False)
+
+        db.execute("CREATE INDEX events_tca ON events (date_tca)")
+        db.execute("CREATE INDEX events_name1 ON events (name1)")
+        db.execute("CREATE INDEX events_name2 ON events (name2)")
+        db.execute("CREATE INDEX event_sightings_event ON event_sightings (event_id)")
+
+
+def events(path: str, satellite: typing.Optional[str] = None, start: typing.Optional[str] = None, end: typing.Optional[str] = None, min_probability: typing.Optional[float] = None) -> pd.DataFrame:
+    # events sorted by TCA, start and end filter on the TCA (inclusive),
+    # min_probability on the max_probability over all sightings
+    conditions = []
+    params: typing.List[typing.Any] = []
+
+    if satellite is not None:
+        conditions.append("(name1 = ? OR name2 = ?)")
+        params += [satellite, satellite]
+    if start is not None:
+        conditions.append("date_tca >= ?")
+        params.append(start)
+    if end is not None:
+        conditions.append("date_tca <= ?")
+        params.append(end)
+    if min_probability is not None:
+        conditions.append("max_probability > ?")
+        params.append(min_probability)
+
+    where = " WHERE " + " AND ".join(conditions) if len(conditions) > 0 else ""
+
+    with sqlite3.connect(path) as db:
+        return pd.read_sql_query(f"SELECT * FROM events{where} ORDER BY date_tca", db, params=params)
+
+
+def by_satellite(path: str, sat_prefix: typing.Optional[str] = None, **kwargs) -> pd.DataFrame:
+    # events with one row for each of their two objects, sorted by TCA
+    # with sat_prefix, only rows for objects whose name starts with it
+    # other keyword arguments are passed to events()
+    e = events(path, **kwargs)
+
+    df = pd.concat(
+        [
+            e.rename(columns={"name1": "satellite", "name2": "other", "no1": "norad_id", "no2": "other_norad_id"}),
+            e.rename(columns={"name2": "satellite", "name1": "other", "no2": "norad_id", "no1": "other_norad_id"}),
+        ]
+    )[["satellite", "other", "norad_id", "other_norad_id", "event_id", "date_start", "date_tca", "date_end", "max_probability"]]
+
+    df["satellite"] = df["satellite"].astype(str)
+
+    # -1 for objects without a NORAD id, as in tracks.py
+    for c in ["norad_id", "other_norad_id"]:
+        df[c] = df[c].fillna(-1).astype(np.int64)
+
+    if sat_prefix is not None:
+        df = df[df["satellite"].str.startswith(sat_prefix)]
+
+    for c in ["date_start", "date_tca", "date_end"]:
+        df[c] = np.array(df[c].values, dtype="datetime64[ns]")
+
+    return df.sort_values(by="date_tca", kind="stable").reset_index(drop=True)
+
+
+def sightings(path: str, event_id: int) -> pd.DataFrame:
+    # probability time series of an event
+    with sqlite3.connect(path) as db:
+        return pd.read_sql_query("SELECT date, date_start, date_tca, date_end, probability, min_range FROM event_sightings WHERE event_id = ? ORDER BY date", db, params=[event_id])
+
+
+def satellites(path: str, start: typing.Optional[str] = None, end: typing.Optional[str] = None, min_probability: typing.Optional[float] = None, sat_prefix: typing.Optional[str] = None) -> typing.List[str]:
+    # names of the objects with at least one event reported between start and
+    # end and with a max_probability over all sightings (also those reported
+    # before start or after end) above min_probability
+    # with sat_prefix, only objects whose name starts with it
+    return sorted(set(name for name, _ in _objects(path, start, end, min_probability, sat_prefix)))
+
+
+def norad_ids(path: str, start: typing.Optional[str] = None, end: typing.Optional[str] = None, min_probability: typing.Optional[float] = None, sat_prefix: typing.Optional[str] = None) -> typing.List[int]:
+    # NORAD ids of the objects as in satellites()
+    return sorted(set(no for _, no in _objects(path, start, end, min_probability, sat_prefix)))
+
+
+def _objects(path: str, start, end, min_probability, sat_prefix) -> typing.List[typing.Tuple[str, int]]:
+    conditions = []
+    params: typing.List[typing.Any] = []
+
+    if start is not None:
+        conditions.append("last_reported >= ?")
+        params.append(start)
+    if end is not None:
+        conditions.append("first_reported <= ?")
+        params.append(end)
+    if min_probability is not None:
+        conditions.append("max_probability > ?")
+        params.append(min_probability)
+
+    where = " WHERE " + " AND ".join(conditions) if len(conditions) > 0 else ""
+
+    with sqlite3.connect(path) as db:
+        objects = db.execute(f"SELECT name1, no1 FROM events{where} UNION SELECT name2, no2 FROM events{where}", params + params).fetchall()
+
+    if sat_prefix is not None:
+        objects = [(name, no) for name, no in objects if str(name).startswith(sat_prefix)]
+
+    return objects
+
+
+if __name__ == "__main__":
+
+    # parse arguments
+
+    if len(sys.argv) < 2:
+        print("Usage: conjunction_events.py <conjunctions-file> [tolerance-seconds]")
+        sys.exit(1)
+
+    input_file = sys.argv[1]
+    tolerance = float(sys.argv[2]) if len(sys.argv) > 2 else EVENT_TOLERANCE_S
+
+    build(input_file, tolerance)
+
+    with sqlite3.connect(input_file) as db:
+        n_sightings = db.execute("SELECT COUNT(*) FROM event_sightings").fetchone()[0]
+        n_events = db.execute("SELECT COUNT(*) FROM events").fetchone()[0]
+
+    print(f"{n_sightings} sightings in {n_events} events")
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+#
+# Consolidated conjunction table in SQLite
+#
+# Usage: conjunction_store.py <input-file> <output-file-prefix> [sat-prefix]
+#
+# Exports per-satellite CSV files with the columns that parse_conjunctions.py
+# used to write. Values are exported as stored, not as the original strings:
+# numbers are formatted by pandas, and cells that could not be converted to
+# their column type (e.g., a blank probability) are stored as NULL and
+# exported empty.
+#
+# Each row is a conjunction reported for a satellite, i.e., a conjunction
+# between two of our satellites appears once for each of them. Rows are
+# indexed by (satellite, date_tca).
+#
+
+import os
+import sqlite3
+import sys
+import typing
+
+import pandas as pd
+
+# columns and their SQLite types, in the order of the old CSV files
+COLUMNS = {
+    "reported_date": "TEXT",
+    "date": "TEXT",
+    "name1": "TEXT",
+    "name2": "TEXT",
+    "probability": "REAL",
+    "dilution_threshold": "REAL",
+    "min_range": "REAL",
+    "relative_velocity": "REAL",
+    "no1": "INTEGER",
+    "no2": "INTEGER",
+    "days_since_epoch1": "REAL",
+    "days_since_epoch2": "REAL",
+    "date_start": "TEXT",
+    "date_tca": "TEXT",
+    "date_end": "TEXT",
+}
+
+TYPES = {"TEXT": str, "REAL": float, "INTEGER": int}
+
+# flush buffered rows after this many rows
+BUFFER_ROWS = 1000000
+
+
+def columns() -> typing.Dict[str, list]:
+    # empty column buffers, including the satellite the row belongs to
+    return {c: [] for c in ["satellite"] + list(COLUMNS)}
+
+
+def _convert(t: str, value: str) -> typing.Any:
+    # NULL for empty or malformed cells, so that one bad cell does not stop
+    # the whole parse
+    if value is None:
+        return None
+
+    try:
+        return TYPES[t](value)
+    except (TypeError, ValueError):
+        return None
+
+
+def append(buffers: typing.Dict[str, list], satellite: str, conjunction: typing.Dict[str, str]) -> None:
+    buffers["satellite"].append(satellite)
+    for c, t in COLUMNS.items():
+        buffers[c].append(_convert(t, conjunction.get(c)))
+
+
+class Writer:
+    def __init__(self, path: str):
+        if os.path.exists(path):
+            os.remove(path)
+
+        self.db = sqlite3.connect(path)
+        self.db.execute("CREATE TABLE conjunctions (satellite TEXT, " + ", ".join(f"{c} {t}" for c, t in COLUMNS.items()) + ")")
+
+        self.buffers = columns()
+
+    def write(self, buffers: typing.Dict[str, list]) -> None:
+        for c in self.buffers:
+            self.buffers[c].extend(buffers[c])
+
+        if len(self.buffers["satellite"]) >= BUFFER_ROWS:
+            self.flush()
+
+    def flush(self) -> None:
+        rows = zip(*(self.buffers[c] for c in self.buffers))
+
+        self.db.executemany(f"INSERT INTO conjunctions VALUES ({', '.join('?' * len(self.buffers))})", rows)
+        self.db.commit()
+
+        self.buffers = columns()
+
+    def close(self) -> None:
+        self.flush()
+
+        # building the index once at the end is much faster than keeping it
+        # up to date during inserts
+        self.db.execute("CREATE INDEX conjunctions_satellite_tca ON conjunctions (satellite, date_tca)")
+        self.db.commit()
+        self.db.close()
+
+
+def read(path: str, satellite: typing.Optional[str] = None, start: typing.Optional[str] = None, end: typing.Optional[str] = None, min_probability: typing.Optional[float] = None, norad_id: typing.Optional[int] = None) -> pd.DataFrame:
+    # conjunctions in the order they were reported
+    # start and end filter on the report date (inclusive)
+    # norad_id selects a satellite like satellite, but by its NORAD id
+    where, params = _filter(satellite, start, end, min_probability, norad_id)
+
+    with sqlite3.connect(path) as db:
+        return pd.read_sql_query(f"SELECT {', '.join(COLUMNS)} FROM conjunctions{where} ORDER BY rowid", db, params=params)
+
+
+def satellites(path: str, start: typing.Optional[str] = None, end: typing.Optional[str] = None, min_probability: typing.Optional[float] = None) -> typing.List[str]:
+    # satellites with at least one matching conjunction
+    where, params = _filter(None, start, end, min_probability, None)
+
+    with sqlite3.connect(path) as db:
+        return [r[0] for r in db.execute(f"SELECT DISTINCT satellite FROM conjunctions{where} ORDER BY satellite", params)]
+
+
+def to_csv(path: str, satellite: str, output_file: str) -> None:
+    read(path, satellite).to_csv(output_file, index=False)
+
+
+def _filter(satellite, start, end, min_probability, norad_id) -> typing.Tuple[str, list]:
+    conditions = []
+    params = []
+
+    if satellite is not None:
+        conditions.append("satellite = ?")
+        params.append(satellite)
+    if norad_id is not None:
+        # the satellite is the object with its name, the other one can have
+        # the same NORAD id only for rows of that other object
+        conditions.append("((no1 = ? AND name1 = satellite) OR (no2 = ? AND name2 = satellite))")
+        params += [norad_id, norad_id]
+    if start is not None:
+        conditions.append("date >= ?")
+        params.append(start)
+    if end is not None:
+        conditions.append("date <= ?")
+        params.append(end)
+    if min_probability is not None:
+        conditions.append("probability > ?")
+        params.append(min_probability)
+
+    if len(conditions) == 0:
+        return "", params
+
+    return " WHERE " + " AND ".join(conditions), params
+
+
+if __name__ == "__main__":
+
+    # parse arguments
+
+    if len(sys.argv) < 3:
+        print("Usage: conjunction_store.py <input-file> <output-file-prefix> [sat-prefix]")
+        sys.exit(1)
+
+    input_file = sys.argv[1]
+    output_file_prefix = sys.argv[2]
+    sat_prefix = sys.argv[3] if len(sys.argv) > 3 else ""
+
+    os.makedirs(os.path.dirname(output_file_prefix) or ".", exist_ok=True)
+
+    for sat in satellites(input_file):
+        if not sat.startswith(sat_prefix):
+            continue
+
+        to_csv(input_file, sat, f"{output_file_prefix}{sat}.csv")
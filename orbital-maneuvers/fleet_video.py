@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+#
+# Render an animation of all satellites in a track store
+#
+# Usage: fleet_video.py <input-tle-file-prefix> <output-file> [step-size] [fps]
+#
+# Each frame reads only its time step from the memory-mapped track store and
+# moves a single scatter artist, colored by the distance to the baseline.
+# Frames are split into ranges that are rendered in parallel into separate
+# files and then concatenated with FFmpeg without re-encoding.
+#
+
+import multiprocessing as mp
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import typing
+
+import numpy as np
+import matplotlib as mpl
+import matplotlib.animation as animation
+import seaborn as sns
+import tqdm
+
+import render
+import tracks
+
+# libx264 is available in most FFmpeg builds, yuv420p makes the video playable everywhere
+CODEC = "libx264"
+EXTRA_ARGS = ["-pix_fmt", "yuv420p"]
+STEP_SIZE = 20
+FPS = 24
+DPI = 100
+# frames per file rendered by one process
+SEGMENT_FRAMES = 250
+# axis limits in meters
+EXTENT = 8000000
+
+
+def _render_segment(arg: typing.Tuple[str, np.ndarray, np.ndarray, str, int]) -> int:
+    # path, satellites, time steps of the frames, output file, frames per second
+    path, sats, steps, output_file, fps = arg
+
+    store = tracks.open_store(path)
+
+    cmap = sns.color_palette("crest", as_cmap=True)
+
+    fig = render.figure("fleet")
+    ax = fig.add_subplot(projection='3d')
+
+    # fixed limits, so the axes are not rescaled every frame
+    ax.set_xlim(-EXTENT, EXTENT)
+    ax.set_ylim(-EXTENT, EXTENT)
+    ax.set_zlim(-EXTENT, EXTENT)
+
+    time_text = ax.text2D(0, .1, '', fontsize=15, transform=ax.transAxes)
+
+    scatter = ax.scatter(np.zeros(len(sats)), np.zeros(len(sats)), np.zeros(len(sats)), marker=".", s=1)
+
+    writer = animation.FFMpegWriter(fps=fps, codec=CODEC, extra_args=EXTRA_ARGS)
+
+    with writer.saving(fig, output_file, dpi=DPI):
+        for t in steps:
+            xyz = np.asarray(store.positions[sats, t])
+            xyz_baseline = np.asarray(store.baseline[sats, t])
+
+            # min color is 0, max color is 10000m
+            colors = cmap(np.linalg.norm(xyz - xyz_baseline, axis=1) / 10000)
+
+            # satellites without a valid position are not drawn
+            xyz[~np.any(xyz != 0, axis=1)] = np.nan
+
+            scatter._offsets3d = (xyz[:, 0], xyz[:, 1], xyz[:, 2])
+            scatter.set_color(colors)
+            time_text.set_text(f"t = {store.dates[t]}")
+
+            writer.grab_frame()
+
+    return len(steps)
+
+
+def animate(input_tle_file_prefix: str, output_file: str, step_size: int = STEP_SIZE, fps: int = FPS) -> None:
+    store, sats = tracks.glob(input_tle_file_prefix)
+
+    sats = np.array([store.index[sat] for sat in sats])
+    steps = np.arange(0, len(store.dates), step_size)
+
+    t1 = time.perf_counter()
+
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(os.path.abspath(output_file))) as tmp:
+        segments = [os.path.join(tmp, f"segment-{i:06d}.mp4") for i in range(0, len(steps), SEGMENT_FRAMES)]
+        args = [(store.path, sats, steps[i * SEGMENT_FRAMES:(i + 1) * SEGMENT_FRAMES], segment, fps) for i, segment in enumerate(segments)]
+
+        with mp.Pool() as pool:
+            with tqdm.tqdm(total=len(steps), desc="rendering frames") as pbar:
+                for n in pool.imap_unordered(_render_segment, args):
+                    pbar.update(n)
+
+            pool.close()
+            pool.join()
+
+        # all segments have the same codec and settings, so they can be copied
+        segment_list = os.path.join(tmp, "segments.txt")
+        with open(segment_list, "w") as f:
+            f.writelines(f"file '{segment}'\n" for segment in segments)
+
+        subprocess.run([mpl.rcParams["animation.ffmpeg_path"], "-y", "-loglevel", "error", "-f", "concat", "-safe", "0", "-i", segment_list, "-c", "copy", output_file], check=True)
+
+    t2 = time.perf_counter()
+
+    print(f"rendered {len(steps)} frames of {len(sats)} satellites in {t2 - t1:.1f} seconds ({len(steps) / (t2 - t1):.1f} frames/s)")
+
+
+if __name__ == "__main__":
+
+    # parse arguments
+
+    if len(sys.argv) < 3:
+        print("Usage: fleet_video.py <input-tle-file-prefix> <output-file> [step-size] [fps]")
+        sys.exit(1)
+
+    input_tle_file_prefix = sys.argv[1]
+    output_file = sys.argv[2]
+    step_size = int(sys.argv[3]) if len(sys.argv) > 3 else STEP_SIZE
+    fps = int(sys.argv[4]) if len(sys.argv) > 4 else FPS
+
+    animate(input_tle_file_prefix, output_file, step_size, fps)
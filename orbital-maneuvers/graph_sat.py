@@ -1,9 +1,8 @@
 #!/usr/bin/env python3
 #
-# Usage: graph_sat.py <input-files> <output-dir>
+# Usage: graph_sat.py <input-tle-file-prefix> <output-dir>
 #
 
-import glob
 import os
 import sys
 import multiprocessing as mp
@@ -16,26 +15,27 @@ import matplotlib.pyplot as plt
 import seaborn as sns
 import tqdm
 
+import render
+import tracks
 
-def _graph_sat_trajectory(input_file: str, output_dir: str) -> None:
 
-    cmap = sns.color_palette("crest", as_cmap=True)
+def _graph_sat_trajectory(sat_name: str, input_tle_file_prefix: str, output_dir: str) -> None:
 
-    # sat name is file name without extension and directory
-    sat_name = os.path.basename(input_file).split(".")[0]
+    cmap = sns.color_palette("crest", as_cmap=True)
 
     # create output file name
     output_file = os.path.join(output_dir, sat_name + ".png")
 
     # read data
-    df = pd.read_csv(input_file)
+    store, _ = tracks.glob(input_tle_file_prefix)
+    df = store.read(sat_name)
 
     # create output directory if it doesn't exist
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
 
-    # create figure
-    fig = plt.figure()
+    # create figure, reused for all satellites of this worker
+    fig = render.figure("trajectory")
     ax = fig.add_subplot(projection='3d')
 
     # timestamps = df['date'].astype('datetime64[ns]').values
@@ -46,17 +46,21 @@ def _graph_sat_trajectory(input_file: str, output_dir: str) -> None:
 
     # make a color map based on distance from the baseline
     # min color is 0, max color is 10000m
-    colors = [cmap(x / 10000) for x in df['distance_baseline']]
+    # overlapping points are only drawn once, keep the largest distance
+    x, y, z = df['x'].values, df['y'].values, df['z'].values
+    distance = df['distance_baseline'].values
+    points = render.decimate_3d(ax, x, y, z, distance)
+
+    colors = cmap(distance[points] / 10000)
 
-    ax.scatter(df['x'], df['y'], df['z'], color=colors, marker="x", s=1)
+    ax.scatter(x[points], y[points], z[points], color=colors, marker="x", s=1)
 
-    time_text = ax.text2D(-.1, .1, f"max distance {max(df['distance_baseline'])}", fontsize=15)
+    time_text = ax.text2D(-.1, .1, f"max distance {distance.max()}", fontsize=15)
 
     # ax.scatter(df['x_baseline'], df['y_baseline'], df['z_baseline'], color="r", marker=".", s=0.1)
 
     # save figure
-    plt.savefig(output_file, dpi=300)
-    plt.close(fig)
+    fig.savefig(output_file, dpi=300)
 
 
 if __name__ == "__main__":
@@ -64,17 +68,17 @@ if __name__ == "__main__":
     # parse arguments
 
     if len(sys.argv) < 3:
-        print("Usage: graph_sat.py <input-files> <output-dir>")
+        print("Usage: graph_sat.py <input-tle-file-prefix> <output-dir>")
         sys.exit(1)
 
-    input_files = sys.argv[1]
+    input_tle_file_prefix = sys.argv[1]
     output_dir = sys.argv[2]
 
-    # find all files with the given prefix
+    # find all satellites with the given prefix
     with mp.Pool() as pool:
-        files = glob.glob(input_files + "*")
+        _, sats = tracks.glob(input_tle_file_prefix)
 
-        r = list(tqdm.tqdm(pool.imap_unordered(functools.partial(_graph_sat_trajectory, output_dir=output_dir), files, chunksize=10), total=len(files)))
+        r = list(tqdm.tqdm(pool.imap_unordered(functools.partial(_graph_sat_trajectory, input_tle_file_prefix=input_tle_file_prefix, output_dir=output_dir), sats, chunksize=10), total=len(sats)))
 
         pool.close()
         pool.join()
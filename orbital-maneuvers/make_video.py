@@ -1,6 +1,6 @@
 #!/usr/bin/env python3
 #
-# Usage: graph_sat.py <input_file>
+# Usage: make_video.py <input-tle-file-prefix>
 
 import functools
 import os
@@ -13,22 +13,26 @@ import matplotlib.animation as animation
 import seaborn as sns
 import tqdm
 
+import fleet_video
+import tracks
+
 if __name__ == "__main__":
 
     # parse arguments
 
     if len(sys.argv) < 2:
-        print("Usage: graph_sat.py <input_file>")
+        print("Usage: make_video.py <input-tle-file-prefix>")
         sys.exit(1)
 
-    input_file = sys.argv[1]
+    input_tle_file_prefix = sys.argv[1]
 
-    sat_name = os.path.basename(input_file).split(".")[0]
+    sat_name = os.path.basename(input_tle_file_prefix)
 
     output_file = f"anim-{sat_name}.mp4"
 
-    # df = pd.read_csv("propagated/ONEWEB-0395.csv")
-    df = pd.read_csv(input_file)
+    # store, _ = tracks.glob("propagated/ONEWEB-0395")
+    store, _ = tracks.glob(input_tle_file_prefix)
+    df = store.read(sat_name)
 
     fig_anim = plt.figure()
 
@@ -57,4 +61,4 @@ if __name__ == "__main__":
     anim = animation.FuncAnimation(fig_anim, functools.partial(animate, max_frames=frames), frames=frames, blit=False)
 
     with tqdm.tqdm(total=frames) as pbar:
-        anim.save(output_file, progress_callback = lambda i, n: pbar.update(1), writer=animation.FFMpegWriter(fps=60, codec="h264_videotoolbox"))
+        anim.save(output_file, progress_callback = lambda i, n: pbar.update(1), writer=animation.FFMpegWriter(fps=60, codec=fleet_video.CODEC, extra_args=fleet_video.EXTRA_ARGS))
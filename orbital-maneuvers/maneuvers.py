@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+#
+# Detect maneuvers in propagated tracks and match them with conjunctions
+#
+# Usage: maneuvers.py <input-tle-file-prefix> <input-conjunctions-file> <output-file>
+#
+# For every time step, we compare the mean altitude over the window after it
+# with the mean altitude over the window before it. The windows span a whole
+# number of orbits, so the altitude oscillation within an orbit averages out
+# and what remains is a step wherever a new TLE moves the satellite. Steps that are large
+# compared to the satellite's usual noise (median absolute deviation) are
+# maneuvers, each reported once at its largest change.
+#
+# All satellites in a block are processed at once with cumulative sums over the
+# memory-mapped track store, blocks are processed in parallel.
+#
+
+import multiprocessing as mp
+import os
+import sys
+import typing
+import warnings
+
+import numpy as np
+import pandas as pd
+import tqdm
+
+import conjunction_events
+import tracks
+
+# length of the windows before and after each time step, rounded to whole orbits
+WINDOW = np.timedelta64(3, "h")
+# standard gravitational parameter of the Earth in m^3/s^2
+MU = 3.986004418e14
+# changes below this many meters are never maneuvers
+MIN_MAGNITUDE = 100.0
+# changes must also exceed this many robust standard deviations
+THRESHOLD = 8.0
+# match conjunctions with a TCA this close to the maneuver
+JOIN_WINDOW = np.timedelta64(2, "D")
+# satellites per block, a block of two weeks is ~100MB
+BLOCK_SATS = 256
+
+MANEUVER_COLUMNS = ["satellite", "norad_id", "date", "altitude_change", "baseline_change"]
+COLUMNS = MANEUVER_COLUMNS + ["event_id", "other", "date_tca", "max_probability", "hours_to_tca"]
+
+
+def _window_means(x: np.ndarray, valid: np.ndarray, w: int) -> typing.Tuple[np.ndarray, np.ndarray]:
+    # means of the w samples before and from each time step,
+    # nan where a window is cut off or contains invalid samples
+    n_sats, n_times = x.shape
+
+    c = np.zeros((n_sats, n_times + 1))
+    c[:, 1:] = np.cumsum(np.where(valid, x, 0.0), axis=1)
+
+    n = np.zeros((n_sats, n_times + 1), dtype=np.int64)
+    n[:, 1:] = np.cumsum(valid, axis=1)
+
+    before = np.full(x.shape, np.nan)
+    after = np.full(x.shape, np.nan)
+
+    if n_times < 2 * w:
+        return before, after
+
+    before[:, w:] = np.where(n[:, w:-1] - n[:, :-w - 1] == w, (c[:, w:-1] - c[:, :-w - 1]) / w, np.nan)
+    after[:, :n_times - w + 1] = np.where(n[:, w:] - n[:, :-w] == w, (c[:, w:] - c[:, :-w]) / w, np.nan)
+
+    return before, after
+
+
+def window_steps(radius: np.ndarray, valid: np.ndarray, step: float) -> np.ndarray:
+    # window length in time steps for each satellite, a whole number of orbits
+    # with the orbital period from the mean radius, 0 without valid samples
+    # or with an unknown step (nan)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        a = np.sum(np.where(valid, radius, 0.0), axis=1) / np.sum(valid, axis=1)
+        period = 2 * np.pi * np.sqrt(a ** 3 / MU)
+        orbits = np.maximum(np.round(WINDOW / np.timedelta64(1, "s") / period), 1)
+
+        return np.nan_to_num(np.round(orbits * period / step)).astype(np.int64)
+
+
+def _peaks(score: np.ndarray, threshold: np.ndarray) -> typing.Tuple[np.ndarray, np.ndarray]:
+    # (satellite, time) of the largest score in each run of scores above the threshold
+    n_times = score.shape[1]
+
+    with np.errstate(invalid="ignore"):
+        above = np.flatnonzero(score >= threshold[:, np.newaxis])
+
+    if len(above) == 0:
+        return np.array([], dtype=np.int64), np.array([], dtype=np.int64)
+
+    # a run ends at a gap or at the end of a satellite's row
+    new_run = np.ones(len(above), dtype=bool)
+    new_run[1:] = (np.diff(above) != 1) | (above[1:] % n_times == 0)
+    run = np.cumsum(new_run)
+
+    # sort by run, then by descending score, and take the first of each run
+    order = np.lexsort((-score.ravel()[above], run))
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = run[order][1:] != run[order][:-1]
+
+    return np.divmod(above[order][first], n_times)
+
+
+def _detect_block(arg: typing.Tuple[str, typing.List[int]]) -> pd.DataFrame:
+    path, block = arg
+
+    store = tracks.open_store(path)
+
+    step = store.step()
+
+    xyz = np.asarray(store.positions[block])
+    xyz_baseline = np.asarray(store.baseline[block])
+
+    # positions are zero before the first TLE and for decayed satellites
+    valid = np.any(xyz != 0, axis=2)
+
+    radius = np.linalg.norm(xyz, axis=2)
+    altitude = radius - tracks.EARTH_RADIUS
+    distance_baseline = np.linalg.norm(xyz - xyz_baseline, axis=2)
+
+    w = window_steps(radius, valid, step)
+
+    altitude_change = np.full(altitude.shape, np.nan)
+    baseline_change = np.full(altitude.shape, np.nan)
+
+    # satellites at the same altitude share a window length
+    for n in np.unique(w[w > 0]):
+        sats = w == n
+
+        before, after = _window_means(altitude[sats], valid[sats], n)
+        altitude_change[sats] = after - before
+
+        before, after = _window_means(distance_baseline[sats], valid[sats], n)
+        baseline_change[sats] = after - before
+
+    # robust standard deviation of the change for each satellite
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        median = np.nanmedian(altitude_change, axis=1)
+        sigma = 1.4826 * np.nanmedian(np.abs(altitude_change - median[:, np.newaxis]), axis=1)
+
+    threshold = np.maximum(MIN_MAGNITUDE, THRESHOLD * sigma)
+
+    s, t = _peaks(np.abs(altitude_change), threshold)
+
+    return pd.DataFrame(
+        {
+            "satellite": np.array(store.satellites, dtype=object)[np.asarray(block)[s]] if len(s) > 0 else np.array([], dtype=object),
+            "norad_id": store.norad_ids[np.asarray(block)[s]] if len(s) > 0 else np.array([], dtype=np.int64),
+            "date": store.dates[t],
+            "altitude_change": altitude_change[s, t],
+            "baseline_change": baseline_change[s, t],
+        }
+    )
+
+
+def detect(input_tle_file_prefix: str) -> pd.DataFrame:
+    # maneuvers of all satellites with the given prefix, sorted by satellite and date
+    store, sats = tracks.glob(input_tle_file_prefix)
+
+    indices = [store.index[sat] for sat in sats]
+    blocks = [(store.path, indices[i:i + BLOCK_SATS]) for i in range(0, len(indices), BLOCK_SATS)]
+
+    with mp.Pool() as pool:
+        results = list(tqdm.tqdm(pool.imap(_detect_block, blocks), total=len(blocks), desc="detecting maneuvers"))
+
+        pool.close()
+        pool.join()
+
+    if len(results) == 0:
+        return pd.DataFrame({c: pd.Series(dtype=t) for c, t in zip(MANEUVER_COLUMNS, [object, np.int64, "datetime64[ns]", np.float64, np.float64])})
+
+    return pd.concat(results).sort_values(by=["satellite", "date"]).reset_index(drop=True)
+
+
+def nearest_conjunctions(maneuvers: pd.DataFrame, input_conjunctions_file: str, window: np.timedelta64 = JOIN_WINDOW, sat_prefix: typing.Optional[str] = None) -> pd.DataFrame:
+    # add the conjunction event of the same satellite (by NORAD id) with the
+    # nearest TCA within the window, if there is one
+    sides = conjunction_events.by_satellite(input_conjunctions_file, sat_prefix=sat_prefix)
+    sides = sides[["norad_id", "other", "event_id", "date_tca", "max_probability"]]
+
+    maneuvers = maneuvers.astype({"satellite": str, "norad_id": np.int64})
+
+    df = pd.merge_asof(maneuvers.sort_values(by="date", kind="stable"), sides, left_on="date", right_on="date_tca", by="norad_id", direction="nearest", tolerance=pd.Timedelta(window))
+    df["hours_to_tca"] = (df["date_tca"] - df["date"]) / pd.Timedelta(hours=1)
+
+    return df[COLUMNS].sort_values(by=["satellite", "date"]).reset_index(drop=True)
+
+
+if __name__ == "__main__":
+
+    # parse arguments
+
+    if len(sys.argv) != 4:
+        print("Usage: maneuvers.py <input-tle-file-prefix> <input-conjunctions-file> <output-file>")
+        sys.exit(1)
+
+    input_tle_file_prefix = sys.argv[1]
+    input_conjunctions_file = sys.argv[2]
+    output_file = sys.argv[3]
+
+    maneuvers = detect(input_tle_file_prefix)
+    maneuvers = nearest_conjunctions(maneuvers, input_conjunctions_file, sat_prefix=os.path.basename(input_tle_file_prefix))
+
+    print(f"{len(maneuvers)} maneuvers of {maneuvers['satellite'].nunique()} satellites, {maneuvers['event_id'].notna().sum()} near a conjunction")
+
+    maneuvers.to_csv(output_file, index=False)
@@ -1,211 +1,318 @@
 #!/usr/bin/env python3
 #
-# Convert archived conjunction data to CSV for further analysis
+# Convert archived conjunction data to a SQLite table for further analysis
 #
-# Usage: parse_conjunctions.py <input-file-prefix> <output-file-prefix>  <sat-prefix>
+# Usage: parse_conjunctions.py <input-file-prefix> <output-file> <sat-prefix> [--bs4]
+#
+# Files are parsed in parallel with regular expressions over the conjunction
+# forms. --bs4 uses the (much slower) BeautifulSoup parser instead, both give
+# the same output.
+# Use conjunction_store.py to export per-satellite CSV files.
 #
 
 import sys
 import glob
 from datetime import datetime
-import time
 import os
+import html
+import multiprocessing as mp
+import functools
+import re
+import typing
 
 from bs4 import BeautifulSoup
 import tqdm
 
-if __name__ == '__main__':
+import conjunction_events
+import conjunction_store
 
-    # parse arguments
+MONTHS = {m: i + 1 for i, m in enumerate(["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"])}
 
-    if len(sys.argv) != 4:
-        print('Usage: parse_conjunctions.py <input-file-prefix> <output-file-prefix> <sat-prefix>')
-        sys.exit(1)
+REPORTED_DATE_RE = re.compile(r"Data current as of ([^<]*)<")
+FORM_RE = re.compile(r"""<form\b[^>]*\btarget\s*=\s*["']?conjunction(?=["'\s>])[^>]*>(.*?)</form>""", re.S | re.I)
+TR_RE = re.compile(r"<tr\b[^>]*>", re.I)
+TD_RE = re.compile(r"<td\b[^>]*>(.*?)(?=</td>|<td\b|</tr>|$)", re.S | re.I)
+TAG_RE = re.compile(r"<[^>]*>")
+
+
+def _iso_date(d: str) -> typing.Optional[str]:
+    # change the date format from "2023 Jan 11 05:09:20.223" to iso (UTC)
+    # same result as datetime.strptime(d, "%Y %b %d %H:%M:%S.%f").isoformat()
+    # without the overhead of strptime
+    # None for malformed dates, stored as NULL (see conjunction_store.py)
+    try:
+        year, month, day, t = d.split()
+        hms, frac = t.split(".")
+        h, m, s = hms.split(":")
 
-    input_file_prefix = sys.argv[1]
-    output_file_prefix = sys.argv[2]
-    sat_prefix = sys.argv[3]
-
-    os.makedirs(output_file_prefix, exist_ok=True)
-
-    out_files = {}
-
-    # find all files with the given prefix
-    for filename in tqdm.tqdm(glob.glob(input_file_prefix + "*"), desc="processing files"):
-
-        # read all available TLE data
-        conjunctions = {}
-
-        # date is in the filename in iso format
-        # format: blab-labla-2023-01-17T00:31:01.827049.html
-        date = filename[-len("2023-01-17T00:31:01.827049.html"):-len(".html")]
-
-        with open(filename, 'r') as f:
-            # parse HTML data
-            # t1 = time.perf_counter()
-            # soup = BeautifulSoup(f, 'html.parser')
-            # t2 = time.perf_counter()
-
-            # this took too long
-            # if you don't feel like installing lxml, you can use html.parser
-            soup = BeautifulSoup(f, 'lxml')
-
-            # print(f"parsing {filename} took {t2-t1} seconds")
-
-            # find the reported date
-            # sample HTML:
-            # <table class=center width=650>
-            # <tr align=center><td>
-            # <p><i>Data current as of 2023 Jan 25 00:05 UTC</i></p>
-            # <p>Computation Interval: Start = 2023 Jan 25 00:00:00.000, Stop = 2023 Feb 01 00:00:00.000<br>
-            # Computation Threshold: 5.0 km<br>
-            # Considering: 9,930 Primaries, 23,984 Secondaries (130,551 Conjunctions)
-            # </p>
-            # </td></tr>
-            # </table>
-
-            # find the table with the class "center"
-            table = soup.find("table", {"class": "center", "width": 650})
-
-            # find the first <p> in the table
-            p = table.find("p")
-            # find the first <i> in the <p>
-            i = p.find("i")
-            # the text of the <i> contains the date
-            reported_date = i.text[len("Data current as of "):]
-            # convert to iso format using datetime
-            reported_date = datetime.strptime(reported_date, "%Y %b %d %H:%M %Z").isoformat()
-
-            # each conjunction is a form called with target "conjunction"
-            for form in soup.find_all("form", {"target": "conjunction"}):
-                # there are two <tr> in each form
-                # the first <tr> contains most data
-                tr = form.find("tr")
-
-                # skip the <td> with the "TLE Data" value
-                td = tr.find("td")
-
-                # the first <td> contains the first satellite number
-                td = td.find_next_sibling("td")
-                no1 = td.text.strip()
-
-                # the second <td> contains the first satellite name
-                td = td.find_next_sibling("td")
-                name1 = td.text.strip()
-
-                # remove the stupid [-] from the name if it exists
-                if name1[-1:] == "]":
-                    name1 = name1[:-4]
-                    name1.strip()
-
-                # the third <td> contains the conjunction days since epoch of the first satellite
-                td = td.find_next_sibling("td")
-                days_since_epoch1 = td.text.strip()
-
-                # the fourth <td> contains the conjunction probability
-                td = td.find_next_sibling("td")
-                probability = td.text.strip()
-
-                # the fifth <td> contains the conjunction dilution threshold
-                td = td.find_next_sibling("td")
-                dilution_threshold = td.text.strip()
-
-                # the sixth <td> contains the conjunction min range
-                td = td.find_next_sibling("td")
-                min_range = td.text.strip()
-
-                # the seventh <td> contains the conjunction relative velocity
-                td = td.find_next_sibling("td")
-                relative_velocity = td.text.strip()
-
-                # the second <tr> contains the second satellite number and name
-                tr = tr.find_next_sibling("tr")
-
-                # the first <td> contains the second satellite number
-                td = tr.find("td")
-                no2 = td.text.strip()
-
-                # the second <td> contains the second satellite name
-                td = td.find_next_sibling("td")
-                name2 = td.text.strip()
-
-                # remove the stupid [-] from the name if it exists
-                if name2[-1:] == "]":
-                    name2 = name2[:-4]
-                    name2.strip()
-
-                # the third <td> contains the days since epoch of the second satellite
-                td = td.find_next_sibling("td")
-                days_since_epoch2 = td.text.strip()
-
-                # the fourth <td> contains the conjunction date start
-                td = td.find_next_sibling("td")
-                date_start = td.text.strip()
-                # change the date format from "2023 Jan 11 05:09:20.223" to iso (UTC)
-                date_start = datetime.strptime(date_start, "%Y %b %d %H:%M:%S.%f").isoformat()
-
-                # the fifth <td> contains the conjunction date TCA
-                td = td.find_next_sibling("td")
-                date_tca = td.text.strip()
-                date_tca = datetime.strptime(date_tca, "%Y %b %d %H:%M:%S.%f").isoformat()
-
-                # the sixth <td> contains the conjunction date end
-                td = td.find_next_sibling("td")
-                date_end = td.text.strip()
-                date_end = datetime.strptime(date_end, "%Y %b %d %H:%M:%S.%f").isoformat()
-
-                # save everything in a dict
-
-                conjunction = {
-                    "reported_date": reported_date,
-                    "date": date,
-                    "name1": name1,
-                    "name2": name2,
-                    "probability": probability,
-                    "dilution_threshold": dilution_threshold,
-                    "min_range": min_range,
-                    "relative_velocity": relative_velocity,
-                    "no1": no1,
-                    "no2": no2,
-                    "days_since_epoch1": days_since_epoch1,
-                    "days_since_epoch2": days_since_epoch2,
-                    "date_start": date_start,
-                    "date_tca": date_tca,
-                    "date_end": date_end,
-                }
-
-                conjunctions.setdefault(name1, []).append(conjunction)
-                conjunctions.setdefault(name2, []).append(conjunction)
-
-        for name, conjunctions in conjunctions.items():
+        iso = f"{int(year):04d}-{MONTHS[month]:02d}-{int(day):02d}T{int(h):02d}:{int(m):02d}:{int(s):02d}"
+
+        us = int(frac.ljust(6, "0"))
+    except (KeyError, ValueError):
+        return None
+
+    if us != 0:
+        iso += f".{us:06d}"
+
+    return iso
+
+
+def _text(td: str) -> str:
+    # same as the text of a BeautifulSoup tag
+    # most cells are plain text, so skip the substitutions if possible
+    if "<" in td:
+        td = TAG_RE.sub("", td)
+    if "&" in td:
+        td = html.unescape(td)
+
+    return td.strip()
+
+
+def _parse_html(f: typing.TextIO, date: str) -> typing.Tuple[str, typing.List[typing.Dict[str, str]]]:
+    page = f.read()
+
+    # find the reported date
+    # see _parse_html_bs4 for sample HTML
+    reported_date = html.unescape(REPORTED_DATE_RE.search(page).group(1))
+    reported_date = datetime.strptime(reported_date, "%Y %b %d %H:%M %Z").isoformat()
+
+    conjunctions = []
+
+    # each conjunction is a form called with target "conjunction"
+    for form in FORM_RE.finditer(page):
+        # there are two <tr> in each form
+        rows = TR_RE.split(form.group(1))
+
+        # the first <tr> contains most data, skip the <td> with the "TLE Data" value
+        no1, name1, days_since_epoch1, probability, dilution_threshold, min_range, relative_velocity = (_text(td) for td in TD_RE.findall(rows[1])[1:8])
+
+        # the second <tr> contains the second satellite and the dates
+        no2, name2, days_since_epoch2, date_start, date_tca, date_end = (_text(td) for td in TD_RE.findall(rows[2])[:6])
+
+        # remove the stupid [-] from the name if it exists
+        if name1[-1:] == "]":
+            name1 = name1[:-4]
+        if name2[-1:] == "]":
+            name2 = name2[:-4]
+
+        conjunctions.append({
+            "reported_date": reported_date,
+            "date": date,
+            "name1": name1,
+            "name2": name2,
+            "probability": probability,
+            "dilution_threshold": dilution_threshold,
+            "min_range": min_range,
+            "relative_velocity": relative_velocity,
+            "no1": no1,
+            "no2": no2,
+            "days_since_epoch1": days_since_epoch1,
+            "days_since_epoch2": days_since_epoch2,
+            "date_start": _iso_date(date_start),
+            "date_tca": _iso_date(date_tca),
+            "date_end": _iso_date(date_end),
+        })
+
+    return reported_date, conjunctions
+
+
+def _parse_html_bs4(f: typing.TextIO, date: str) -> typing.Tuple[str, typing.List[typing.Dict[str, str]]]:
+    conjunctions = []
+
+    # parse HTML data
+    # t1 = time.perf_counter()
+    # soup = BeautifulSoup(f, 'html.parser')
+    # t2 = time.perf_counter()
+
+    # this took too long
+    # if you don't feel like installing lxml, you can use html.parser
+    soup = BeautifulSoup(f, 'lxml')
+
+    # print(f"parsing {filename} took {t2-t1} seconds")
+
+    # find the reported date
+    # sample HTML:
+    # <table class=center width=650>
+    # <tr align=center><td>
+    # <p><i>Data current as of 2023 Jan 25 00:05 UTC</i></p>
+    # <p>Computation Interval: Start = 2023 Jan 25 00:00:00.000, Stop = 2023 Feb 01 00:00:00.000<br>
+    # Computation Threshold: 5.0 km<br>
+    # Considering: 9,930 Primaries, 23,984 Secondaries (130,551 Conjunctions)
+    # </p>
+    # </td></tr>
+    # </table>
+
+    # find the table with the class "center"
+    table = soup.find("table", {"class": "center", "width": 650})
+
+    # find the first <p> in the table
+    p = table.find("p")
+    # find the first <i> in the <p>
+    i = p.find("i")
+    # the text of the <i> contains the date
+    reported_date = i.text[len("Data current as of "):]
+    # convert to iso format using datetime
+    reported_date = datetime.strptime(reported_date, "%Y %b %d %H:%M %Z").isoformat()
+
+    # each conjunction is a form called with target "conjunction"
+    for form in soup.find_all("form", {"target": "conjunction"}):
+        # there are two <tr> in each form
+        # the first <tr> contains most data
+        tr = form.find("tr")
+
+        # skip the <td> with the "TLE Data" value
+        td = tr.find("td")
+
+        # the first <td> contains the first satellite number
+        td = td.find_next_sibling("td")
+        no1 = td.text.strip()
+
+        # the second <td> contains the first satellite name
+        td = td.find_next_sibling("td")
+        name1 = td.text.strip()
+
+        # remove the stupid [-] from the name if it exists
+        if name1[-1:] == "]":
+            name1 = name1[:-4]
+            name1.strip()
+
+        # the third <td> contains the conjunction days since epoch of the first satellite
+        td = td.find_next_sibling("td")
+        days_since_epoch1 = td.text.strip()
+
+        # the fourth <td> contains the conjunction probability
+        td = td.find_next_sibling("td")
+        probability = td.text.strip()
+
+        # the fifth <td> contains the conjunction dilution threshold
+        td = td.find_next_sibling("td")
+        dilution_threshold = td.text.strip()
+
+        # the sixth <td> contains the conjunction min range
+        td = td.find_next_sibling("td")
+        min_range = td.text.strip()
+
+        # the seventh <td> contains the conjunction relative velocity
+        td = td.find_next_sibling("td")
+        relative_velocity = td.text.strip()
+
+        # the second <tr> contains the second satellite number and name
+        tr = tr.find_next_sibling("tr")
+
+        # the first <td> contains the second satellite number
+        td = tr.find("td")
+        no2 = td.text.strip()
+
+        # the second <td> contains the second satellite name
+        td = td.find_next_sibling("td")
+        name2 = td.text.strip()
+
+        # remove the stupid [-] from the name if it exists
+        if name2[-1:] == "]":
+            name2 = name2[:-4]
+            name2.strip()
+
+        # the third <td> contains the days since epoch of the second satellite
+        td = td.find_next_sibling("td")
+        days_since_epoch2 = td.text.strip()
+
+        # the fourth <td> contains the conjunction date start
+        td = td.find_next_sibling("td")
+        date_start = td.text.strip()
+        # change the date format from "2023 Jan 11 05:09:20.223" to iso (UTC)
+        date_start = _iso_date(date_start)
+
+        # the fifth <td> contains the conjunction date TCA
+        td = td.find_next_sibling("td")
+        date_tca = td.text.strip()
+        date_tca = _iso_date(date_tca)
+
+        # the sixth <td> contains the conjunction date end
+        td = td.find_next_sibling("td")
+        date_end = td.text.strip()
+        date_end = _iso_date(date_end)
+
+        # save everything in a dict
+
+        conjunction = {
+            "reported_date": reported_date,
+            "date": date,
+            "name1": name1,
+            "name2": name2,
+            "probability": probability,
+            "dilution_threshold": dilution_threshold,
+            "min_range": min_range,
+            "relative_velocity": relative_velocity,
+            "no1": no1,
+            "no2": no2,
+            "days_since_epoch1": days_since_epoch1,
+            "days_since_epoch2": days_since_epoch2,
+            "date_start": date_start,
+            "date_tca": date_tca,
+            "date_end": date_end,
+        }
+
+        conjunctions.append(conjunction)
+
+    return reported_date, conjunctions
+
+
+def _parse_file(filename: str, sat_prefix: str, use_bs4: bool = False) -> typing.Dict[str, list]:
+    # date is in the filename in iso format
+    # format: blab-labla-2023-01-17T00:31:01.827049.html
+    date = filename[-len("2023-01-17T00:31:01.827049.html"):-len(".html")]
+
+    with open(filename, 'r') as f:
+        if use_bs4:
+            reported_date, conjunctions = _parse_html_bs4(f, date)
+        else:
+            reported_date, conjunctions = _parse_html(f, date)
+
+    # collect rows for our satellites in typed columns
+    buffers = conjunction_store.columns()
+
+    for conjunction in conjunctions:
+        for name in (conjunction["name1"], conjunction["name2"]):
             # skip some weird sats
             if not name.startswith(sat_prefix):
                 continue
 
-            if not name in out_files:
-                out_files[name] = f"{output_file_prefix}{name}.csv"
-                with open(out_files[name], 'w') as f:
-                    # write header
-                    f.write("reported_date,date,name1,name2,probability,dilution_threshold,min_range,relative_velocity,no1,no2,days_since_epoch1,days_since_epoch2,date_start,date_tca,date_end\n")
-
-            # write conjunction data to CSV file
-            with open(out_files[name], 'a') as f:
-                for conjunction in conjunctions:
-                    # write conjunction data
-                    f.write("{},{},{},{},{},{},{},{},{},{},{},{},{},{},{}\n".format(
-                        conjunction["reported_date"],
-                        conjunction["date"],
-                        conjunction["name1"],
-                        conjunction["name2"],
-                        conjunction["probability"],
-                        conjunction["dilution_threshold"],
-                        conjunction["min_range"],
-                        conjunction["relative_velocity"],
-                        conjunction["no1"],
-                        conjunction["no2"],
-                        conjunction["days_since_epoch1"],
-                        conjunction["days_since_epoch2"],
-                        conjunction["date_start"],
-                        conjunction["date_tca"],
-                        conjunction["date_end"],
-                    ))
+            conjunction_store.append(buffers, name, conjunction)
+
+    return buffers
+
+
+if __name__ == '__main__':
+
+    # parse arguments
+
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    flags = [a for a in sys.argv[1:] if a.startswith("--")]
+
+    if len(args) != 3 or any(f != "--bs4" for f in flags):
+        print('Usage: parse_conjunctions.py <input-file-prefix> <output-file> <sat-prefix> [--bs4]')
+        sys.exit(1)
+
+    input_file_prefix = args[0]
+    output_file = args[1]
+    sat_prefix = args[2]
+    use_bs4 = "--bs4" in flags
+
+    os.makedirs(os.path.dirname(output_file) or ".", exist_ok=True)
+
+    writer = conjunction_store.Writer(output_file)
+
+    files = glob.glob(input_file_prefix + "*")
+
+    # parse files in parallel, but write them in order
+    with mp.Pool() as pool:
+        for buffers in tqdm.tqdm(pool.imap(functools.partial(_parse_file, sat_prefix=sat_prefix, use_bs4=use_bs4), files), total=len(files), desc="processing files"):
+            writer.write(buffers)
+
+        pool.close()
+        pool.join()
+
+    writer.close()
+
+    # consolidate repeated reports of the same conjunction
+    conjunction_events.build(output_file)
@@ -2,19 +2,19 @@
 #
 # Convert archived TLE data to CSV for further analysis
 #
-# Usage: plot_conjunctions.py <input-conjunctions-file-prefix> <input-tle-file-prefix> <output-file-prefix>
+# Usage: plot_conjunctions.py <input-conjunctions-file> <input-tle-file-prefix> <output-file-prefix>
 #
 
 # for each satellite, plot its altitude over time
 # if a conjunction is reported, also plot it
 # any correlation?
 
-import glob
 import os
 import sys
 import multiprocessing as mp
 import functools
 
+import numpy as np
 import pandas as pd
 # import matplotlib as mpl
 import matplotlib.pyplot as plt
@@ -22,21 +22,21 @@ import matplotlib.pyplot as plt
 import seaborn as sns
 import tqdm
 
+import conjunction_store
+import render
+import tracks
+
 # only recorded conjunctions after this date
 start_date = "2023-01-06"
 
-def _graph_sat_altitude(input_file: str, input_conjunctions_file_prefix: str, output_dir: str):
+def _graph_sat_altitude(sat_name: str, input_tle_file_prefix: str, input_conjunctions_file: str, output_dir: str):
 
-    # sat name is file name without extension and directory
-    sat_name = os.path.basename(input_file).split(".")[0]
+    store, _ = tracks.glob(input_tle_file_prefix)
 
-    # read conjunctions
-    conjunction_file = input_conjunctions_file_prefix + f"{sat_name}.csv"
+    # read conjunctions, by NORAD id as track names can differ from SOCRATES names
+    conjunctions = conjunction_store.read(input_conjunctions_file, norad_id=int(store.norad_ids[store.index[sat_name]]))
 
-    try:
-        conjunctions = pd.read_csv(conjunction_file)
-    except:
-        print(f"Could not read conjunctions for {sat_name} (file exists: {os.path.exists(conjunction_file)})")
+    if len(conjunctions) == 0:
         return
 
     conjunctions['date'] = pd.to_datetime(conjunctions['date'])
@@ -51,31 +51,42 @@ def _graph_sat_altitude(input_file: str, input_conjunctions_file_prefix: str, ou
     # # filter conjunctions for this satellite
     # conjunctions = conjunctions[(conjunctions['name1'] == sat_name) | (conjunctions['name2'] == sat_name)]
 
-    # read input file
-    df = pd.read_csv(input_file)
-    df = df[df['date'] >= start_date]
-    df['date'] = pd.to_datetime(df['date'])
+    # read propagated track, only from the start date on
+    df = store.read(sat_name, start=start_date)
 
     # create output directory if it doesn't exist
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
 
-    # create figure
-    g = sns.lineplot(data=df, x="date", y="distance_ground", color="#4477AA", errorbar=None)
+    # create figure, reused for all satellites of this worker
+    fig = render.figure("altitude")
+    g = fig.add_subplot()
+
+    # only plot the lowest and highest altitude per pixel
+    points = render.decimate(df["distance_ground"].values, render.pixels(fig, dpi=100))
+    g.plot(df["date"].values[points], df["distance_ground"].values[points], color="#4477AA")
+    g.set_xlabel("date")
+    g.set_ylabel("distance_ground")
     # sns.lineplot(data=df, x="date", y="distance_baseline_ground", color="#EE6677", label="baseline", ax=g)
 
     # plot conjunctions
-    for index, row in conjunctions.iterrows():
-        important = row["probability"] > 10e-4
-        g.axvline(x=row['date_tca'], color="#EE6677" if important else "#228833", linestyle="-" if important else "--", linewidth=0.5 if important else 0.05)
+    important = (conjunctions["probability"] > 10e-4).values
+    g.vlines(
+        conjunctions["date_tca"].values,
+        0,
+        1,
+        transform=g.get_xaxis_transform(),
+        colors=np.where(important, "#EE6677", "#228833"),
+        linestyles=np.where(important, "-", "--"),
+        linewidths=np.where(important, 0.5, 0.05),
+    )
 
     g2 = g.twinx()
     sns.scatterplot(x=important_conjunctions['date_tca'], y=important_conjunctions['probability'], color="#EE6677", size=important_conjunctions["probability"], ax=g2, legend=False)
     g2.set_yscale("log")
 
     # save figure
-    plt.savefig(os.path.join(output_dir, sat_name + ".png"), dpi=100, bbox_inches="tight")
-    plt.close(g.get_figure())
+    fig.savefig(os.path.join(output_dir, sat_name + ".png"), dpi=100, bbox_inches="tight")
 
     del df
     del important_conjunctions
@@ -88,21 +99,21 @@ if __name__ == "__main__":
     # parse arguments
 
     if len(sys.argv) < 3:
-        print("Usage: plot_conjunctions.py <input-conjunctions-file-prefix> <input-tle-file-prefix> <output-file-prefix>")
+        print("Usage: plot_conjunctions.py <input-conjunctions-file> <input-tle-file-prefix> <output-file-prefix>")
         sys.exit(1)
 
-    input_conjunctions_file_prefix = sys.argv[1]
+    input_conjunctions_file = sys.argv[1]
     input_tle_file_prefix = sys.argv[2]
     output_dir = sys.argv[3]
 
-    max_workers = mp.cpu_count() - 1
+    max_workers = max(mp.cpu_count() - 1, 1)
     # max_workers = 1
 
     # find all files with the given prefix
     with mp.Pool(processes=max_workers) as pool:
-        files = glob.glob(input_tle_file_prefix + "*")
+        _, sats = tracks.glob(input_tle_file_prefix)
 
-        r = list(tqdm.tqdm(pool.imap_unordered(functools.partial(_graph_sat_altitude, input_conjunctions_file_prefix=input_conjunctions_file_prefix, output_dir=output_dir), files, chunksize=10), total=len(files)))
+        r = list(tqdm.tqdm(pool.imap_unordered(functools.partial(_graph_sat_altitude, input_tle_file_prefix=input_tle_file_prefix, input_conjunctions_file=input_conjunctions_file, output_dir=output_dir), sats, chunksize=10), total=len(sats)))
 
         pool.close()
         pool.join()
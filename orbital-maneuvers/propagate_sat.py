@@ -1,142 +1,190 @@
 #!/usr/bin/env python3
 #
-# Usage: propagate_sat.py <input-file> <output-dir>
+# Usage: propagate_sat.py <input-file> <output-dir> [--fleet] [--csv] [--rolling-baseline]
+#
+# Positions are written to a track store in <output-dir> (see tracks.py)
+# --fleet propagates all satellites at once against a shared time grid
+# --csv additionally exports one CSV file per satellite
+# --rolling-baseline propagates the baseline from the previous TLE instead of
+#   the first one (see baseline.py)
 #
 
 import os
 import sys
 import multiprocessing as mp
 import functools
+import typing
 
 import pandas as pd
 import sgp4.api as sgp4
 import tqdm
 import numpy as np
 
+import baseline
+import tle_store
+import tracks
+
 TIME_INTERVAL_MS = 60000
 
-def _propagate(start_time, end_time, output_dir, arg):
-    # sat_df = orig_data[orig_data["name"] == sat]
-    # sat_df = sat_dfs[sat]
-    # sat_df = sat_df
-    sat_df, sat = arg
+# number of time steps each worker propagates at once in fleet mode
+# (one day at 1-minute resolution)
+FLEET_BLOCK_STEPS = 1440
+
+def _propagate(start_time, end_time, output_dir, baseline_mode, arg):
+    sat_df, sat, i = arg
 
-    sat_output = os.path.join(output_dir, f"{sat}.csv")
+    dates = pd.date_range(start=start_time, end=end_time, freq=f"{TIME_INTERVAL_MS}ms").values.astype("datetime64[ns]")
+    jd, fr = baseline.to_jd(dates)
 
-    # create a new dataframe with the interpolated values
-    new_data = pd.DataFrame(
-        {
-            "date": pd.date_range(
-                start=start_time, end=end_time, freq=f"{TIME_INTERVAL_MS}ms"
-            )
-        }
-    )
+    sat_df = sat_df.sort_values(by="date")
 
-    new_data["date"] = new_data["date"].astype("datetime64[ns]")
+    # actual positions: each time step uses the latest TLE available at that
+    # time (same as merge_asof on the date), before the first TLE and for TLEs
+    # that cannot be parsed the satellite is assumed dead (see baseline.py)
+    tle_idx = baseline.tle_index(sat_df["date"].values, dates)
+    sat_tles = baseline.satrecs(zip(sat_df["line1"].values, sat_df["line2"].values))
 
-    sat_df.sort_values(by="date", inplace=True)
-    sat_df.reset_index(drop=True, inplace=True)
+    positions = baseline.propagate(sat_tles, tle_idx, jd, fr)
+    baseline_xyz = baseline.propagate(sat_tles, baseline.baseline_index(tle_idx, baseline_mode), jd, fr)
 
-    new_data.sort_values(by="date", inplace=True)
-    new_data.reset_index(drop=True, inplace=True)
+    # write to the track store, distances are derived when reading
+    store = tracks.open_store(output_dir, mode="r+")
 
-    # interpolate the values
-    # print(new_data.dtypes)
-    # print(sat_df.dtypes)
-    new_data = pd.merge_asof(new_data, sat_df, on="date")
-    # print(new_data.head())
+    store.positions[i] = positions
+    store.baseline[i] = baseline_xyz
+    store.positions.flush()
+    store.baseline.flush()
 
-    # additionally, get the baseline values (first row)
-    # get the first row of the dataframe
-    line1_baseline = sat_df.iloc[0]["line1"]
-    line2_baseline = sat_df.iloc[0]["line2"]
+def _fleet_init(sats, tle_dates, tle_lines, dates, output_dir, baseline_mode):
+    # runs once per worker: keep TLE data around so that each block only
+    # needs to send its time range
+    global _fleet
+    _fleet = {
+        "sats": sats,
+        "tle_dates": tle_dates,
+        "dates": dates,
+        "jd": baseline.to_jd(dates),
+        "store": tracks.open_store(output_dir, mode="r+"),
+        "baseline_mode": baseline_mode,
+        # parse each TLE once per worker instead of once per block
+        "satrecs": [baseline.satrecs(lines) for lines in tle_lines],
+    }
 
-    def _to_xyz(target_time, line1, line2):
-        try:
-            sat = sgp4.Satrec.twoline2rv(line1, line2)
-        except Exception as e:
-            # nothing to do here
-            # just assume it is dead
-            return 0, 0, 0
+    # with a fixed baseline, it is the first TLE we have for each satellite
+    baseline_sats = []
+    baseline_idx = []
+    for i, sat_tles in enumerate(_fleet["satrecs"]):
+        if sat_tles[0] is not None:
+            baseline_sats.append(sat_tles[0])
+            baseline_idx.append(i)
 
-        # convert target time to Julian date
-        jd, fr = sgp4.jday(target_time.year, target_time.month, target_time.day,
-                            target_time.hour, target_time.minute, target_time.second + target_time.microsecond * 1e-6)
+    _fleet["baseline_array"] = sgp4.SatrecArray(baseline_sats) if len(baseline_sats) > 0 else None
+    _fleet["baseline_idx"] = np.array(baseline_idx, dtype=np.int64)
 
-        # propagate to the given time
-        e, r, d = sat.sgp4(jd, fr)
 
-        return r[0] * 1000, r[1] * 1000, r[2] * 1000
+def _propagate_fleet_block(block: typing.Tuple[int, int]) -> None:
+    start, end = block
 
-    def _to_xyz_baseline(target_times, line1, line2):
+    jd = _fleet["jd"][0][start:end]
+    fr = _fleet["jd"][1][start:end]
+    dates = _fleet["dates"][start:end]
 
-        sat = sgp4.Satrec.twoline2rv(line1, line2)
+    # actual positions: each time step uses the latest TLE available at that
+    # time (same as merge_asof on the date), before the first TLE the
+    # satellite is assumed dead
+    positions = np.zeros((len(_fleet["sats"]), end - start, 3))
+    # zero for satellites whose first TLE cannot be parsed, as in _propagate
+    baseline_xyz = np.zeros((len(_fleet["sats"]), end - start, 3))
 
-        # propagate to the given time
+    for i in range(len(_fleet["sats"])):
+        tle_idx = baseline.tle_index(_fleet["tle_dates"][i], dates)
 
-        dates = [sgp4.jday(target_time.year, target_time.month, target_time.day, target_time.hour, target_time.minute, target_time.second + target_time.microsecond * 1e-6) for target_time in target_times]
+        positions[i] = baseline.propagate(_fleet["satrecs"][i], tle_idx, jd, fr)
 
-        jd = np.array([d[0] for d in dates])
-        fr = np.array([d[1] for d in dates])
+        if _fleet["baseline_mode"] == "rolling":
+            baseline_xyz[i] = baseline.propagate(_fleet["satrecs"][i], baseline.baseline_index(tle_idx, "rolling"), jd, fr)
 
-        es, rs, ds = sat.sgp4_array(jd, fr)
+    # fixed baseline: one call for all satellites
+    if _fleet["baseline_mode"] == "first" and _fleet["baseline_array"] is not None:
+        e, r, v = _fleet["baseline_array"].sgp4(jd, fr)
+        baseline_xyz[_fleet["baseline_idx"]] = r * 1000
 
-        return rs[:, 0] * 1000, rs[:, 1] * 1000, rs[:, 2] * 1000
+    _fleet["store"].positions[:, start:end, :] = positions
+    _fleet["store"].baseline[:, start:end, :] = baseline_xyz
 
-    # write to output file
-    new_data[["x", "y", "z"]] = new_data.apply(lambda x: _to_xyz(x["date"], x["line1"], x["line2"]), axis=1, result_type="expand")
+    _fleet["store"].positions.flush()
+    _fleet["store"].baseline.flush()
 
-    # new_data[["x_baseline", "y_baseline", "z_baseline"]] = _to_xyz_baseline(new_data["date"], line1_baseline, line2_baseline)
 
-    baseline_xyz = _to_xyz_baseline(new_data["date"], line1_baseline, line2_baseline)
+def _export_csv(output_dir: str, sat: str) -> None:
+    tracks.open_store(output_dir).to_csv(sat, os.path.join(output_dir, f"{sat}.csv"))
 
-    new_data["x_baseline"] = baseline_xyz[0]
-    new_data["y_baseline"] = baseline_xyz[1]
-    new_data["z_baseline"] = baseline_xyz[2]
 
-    # distance between the satellite and the baseline in meters
-    new_data["distance_baseline"] = np.sqrt((new_data["x"] - new_data["x_baseline"]) ** 2 + (new_data["y"] - new_data["y_baseline"]) ** 2 + (new_data["z"] - new_data["z_baseline"]) ** 2)
+def _propagate_fleet(store: tle_store.TLEStore, sats: typing.List[str], dates: np.ndarray, output_dir: str, baseline_mode: str) -> None:
+    # per-satellite TLE history, already sorted by epoch in the store
+    tle_dates = []
+    tle_lines = []
+    for sat in sats:
+        rows = store.rows(sat)
+        tle_dates.append(store.epochs[rows])
+        tle_lines.append(list(zip(store.tles["line1"].values[rows], store.tles["line2"].values[rows])))
 
-    # distance between the satellite and ground in meters
-    new_data["distance_ground"] = np.sqrt(new_data["x"] ** 2 + new_data["y"] ** 2 + new_data["z"] ** 2) - 6371000
+    blocks = [(start, min(start + FLEET_BLOCK_STEPS, len(dates))) for start in range(0, len(dates), FLEET_BLOCK_STEPS)]
 
-    # distance between the satellite baseline and ground in meters
-    new_data["distance_baseline_ground"] = np.sqrt(new_data["x_baseline"] ** 2 + new_data["y_baseline"] ** 2 + new_data["z_baseline"] ** 2) - 6371000
+    with mp.Pool(initializer=_fleet_init, initargs=(sats, tle_dates, tle_lines, dates, output_dir, baseline_mode)) as pool:
+        r = list(tqdm.tqdm(pool.imap_unordered(_propagate_fleet_block, blocks), total=len(blocks), desc="propagating"))
 
-    new_data[["date", "name", "x", "y", "z", "x_baseline", "y_baseline", "z_baseline", "distance_baseline", "distance_ground", "distance_baseline_ground"]].to_csv(sat_output, index=False)
-    # new_data.to_csv(sat_output, index=False)
-    # print(sat_output)
-    # exit(1)
+        pool.close()
+        pool.join()
 
 if __name__ == "__main__":
     # parse arguments
 
-    if len(sys.argv) != 3:
-        print("Usage: propagate_sat.py <input-file> <output-dir>")
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    flags = [a for a in sys.argv[1:] if a.startswith("--")]
+
+    if len(args) != 2 or any(f not in ("--fleet", "--csv", "--rolling-baseline") for f in flags):
+        print("Usage: propagate_sat.py <input-file> <output-dir> [--fleet] [--csv] [--rolling-baseline]")
         sys.exit(1)
 
-    input_file = sys.argv[1]
-    output_dir = sys.argv[2]
+    input_file = args[0]
+    output_dir = args[1]
+    fleet = "--fleet" in flags
+    export_csv = "--csv" in flags
+    baseline_mode = "rolling" if "--rolling-baseline" in flags else "first"
 
     # read input file
-    orig_data = pd.read_csv(input_file)
+    orig_data = tle_store.read(input_file)
 
     # interpolate at a given time interval
-    start_time = orig_data["date"].min()
-    end_time = orig_data["date"].max()
+    start_time = tle_store.datetimes(orig_data["date"]).min()
+    end_time = tle_store.datetimes(orig_data["date"]).max()
 
-    orig_data["date"] = pd.to_datetime(orig_data["date"]).astype("datetime64[ns]")
-    orig_data["old_date"] = orig_data["date"].copy()
+    # deduplicate TLEs, each TLE is used from its epoch on
+    store = tle_store.TLEStore(orig_data)
+    del orig_data
 
-    with mp.Pool() as pool:
-        sats = list(orig_data["name"].unique())
+    # unique per NORAD id, see TLEStore
+    sats = sorted(store.names)
 
-        # build indexed dataframe
-        orig_grouped = orig_data.groupby("name")
+    dates = pd.date_range(start=start_time, end=end_time, freq=f"{TIME_INTERVAL_MS}ms").values
 
-        sat_iterator = [(orig_grouped.get_group(sat).copy(), sat) for sat in sats]
+    tracks.create(output_dir, sats, dates, [int(store.norad_ids[store.name_index[sat]]) for sat in sats])
 
-        r = list(tqdm.tqdm(pool.imap_unordered(functools.partial(_propagate, start_time, end_time, output_dir), sat_iterator, chunksize=10), total=len(sats)))
+    if fleet:
+        _propagate_fleet(store, sats, dates, output_dir, baseline_mode)
+    else:
+        with mp.Pool() as pool:
+            sat_iterator = [(store.tles.iloc[store.rows(sat)][["epoch", "name", "line1", "line2"]].rename(columns={"epoch": "date"}), sat, i) for i, sat in enumerate(sats)]
 
-        pool.close()
-        pool.join()
+            r = list(tqdm.tqdm(pool.imap_unordered(functools.partial(_propagate, start_time, end_time, output_dir, baseline_mode), sat_iterator, chunksize=10), total=len(sats)))
+
+            pool.close()
+            pool.join()
+
+    if export_csv:
+        with mp.Pool() as pool:
+            r = list(tqdm.tqdm(pool.imap_unordered(functools.partial(_export_csv, output_dir), sats, chunksize=10), total=len(sats), desc="exporting"))
+
+            pool.close()
+            pool.join()
@@ -0,0 +1,86 @@
+#
+# Rendering helpers for the plotting scripts
+#
+# Plots are rendered with the non-interactive Agg backend. Each worker process
+# keeps its figures and clears them between plots instead of creating new ones.
+# Long series are decimated to the figure's pixel resolution before plotting:
+# for each pixel column, only the minimum and maximum are kept, so peaks stay
+# visible while most points are dropped. Scatter plots in 3D keep one point
+# per marker-sized cell on screen.
+#
+
+import typing
+
+import matplotlib
+
+matplotlib.use("Agg")
+
+import matplotlib.pyplot as plt
+import numpy as np
+
+# figures of this process, by name
+_figures: typing.Dict[str, plt.Figure] = {}
+
+
+def figure(name: str, **kwargs) -> plt.Figure:
+    # a cleared figure that is reused by later calls with the same name
+    # keyword arguments are passed to plt.figure() when it is created
+    fig = _figures.get(name)
+
+    if fig is None:
+        fig = plt.figure(**kwargs)
+        _figures[name] = fig
+    else:
+        fig.clf()
+
+    return fig
+
+
+def pixels(fig: plt.Figure, dpi: typing.Optional[float] = None) -> int:
+    # width of the figure in pixels when saved with the given dpi
+    return int(np.ceil(fig.get_figwidth() * (dpi or fig.dpi)))
+
+
+def decimate(values: np.ndarray, n_buckets: int) -> np.ndarray:
+    # sorted indices of the minimum and maximum of values in each of n_buckets
+    # buckets of consecutive samples, all indices if there are fewer samples
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values)
+
+    if n <= 2 * n_buckets:
+        return np.arange(n)
+
+    size = -(-n // n_buckets)
+    n_buckets = -(-n // size)
+
+    padded = np.full(n_buckets * size, np.nan)
+    padded[:n] = values
+    padded = padded.reshape(n_buckets, size)
+
+    offsets = np.arange(n_buckets) * size
+    lo = np.argmin(np.where(np.isnan(padded), np.inf, padded), axis=1) + offsets
+    hi = np.argmax(np.where(np.isnan(padded), -np.inf, padded), axis=1) + offsets
+
+    return np.unique(np.concatenate([lo, hi]))
+
+
+def decimate_3d(ax, x: np.ndarray, y: np.ndarray, z: np.ndarray, values: np.ndarray, marker_size: float = 1.0) -> np.ndarray:
+    # sorted indices of the point with the largest value in each cell of
+    # marker_size points on screen, after scaling the axes to all points
+    from mpl_toolkits.mplot3d import proj3d
+
+    ax.auto_scale_xyz(x, y, z)
+
+    px, py, _ = proj3d.proj_transform(x, y, z, ax.get_proj())
+    screen = ax.transData.transform(np.column_stack([px, py]))
+
+    cell = np.floor(screen / (marker_size * ax.figure.dpi / 72)).astype(np.int64)
+    cell -= cell.min(axis=0)
+    cell = cell[:, 0] * (cell[:, 1].max() + 1) + cell[:, 1]
+
+    # sort by cell, then by descending value, and take the first of each cell
+    order = np.lexsort((-np.asarray(values), cell))
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = cell[order][1:] != cell[order][:-1]
+
+    return np.sort(order[first])
@@ -4,9 +4,107 @@
 #
 # Usage: tle-to-csv.py <input-file-prefix> <output-file>
 #
+# If the output file ends in .parquet, a Parquet file is written instead of CSV.
+# Archive files are parsed in parallel and written one at a time, so only a
+# few files are held in memory at once.
+#
 
 import sys
 import glob
+import os
+import multiprocessing as mp
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import tqdm
+
+import tle_store
+
+COLUMNS = ["date", "name", "line1", "line2", "norad_id", "epoch", "inclination", "raan", "eccentricity", "mean_motion"]
+
+# same format for all chunks, pandas writes date-only values if a chunk is
+# all at midnight otherwise
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S.%f"
+
+
+def _check_csv(output_file: str, rows: int) -> None:
+    # read the dates back as tle_store.py does
+    df = pd.read_csv(output_file, usecols=["date", "epoch"])
+
+    for col in ["date", "epoch"]:
+        if len(df) != rows or tle_store.datetimes(df[col]).isna().any():
+            raise ValueError(f"could not read back {col} from {output_file}")
+
+
+def _parse_file(filename: str) -> pd.DataFrame:
+    # date is in the filename in iso format
+    # format: starlink-2023-01-17T00:31:01.827049.txt
+    date = os.path.basename(filename).split("-", 1)[1]
+    date = date[:-len(".txt")]
+
+    with open(filename, 'r') as f:
+        lines = [line.rstrip() for line in f if line.strip()]
+
+    # sample TLE line
+    # STARLINK-1007
+    # 1 44713U 19074A   22352.40024299  .00000410  00000+0  46397-4 0  9991
+    # 2 44713  53.0552  71.6920 0001616  51.2074 308.9059 15.06400439171475
+    names = []
+    lines1 = []
+    lines2 = []
+    invalid = 0
+    stray = 0
+
+    # look for a line 1 followed by a line 2 instead of reading triples, so
+    # that a stray or missing line only affects a single TLE
+    i = 0
+    # lines before this are part of a TLE or were skipped
+    used = 0
+
+    while i + 1 < len(lines):
+        if not (lines[i].startswith("1 ") and lines[i + 1].startswith("2 ")):
+            i += 1
+            continue
+
+        # the name is the line before, unless that is part of the previous TLE
+        name = lines[i - 1].strip() if i > used else None
+        line1, line2 = lines[i], lines[i + 1]
+
+        stray += i - used - (name is not None)
+        i += 2
+        used = i
+
+        if name is None or not (tle_store.checksum(line1) and tle_store.checksum(line2)):
+            invalid += 1
+            continue
+
+        names.append(name)
+        lines1.append(line1)
+        lines2.append(line2)
+
+    stray += len(lines) - used
+
+    if invalid > 0 or stray > 0:
+        print(f"skipped {invalid} invalid TLEs and {stray} other lines in {filename}")
+
+    return pd.DataFrame(
+        {
+            "date": pd.Series(pd.Timestamp(date), index=range(len(names))).astype("datetime64[ns]"),
+            "name": names,
+            "line1": lines1,
+            "line2": lines2,
+            "norad_id": np.array([tle_store.norad_id(l[2:7]) for l in lines1], dtype=np.int32),
+            "epoch": tle_store.epochs(lines1),
+            "inclination": np.array([float(l[8:16]) for l in lines2]),
+            "raan": np.array([float(l[17:25]) for l in lines2]),
+            "eccentricity": np.array([float("0." + l[26:33]) for l in lines2]),
+            "mean_motion": np.array([float(l[52:63]) for l in lines2]),
+        },
+        columns=COLUMNS,
+    )
+
 
 if __name__ == '__main__':
 
@@ -19,50 +117,38 @@ if __name__ == '__main__':
     input_file_prefix = sys.argv[1]
     output_file = sys.argv[2]
 
-    # read all available TLE data
-    tle_lines = []
-
-    # find all files with the given prefix
-    for filename in glob.glob(input_file_prefix + "*"):
-
-        # date is in the filename in iso format
-        date = filename.split("-", 1)[1]
-        date = date[:-len(".txt")]
-
-        with open(filename, 'r') as f:
-            # parse TLE data from file
-            # read three lines at a time
-            # skip lines until we find the first line with the satellite number 1
-            while True:
-                line1 = f.readline()
-                if not line1:
-                    break
-                line2 = f.readline()
-                line3 = f.readline()
-
-                tle_lines.append({
-                    "date": date,
-                    "line1": line1,
-                    "line2": line2,
-                    "line3": line3,
-                })
-
-    # write TLE data to CSV file
-    with open(output_file, 'w') as f:
-        # write header
-        f.write("date,name,line1,line2\n")
-
-        for tle_line in tle_lines:
-            # parse TLE data and write
-
-            # sample TLE line
-            # STARLINK-1007
-            # 1 44713U 19074A   22352.40024299  .00000410  00000+0  46397-4 0  9991
-            # 2 44713  53.0552  71.6920 0001616  51.2074 308.9059 15.06400439171475
-
-            f.write("{date},{name},{line1},{line2}\n".format(
-                date = tle_line["date"],
-                name = tle_line["line1"].strip(),
-                line1 = tle_line["line2"].strip(),
-                line2 = tle_line["line3"].strip(),
-            ))
+    parquet = output_file.endswith(".parquet")
+
+    files = sorted(glob.glob(input_file_prefix + "*"))
+
+    writer = None
+    header_written = False
+    rows = 0
+
+    with mp.Pool() as pool:
+        # write each file as soon as it is parsed
+        for df in tqdm.tqdm(pool.imap(_parse_file, files), total=len(files)):
+            if len(df) == 0:
+                continue
+
+            if parquet:
+                table = pa.Table.from_pandas(df, preserve_index=False)
+
+                if writer is None:
+                    writer = pq.ParquetWriter(output_file, table.schema)
+
+                writer.write_table(table)
+            else:
+                df.to_csv(output_file, mode="a" if header_written else "w", header=not header_written, index=False, date_format=DATE_FORMAT)
+                header_written = True
+
+            rows += len(df)
+
+        pool.close()
+        pool.join()
+
+    if writer is not None:
+        writer.close()
+
+    if header_written:
+        _check_csv(output_file, rows)
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+#
+# Deduplicated TLE store keyed by NORAD id and TLE epoch
+#
+# Usage: tle_store.py <input-file> <output-file>
+#
+# Consecutive scrapes mostly repeat the same element sets. The store keeps
+# each element set once, sorted by (norad_id, epoch), so that the TLE valid at
+# a given time is found with a binary search over that satellite's epochs.
+#
+
+import collections
+import sys
+import typing
+
+import numpy as np
+import pandas as pd
+
+COLUMNS = ["norad_id", "epoch", "date", "name", "line1", "line2"]
+
+
+def checksum(line: str) -> bool:
+    # the last digit is the sum of all digits in the line modulo 10,
+    # where a minus sign counts as 1
+    if len(line) < 69 or not line[68].isdigit():
+        return False
+
+    s = sum(int(c) if c.isdigit() else 1 if c == "-" else 0 for c in line[:68])
+
+    return s % 10 == int(line[68])
+
+
+def norad_id(s: str) -> int:
+    # alpha-5 catalog numbers use a leading letter for ids >= 100000
+    # (I and O are skipped)
+    s = s.strip()
+    if s[:1].isalpha():
+        return (ord(s[0]) - ord("A") + 10 - (s[0] > "I") - (s[0] > "O")) * 10000 + int(s[1:])
+
+    return int(s)
+
+
+def epochs(lines1: typing.Sequence[str]) -> np.ndarray:
+    # epoch is YYDDD.DDDDDDDD with two-digit years from 1957 to 2056
+    year = np.array([int(l[18:20]) for l in lines1], dtype=np.int64)
+    year = np.where(year < 57, year + 2000, year + 1900)
+    day = np.array([float(l[20:32]) for l in lines1])
+
+    return (year - 1970).astype("datetime64[Y]").astype("datetime64[ns]") + ((day - 1) * 86400e9).astype("timedelta64[ns]")
+
+
+def datetimes(values: typing.Any) -> pd.Series:
+    # CSV files may mix date-only values (at midnight) and full timestamps,
+    # which pandas >= 2 only parses with an explicit ISO8601 format
+    try:
+        return pd.to_datetime(values, format="ISO8601")
+    except (TypeError, ValueError):
+        # pandas < 2 does not know that format, but infers mixed ones
+        return pd.to_datetime(values)
+
+
+def read(input_file: str) -> pd.DataFrame:
+    # read the output of tle-to-csv.py (or a saved store)
+    if input_file.endswith(".parquet"):
+        return pd.read_parquet(input_file)
+
+    return pd.read_csv(input_file)
+
+
+class TLEStore:
+    def __init__(self, tles: pd.DataFrame):
+        tles = tles.copy()
+
+        # older CSV files only have the raw lines
+        if "norad_id" not in tles:
+            tles["norad_id"] = [norad_id(l[2:7]) for l in tles["line1"]]
+        if "epoch" not in tles:
+            tles["epoch"] = epochs(tles["line1"])
+
+        tles["date"] = datetimes(tles["date"]).astype("datetime64[ns]")
+        tles["epoch"] = datetimes(tles["epoch"]).astype("datetime64[ns]")
+
+        tles = tles.sort_values(by=["norad_id", "epoch", "date"], kind="stable")
+
+        # identical element sets: keep the first time we have seen them
+        tles = tles.drop_duplicates(subset=["norad_id", "line1", "line2"], keep="first")
+        # different element sets with the same epoch: keep the latest one
+        tles = tles.drop_duplicates(subset=["norad_id", "epoch"], keep="last")
+
+        self.tles = tles[COLUMNS].reset_index(drop=True)
+
+        self.epochs = self.tles["epoch"].values
+        self.norad_ids, self.offsets = np.unique(self.tles["norad_id"].values, return_index=True)
+        self.offsets = np.append(self.offsets, len(self.tles))
+
+        # satellites can be renamed, use the latest name
+        names = list(self.tles["name"].values[self.offsets[1:] - 1])
+
+        # names are not unique across NORAD ids (e.g., a name is reused or an
+        # object is not named yet), such names get the NORAD id appended so
+        # that satellites do not overwrite each other's tracks, which keep the
+        # NORAD id to match conjunctions (see tracks.py)
+        counts = collections.Counter(names)
+        self.names = [f"{n}_{i}" if counts[n] > 1 else n for n, i in zip(names, self.norad_ids)]
+
+        self.index = {n: i for i, n in enumerate(self.norad_ids)}
+        self.name_index = {n: i for i, n in enumerate(self.names)}
+
+    def __len__(self) -> int:
+        return len(self.tles)
+
+    def rows(self, sat: typing.Union[int, str]) -> slice:
+        # all element sets of a satellite (NORAD id or name as in names),
+        # sorted by epoch
+        i = self.name_index[sat] if isinstance(sat, str) else self.index[sat]
+
+        return slice(self.offsets[i], self.offsets[i + 1])
+
+    def latest(self, sat: typing.Union[int, str], t) -> np.ndarray:
+        # row of the latest TLE with an epoch at or before t, -1 if there is none
+        # t can be a single time or an array of times
+        rows = self.rows(sat)
+        t = np.asarray(t, dtype="datetime64[ns]")
+
+        i = np.searchsorted(self.epochs[rows], t, side="right") - 1
+
+        return np.where(i < 0, -1, i + rows.start)
+
+    def save(self, output_file: str) -> None:
+        self.tles.to_parquet(output_file, index=False)
+
+
+def load(input_file: str) -> TLEStore:
+    return TLEStore(read(input_file))
+
+
+if __name__ == "__main__":
+
+    # parse arguments
+
+    if len(sys.argv) != 3:
+        print("Usage: tle_store.py <input-file> <output-file>")
+        sys.exit(1)
+
+    input_file = sys.argv[1]
+    output_file = sys.argv[2]
+
+    tles = read(input_file)
+    store = TLEStore(tles)
+
+    print(f"{len(tles)} TLEs, {len(store)} unique element sets for {len(store.norad_ids)} satellites")
+
+    store.save(output_file)
@@ -0,0 +1,117 @@
+#
+# Track store for propagated satellite positions
+#
+# A track store is a directory with:
+#   satellites.csv  satellite names and NORAD ids, row i is satellite i
+#   dates.npy       shared time grid (datetime64[ns])
+#   positions.npy   (n_sats x n_times x 3) positions from the latest TLE in meters
+#   baseline.npy    (n_sats x n_times x 3) positions from the baseline TLE in meters
+#
+# Position arrays are memory-mapped, so reading a satellite or a date range only
+# touches that part of the file.
+#
+# Consumers address satellites with a prefix such as "./propagated/STARLINK",
+# i.e., the store directory followed by a satellite name prefix. Names are
+# unique within a store (see tle_store.py), but may differ from the names in
+# other data, so conjunctions are matched to tracks by NORAD id.
+#
+
+import functools
+import os
+import typing
+
+import numpy as np
+import pandas as pd
+
+EARTH_RADIUS = 6371000
+
+COLUMNS = ["date", "name", "x", "y", "z", "x_baseline", "y_baseline", "z_baseline", "distance_baseline", "distance_ground", "distance_baseline_ground"]
+
+
+class Tracks:
+    def __init__(self, path: str, mode: str = "r"):
+        self.path = path
+        df = pd.read_csv(os.path.join(path, "satellites.csv"))
+        self.satellites = list(df["name"])
+        self.index = {sat: i for i, sat in enumerate(self.satellites)}
+        # stores written before NORAD ids were added have -1 for all
+        self.norad_ids = df["norad_id"].values.astype(np.int64) if "norad_id" in df else np.full(len(df), -1, dtype=np.int64)
+        self.norad_index = {int(n): sat for n, sat in zip(self.norad_ids, self.satellites) if n >= 0}
+        self.dates = np.load(os.path.join(path, "dates.npy"))
+        self.positions = np.load(os.path.join(path, "positions.npy"), mmap_mode=mode)
+        self.baseline = np.load(os.path.join(path, "baseline.npy"), mmap_mode=mode)
+
+    def step(self) -> float:
+        # seconds between time steps, nan for a store with a single time step
+        if len(self.dates) < 2:
+            return np.nan
+
+        return (self.dates[1] - self.dates[0]) / np.timedelta64(1, "s")
+
+    def find(self, prefix: str = "") -> typing.List[str]:
+        return [sat for sat in self.satellites if sat.startswith(prefix)]
+
+    def names(self, norad_ids: typing.Iterable[int]) -> typing.List[typing.Optional[str]]:
+        # satellite of each NORAD id, None for objects without a track
+        return [self.norad_index.get(int(n)) for n in norad_ids]
+
+    def time_slice(self, start=None, end=None) -> slice:
+        # dates are sorted, so a date range is a contiguous slice
+        # start and end are inclusive, same as filtering with >= and <=
+        first = 0 if start is None else np.searchsorted(self.dates, np.datetime64(pd.Timestamp(start), "ns"), side="left")
+        last = len(self.dates) if end is None else np.searchsorted(self.dates, np.datetime64(pd.Timestamp(end), "ns"), side="right")
+
+        return slice(first, last)
+
+    def read(self, sat: str, start=None, end=None) -> pd.DataFrame:
+        t = self.time_slice(start, end)
+        i = self.index[sat]
+
+        xyz = np.asarray(self.positions[i, t])
+        xyz_baseline = np.asarray(self.baseline[i, t])
+
+        return pd.DataFrame(
+            {
+                "date": self.dates[t],
+                "name": sat,
+                "x": xyz[:, 0],
+                "y": xyz[:, 1],
+                "z": xyz[:, 2],
+                "x_baseline": xyz_baseline[:, 0],
+                "y_baseline": xyz_baseline[:, 1],
+                "z_baseline": xyz_baseline[:, 2],
+                "distance_baseline": np.linalg.norm(xyz - xyz_baseline, axis=1),
+                "distance_ground": np.linalg.norm(xyz, axis=1) - EARTH_RADIUS,
+                "distance_baseline_ground": np.linalg.norm(xyz_baseline, axis=1) - EARTH_RADIUS,
+            },
+            columns=COLUMNS,
+        )
+
+    def to_csv(self, sat: str, output_file: str) -> None:
+        self.read(sat).to_csv(output_file, index=False)
+
+
+def create(path: str, satellites: typing.List[str], dates: np.ndarray, norad_ids: typing.Sequence[int]) -> None:
+    # write the index and allocate empty position arrays
+    os.makedirs(path, exist_ok=True)
+
+    pd.DataFrame({"name": satellites, "norad_id": norad_ids}).to_csv(os.path.join(path, "satellites.csv"), index_label="index")
+    np.save(os.path.join(path, "dates.npy"), dates.astype("datetime64[ns]"))
+
+    for f in ["positions.npy", "baseline.npy"]:
+        out = np.lib.format.open_memmap(os.path.join(path, f), mode="w+", dtype=np.float64, shape=(len(satellites), len(dates), 3))
+        out.flush()
+        del out
+
+
+@functools.lru_cache(maxsize=None)
+def open_store(path: str, mode: str = "r") -> Tracks:
+    # cached so that each worker process maps the store only once
+    return Tracks(path, mode=mode)
+
+
+def glob(prefix: str) -> typing.Tuple[Tracks, typing.List[str]]:
+    # "./propagated/STARLINK" -> store "./propagated", satellites "STARLINK*"
+    store = open_store(os.path.dirname(prefix) or ".")
+
+    return store, store.find(os.path.basename(prefix))